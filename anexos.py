@@ -0,0 +1,68 @@
+# anexos.py - FOTOS, CROQUI E DOCUMENTOS DE POSSE FORA DA LINHA DO CADASTRO
+#
+# Os campos imovel_fotos, imovel_croqui e imovel_docs_posse chegam do
+# frontend como texto: em geral uma data URL em base64
+# ("data:image/jpeg;base64,...") ou uma lista JSON delas. Cada imagem é
+# guardada uma única vez, já decodificada, na tabela anexos, com o SHA-256
+# do conteúdo como chave; o cadastro só guarda as referências.
+#
+# A decomposição só é usada quando recompor() devolve exatamente o texto
+# original; qualquer outro valor é guardado como texto, sem interpretação.
+
+import base64
+import binascii
+import hashlib
+import json
+import re
+
+CAMPOS_ANEXO = ['imovel_docs_posse', 'imovel_fotos', 'imovel_croqui']
+
+MIMETYPE_TEXTO = 'text/plain; charset=utf-8'
+
+PADRAO_DATA_URL = re.compile(r'data:([\w.+-]+/[\w.+-]+);base64,(.*)', re.DOTALL)
+
+
+def hash_anexo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _decompor_item(item):
+    combinacao = PADRAO_DATA_URL.fullmatch(item)
+    if combinacao:
+        try:
+            conteudo = base64.b64decode(combinacao.group(2), validate=True)
+        except (binascii.Error, ValueError):
+            pass
+        else:
+            return conteudo, combinacao.group(1), 'data_url'
+    return item.encode('utf-8'), MIMETYPE_TEXTO, 'texto'
+
+
+def recompor(partes, em_lista):
+    """Texto original a partir das partes (conteúdo, mimetype, formato)."""
+    itens = [
+        f"data:{mimetype};base64,{base64.b64encode(conteudo).decode('ascii')}" if formato == 'data_url'
+        else bytes(conteudo).decode('utf-8')
+        for conteudo, mimetype, formato in partes
+    ]
+    if em_lista:
+        return json.dumps(itens, ensure_ascii=False, separators=(',', ':'))
+    return itens[0]
+
+
+def decompor(valor):
+    """Divide o texto de um campo de anexo em partes (conteúdo, mimetype,
+    formato). Devolve (partes, em_lista)."""
+    lista = None
+    if valor.startswith('['):
+        try:
+            lista = json.loads(valor)
+        except ValueError:
+            lista = None
+        if not (isinstance(lista, list) and lista and all(isinstance(item, str) for item in lista)):
+            lista = None
+    partes = [_decompor_item(item) for item in (lista if lista is not None else [valor])]
+    em_lista = lista is not None
+    if recompor(partes, em_lista) != valor:
+        return [(valor.encode('utf-8'), MIMETYPE_TEXTO, 'texto')], False
+    return partes, em_lista
@@ -1,16 +1,53 @@
 # app.py - VERSÃO COMPLETA E ADAPTADA PARA O RENDER
 
 import os # 👈 ADICIONADO para ler variáveis de ambiente
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text, Float, String, Integer
+from sqlalchemy import text, Float, String, Integer, BigInteger, DateTime, and_, or_, update, insert, select, event, func, case
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.pool import QueuePool, NullPool
 from werkzeug.security import generate_password_hash, check_password_hash
-import pandas as pd
 import io
+import threading
+import json
+import base64
+import time
+import csv
+import codecs
+import zlib
+import gzip
+import tempfile
+import uuid
+import hashlib
+import heapq
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+from functools import wraps
+import jwt
+import click
+import unicodedata
+try:
+    import orjson # opcional: serialização JSON bem mais rápida nas listagens grandes
+except ImportError:
+    orjson = None
+try:
+    import brotli # opcional: sem ele as respostas são comprimidas só com gzip
+except ImportError:
+    brotli = None
+from metricas import RegistroMetricas, LIMITES_DURACAO, LIMITES_BYTES, LIMITES_CONSULTAS
+from anexos import CAMPOS_ANEXO, decompor, recompor, hash_anexo
+from simulacao import tabelas_propostas, avaliar_base, resumir_simulacao
+from avaliacao import (TabelasPlanta, avaliar_registros, padrao_ilike, classificar_reurb,
+                       LIMITE_RENDA_REURB_S, COLUNAS_AVALIACAO, CAMPOS_VALOR_VENAL)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Proximo-Cursor', 'ETag'])
 
 # 🔧 Configuração do banco PostgreSQL - MODIFICADO PARA O RENDER
 # A URL do banco de dados será lida da variável de ambiente 'DATABASE_URL' fornecida pelo Render
@@ -21,8 +58,151 @@ if database_url and database_url.startswith("postgres://"):
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# 📊 Métricas (expostas em /api/metrics). Com vários workers, METRICAS_DIR
+# aponta para um diretório comum onde cada worker grava suas séries.
+metricas = RegistroMetricas(os.environ.get('METRICAS_DIR'))
+metricas.contador('reurb_http_requisicoes_total', 'Requisições atendidas, por rota, método e status.')
+metricas.histograma('reurb_http_duracao_segundos', 'Tempo de resposta por rota.', LIMITES_DURACAO)
+metricas.histograma('reurb_http_resposta_bytes', 'Tamanho do corpo da resposta por rota (exceto fluxos).', LIMITES_BYTES)
+metricas.histograma('reurb_sql_consultas_por_requisicao', 'Consultas SQL executadas por requisição.', LIMITES_CONSULTAS)
+metricas.histograma('reurb_sql_duracao_por_requisicao_segundos', 'Tempo total em SQL por requisição.', LIMITES_DURACAO)
+metricas.histograma('reurb_pool_espera_checkout_segundos', 'Espera para obter uma conexão do pool.', LIMITES_DURACAO)
+
+class PoolMedido(QueuePool):
+    # QueuePool que mede quanto tempo cada checkout esperou por uma conexão livre
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metricas.observar('reurb_pool_espera_checkout_segundos', {}, time.perf_counter() - inicio)
+
+# 🔌 Pool de conexões, configurável pelo ambiente:
+#   DB_POOL_SIZE / DB_MAX_OVERFLOW  conexões mantidas / extras sob pico (por worker)
+#   DB_POOL_TIMEOUT                 segundos esperando uma conexão livre
+#   DB_POOL_RECYCLE                 recicla conexões mais velhas que isso (segundos)
+#   DB_POOL_PRE_PING                testa a conexão antes de usar (padrão: ligado)
+#   DB_PGBOUNCER                    com PgBouncer na frente, quem faz o pool é ele:
+#                                   usa NullPool (uma conexão por checkout)
+def opcoes_engine(url):
+    if not url or (url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:')):
+        return {}
+    if os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'sim'):
+        return {'poolclass': NullPool}
+    return {
+        'poolclass': PoolMedido,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'sim')
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(database_url)
+
 db = SQLAlchemy(app)
 
+# 🛠️ O esquema do banco é criado e atualizado só pelas migrações
+# ('flask db upgrade', no build/pre-deploy), nunca na importação do app.
+# O Flask-Migrate (e o alembic) só é carregado quando o app roda sob o CLI
+# do flask (que define FLASK_RUN_FROM_CLI); os workers do gunicorn não
+# pagam por ele.
+def registrar_migracoes():
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+    registrar_migracoes()
+
+def preparar_banco():
+    # Aplica as migrações pendentes (o mesmo que 'flask db upgrade'); usado
+    # no servidor local e nos benchmarks
+    from flask_migrate import upgrade
+    registrar_migracoes()
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+
+# 🗄️ SQLite (uso local): modo WAL, para que as tarefas em segundo plano
+# consigam gravar o progresso enquanto outra conexão ainda está lendo
+@event.listens_for(Engine, 'connect')
+def configurar_sqlite(conexao_dbapi, _):
+    if isinstance(conexao_dbapi, sqlite3.Connection):
+        cursor = conexao_dbapi.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.close()
+
+# ⏱️ Instrumentação por requisição: tempo, tamanho da resposta e consultas SQL.
+# Com LOG_REQUISICOES_LENTAS_MS definido, requisições mais lentas que o limite
+# são registradas no log com as instruções SQL que executaram (agrupadas, para
+# que padrões N+1 apareçam como a mesma instrução repetida muitas vezes).
+LIMITE_REQUISICAO_LENTA_MS = float(os.environ.get('LOG_REQUISICOES_LENTAS_MS') or 0)
+MAXIMO_INSTRUCOES_CAPTURADAS = 1000
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def iniciar_cronometro_sql(conexao, cursor, instrucao, parametros, contexto, executemany):
+    conexao.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def registrar_consulta_sql(conexao, cursor, instrucao, parametros, contexto, executemany):
+    duracao = time.perf_counter() - conexao.info['inicio_consultas'].pop()
+    if not has_request_context() or 'sql_consultas' not in g:
+        return
+    g.sql_consultas += 1
+    g.sql_tempo += duracao
+    if LIMITE_REQUISICAO_LENTA_MS and len(g.sql_instrucoes) < MAXIMO_INSTRUCOES_CAPTURADAS:
+        g.sql_instrucoes.append((instrucao, duracao))
+
+@event.listens_for(Engine, 'handle_error')
+def descartar_cronometro_sql(contexto_erro):
+    # Instrução que falhou não passa por after_cursor_execute: descarta o início
+    # registrado, para a lista da conexão não crescer a cada erro
+    conexao = contexto_erro.connection
+    if conexao is not None and conexao.info.get('inicio_consultas'):
+        conexao.info['inicio_consultas'].pop()
+
+@app.before_request
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    g.sql_consultas = 0
+    g.sql_tempo = 0.0
+    g.sql_instrucoes = []
+
+@app.after_request
+def registrar_medicao(resposta):
+    if 'inicio_requisicao' not in g:
+        return resposta
+    duracao = time.perf_counter() - g.inicio_requisicao
+    rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    metricas.incrementar('reurb_http_requisicoes_total', {"rota": rota, "metodo": request.method, "status": str(resposta.status_code)})
+    metricas.observar('reurb_http_duracao_segundos', {"rota": rota, "metodo": request.method}, duracao)
+    if not resposta.is_streamed and resposta.content_length is not None:
+        metricas.observar('reurb_http_resposta_bytes', {"rota": rota}, resposta.content_length)
+    metricas.observar('reurb_sql_consultas_por_requisicao', {"rota": rota}, g.sql_consultas)
+    metricas.observar('reurb_sql_duracao_por_requisicao_segundos', {"rota": rota}, g.sql_tempo)
+    metricas.talvez_gravar()
+
+    if LIMITE_REQUISICAO_LENTA_MS and duracao * 1000 >= LIMITE_REQUISICAO_LENTA_MS:
+        agrupadas = {}
+        for instrucao, tempo in g.sql_instrucoes:
+            chave = ' '.join(instrucao.split())
+            quantidade, total = agrupadas.get(chave, (0, 0.0))
+            agrupadas[chave] = (quantidade + 1, total + tempo)
+        app.logger.warning("Requisição lenta: %s", json.dumps({
+            "rota": rota, "metodo": request.method, "url": request.full_path, "status": resposta.status_code,
+            "duracao_ms": round(duracao * 1000, 1), "consultas_sql": g.sql_consultas,
+            "tempo_sql_ms": round(g.sql_tempo * 1000, 1),
+            "instrucoes": [
+                {"sql": sql[:500], "vezes": quantidade, "tempo_ms": round(total * 1000, 1)}
+                for sql, (quantidade, total) in sorted(agrupadas.items(), key=lambda item: -item[1][0])[:10]
+            ]
+        }, ensure_ascii=False))
+    return resposta
+
+@app.route('/api/metrics', methods=['GET'])
+def exportar_metricas():
+    return Response(metricas.exportar_texto(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # 🧩 Novo modelo de Usuário para gerenciamento de acesso
 class Usuario(db.Model):
     __tablename__ = 'usuarios'
@@ -40,11 +220,68 @@ class Proprietario(db.Model):
     cpfcnpj = db.Column(db.String(20), nullable=False)
     telefone = db.Column(db.String(20), nullable=False)
 
+# 🔢 Contador de versão por tabela. Toda escrita na planta genérica incrementa
+# a linha 'planta_generica' na mesma transação (e toda escrita em cadastros,
+# a linha 'cadastros'); cada worker compara a versão que tem em cache com esta
+# linha (uma leitura por chave primária) e recarrega quando ela muda.
+# horizonte_sync (cadastros e construções): até qual versao_sync as exclusões
+# já foram podadas (podar_exclusoes).
+class VersaoTabela(db.Model):
+    __tablename__ = 'versoes_tabelas'
+    nome = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    alterado_em = db.Column(db.DateTime)
+    horizonte_sync = db.Column(db.BigInteger)
+
+def agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# 🔄 Versão de sincronização das linhas (e das exclusões): todo INSERT/UPDATE
+# grava em versao_sync o relógio da transação, inclusive nos INSERT/UPDATE em
+# lote, sem travar nenhuma linha compartilhada.
+#   PostgreSQL: o id da transação (txid_current()). Ids não são atribuídos na
+#   ordem dos commits, então quem lê só considera as versões abaixo do
+#   LimiteSync(), o menor id de transação ainda em aberto: tudo abaixo dele
+#   já foi confirmado (ou desfeito) e nenhuma escrita futura fica abaixo dele.
+#   SQLite: uma escrita por vez no banco todo; a versão é a maior já gravada
+#   mais 1, e o limite é esse mesmo valor lido fora de uma escrita.
+class RelogioSync(FunctionElement):
+    type = BigInteger()
+    inherit_cache = True
+
+class LimiteSync(FunctionElement):
+    type = BigInteger()
+    inherit_cache = True
+
+def proxima_versao_sync():
+    maiores = [select(func.max(coluna)).scalar_subquery() for coluna in (
+        CadastroReurb.versao_sync, Construcao.versao_sync, VersaoTabela.horizonte_sync)]
+    maiores += [select(func.max(Exclusao.versao_sync)).where(Exclusao.tabela == nome).scalar_subquery()
+                for nome in TABELAS_SYNC]
+    return func.max(*[func.coalesce(maior, 0) for maior in maiores]) + 1
+
+@compiles(RelogioSync)
+@compiles(LimiteSync)
+def compilar_versao_sync(elemento, compilador, **kw):
+    return compilador.process(proxima_versao_sync(), **kw)
+
+@compiles(RelogioSync, 'postgresql')
+def compilar_relogio_sync_postgresql(elemento, compilador, **kw):
+    return 'txid_current()'
+
+@compiles(LimiteSync, 'postgresql')
+def compilar_limite_sync_postgresql(elemento, compilador, **kw):
+    return 'txid_snapshot_xmin(txid_current_snapshot())'
+
+TABELAS_SYNC = ('cadastros', 'construcoes')
+
+CAMPOS_SINCRONIZACAO = ['versao_sync', 'atualizado_em']
+
 class CadastroReurb(db.Model):
     __tablename__ = 'cadastros_reurb'
     id = db.Column(db.Integer, primary_key=True)
     req_nome = db.Column(db.String(150))
-    req_cpf = db.Column(db.String(20))
+    req_cpf = db.Column(db.String(20), index=True)
     req_rg = db.Column(db.String(20))
     req_data_nasc = db.Column(db.String(20))
     req_nacionalidade = db.Column(db.String(50))
@@ -62,22 +299,21 @@ class CadastroReurb(db.Model):
     req_cidade_atual = db.Column(db.String(100))
     req_uf_atual = db.Column(db.String(2))
     imovel_cep = db.Column(db.String(15))
-    imovel_logradouro = db.Column(db.String(150))
+    imovel_logradouro = db.Column(db.String(150), index=True)
     imovel_numero = db.Column(db.String(20))
     imovel_complemento = db.Column(db.String(100))
-    imovel_bairro = db.Column(db.String(100))
+    imovel_bairro = db.Column(db.String(100), index=True)
     imovel_cidade = db.Column(db.String(100))
     imovel_uf = db.Column(db.String(2))
-    inscricao_imobiliaria = db.Column(db.String(30))
+    inscricao_imobiliaria = db.Column(db.String(30), index=True)
     imovel_area_total = db.Column(db.Float)
     imovel_area_construida = db.Column(db.Float)
     imovel_uso = db.Column(db.String(30))
-    imovel_tipo_construcao = db.Column(db.String(30))
+    imovel_tipo_construcao = db.Column(db.String(30), index=True)
     imovel_data_ocupacao = db.Column(db.String(20))
     imovel_forma_ocupacao = db.Column(db.Text)
-    imovel_docs_posse = db.Column(db.Text)
-    imovel_fotos = db.Column(db.Text)
-    imovel_croqui = db.Column(db.Text)
+    # 📎 imovel_docs_posse, imovel_fotos e imovel_croqui ficam nas tabelas de
+    # anexos (AnexoCadastro / Anexo), fora desta linha
     confrontante_ld = db.Column(db.String(200))
     confrontante_le = db.Column(db.String(200))
     confrontante_fundo = db.Column(db.String(200))
@@ -90,18 +326,81 @@ class CadastroReurb(db.Model):
     reurb_riscos_descricao = db.Column(db.Text)
     reurb_outro_imovel = db.Column(db.String(10))
     reurb_cadunico = db.Column(db.String(10))
+    # 💰 Valores venais persistidos (recalculados quando o cadastro ou a planta genérica mudam)
+    vvt = db.Column(db.Float)
+    vvc = db.Column(db.Float)
+    vvi = db.Column(db.Float)
+    iptu = db.Column(db.Float)
+    # 🔎 Cópias normalizadas (sem acento, minúsculas; CPF só com dígitos) para a busca
+    busca_nome = db.Column(db.String(150))
+    busca_cpf = db.Column(db.String(20))
+    busca_endereco = db.Column(db.String(300))
+    # 🔄 Sincronização incremental (/api/novo_cadastro_reurb/sync)
+    versao_sync = db.Column(db.BigInteger, nullable=False, index=True, server_default='0',
+                            default=RelogioSync(), onupdate=RelogioSync())
+    atualizado_em = db.Column(db.DateTime, default=agora, onupdate=agora)
+
+    __table_args__ = (
+        # No PostgreSQL a busca usa índices de trigramas (pg_trgm), que atendem
+        # LIKE 'termo%' e LIKE '%termo%'; no SQLite fica só o índice do CPF.
+        db.Index('ix_cadastros_reurb_busca_nome_trgm', 'busca_nome',
+                 postgresql_using='gin', postgresql_ops={'busca_nome': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_cadastros_reurb_busca_endereco_trgm', 'busca_endereco',
+                 postgresql_using='gin', postgresql_ops={'busca_endereco': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_cadastros_reurb_busca_cpf', 'busca_cpf', postgresql_ops={'busca_cpf': 'text_pattern_ops'}),
+        # A busca compara a inscrição por prefixo (LIKE 'x%'), o que o índice
+        # comum não atende fora da collation C; ele fica para a ordenação.
+        db.Index('ix_cadastros_reurb_inscricao_prefixo', 'inscricao_imobiliaria',
+                 postgresql_ops={'inscricao_imobiliaria': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
 
 class Construcao(db.Model):
     __tablename__ = 'construcoes'
     id = db.Column(db.Integer, primary_key=True)
-    cadastro_id = db.Column(db.Integer, db.ForeignKey('cadastros_reurb.id'))
+    cadastro_id = db.Column(db.Integer, db.ForeignKey('cadastros_reurb.id'), index=True)
     area_total = db.Column(db.Float)
     area_construida = db.Column(db.Float)
     uso = db.Column(db.String(50))
     padrao = db.Column(db.String(50))
     tipo = db.Column(db.String(50))
+    versao_sync = db.Column(db.BigInteger, nullable=False, index=True, server_default='0',
+                            default=RelogioSync(), onupdate=RelogioSync())
+    atualizado_em = db.Column(db.DateTime, default=agora, onupdate=agora)
     cadastro = db.relationship("CadastroReurb", backref=db.backref("construcoes", lazy=True, cascade="all, delete-orphan"))
 
+# 🪦 Registro das exclusões de cadastros e construções, para que a
+# sincronização incremental avise os clientes do que deixou de existir
+class Exclusao(db.Model):
+    __tablename__ = 'exclusoes'
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(30), nullable=False) # 'cadastros' ou 'construcoes'
+    registro_id = db.Column(db.Integer, nullable=False)
+    versao_sync = db.Column(db.BigInteger, nullable=False, default=RelogioSync())
+    excluido_em = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (db.Index('ix_exclusoes_tabela_versao_sync', 'tabela', 'versao_sync'),)
+
+# 📎 Conteúdo dos anexos, endereçado pelo SHA-256: a mesma imagem enviada em
+# vários cadastros é guardada uma vez só. O conteúdo nunca é carregado junto
+# com os metadados (deferred) e é servido em pedaços por /api/anexos/<hash>.
+class Anexo(db.Model):
+    __tablename__ = 'anexos'
+    hash = db.Column(db.String(64), primary_key=True)
+    mimetype = db.Column(db.String(100), nullable=False)
+    tamanho = db.Column(db.Integer, nullable=False)
+    conteudo = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    criado_em = db.Column(db.DateTime, nullable=False)
+
+class AnexoCadastro(db.Model):
+    __tablename__ = 'anexos_cadastro'
+    id = db.Column(db.Integer, primary_key=True)
+    cadastro_id = db.Column(db.Integer, db.ForeignKey('cadastros_reurb.id'), nullable=False, index=True)
+    campo = db.Column(db.String(30), nullable=False) # 'imovel_fotos', 'imovel_croqui' ou 'imovel_docs_posse'
+    posicao = db.Column(db.Integer, nullable=False, default=0)
+    anexo_hash = db.Column(db.String(64), db.ForeignKey('anexos.hash'), nullable=False, index=True)
+    formato = db.Column(db.String(10), nullable=False) # 'data_url' ou 'texto' (como recompor o valor)
+    mimetype = db.Column(db.String(100), nullable=False) # o declarado neste cadastro (o mesmo conteúdo pode vir com outro)
+    em_lista = db.Column(db.Boolean, nullable=False, default=False) # o campo era uma lista JSON
+
 class PGV(db.Model):
     __tablename__ = 'pgv'
     id = db.Column(Integer, primary_key=True)
@@ -111,13 +410,13 @@ class PGV(db.Model):
 class PadraoConstrutivo(db.Model):
     __tablename__ = 'padroes_construtivos'
     id = db.Column(Integer, primary_key=True)
-    descricao = db.Column(String(150), nullable=False)
+    descricao = db.Column(String(150), nullable=False, index=True)
     valor_m2 = db.Column(Float, nullable=False)
 
 class ValorLogradouro(db.Model):
     __tablename__ = 'valores_logradouro'
     id = db.Column(Integer, primary_key=True)
-    logradouro = db.Column(String(150), nullable=False)
+    logradouro = db.Column(String(150), nullable=False, index=True)
     valor_m2 = db.Column(Float, nullable=False)
 
 class AliquotaIPTU(db.Model):
@@ -126,9 +425,351 @@ class AliquotaIPTU(db.Model):
     tipo = db.Column(db.String(150), nullable=False)
     aliquota = db.Column(db.Float, nullable=False)
 
-# 📦 Criação das tabelas
-with app.app_context():
-    db.create_all()
+def normalizar_texto(valor):
+    if not valor:
+        return None
+    sem_acento = unicodedata.normalize('NFKD', str(valor)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acento.lower().split()) or None
+
+def somente_digitos(valor):
+    digitos = ''.join(ch for ch in str(valor or '') if ch.isdigit())
+    return digitos or None
+
+CAMPOS_BUSCA = ['busca_nome', 'busca_cpf', 'busca_endereco']
+
+def campos_busca(registro):
+    obter = registro.get if isinstance(registro, dict) else lambda campo: getattr(registro, campo)
+    endereco = ' '.join(str(v) for v in (obter('imovel_logradouro'), obter('imovel_numero'), obter('imovel_bairro')) if v)
+    return {
+        'busca_nome': normalizar_texto(obter('req_nome')),
+        'busca_cpf': somente_digitos(obter('req_cpf')),
+        'busca_endereco': (normalizar_texto(endereco) or '')[:300] or None
+    }
+
+@event.listens_for(CadastroReurb, 'before_insert')
+@event.listens_for(CadastroReurb, 'before_update')
+def preencher_campos_busca(mapper, conexao, cadastro):
+    for campo, valor in campos_busca(cadastro).items():
+        setattr(cadastro, campo, valor)
+
+
+# ⏳ Tarefas em segundo plano (importação, exportação, recálculo). O estado
+# fica no banco para que qualquer worker responda às consultas de progresso.
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pendente') # 'pendente', 'executando', 'concluido' ou 'erro'
+    processados = db.Column(db.Integer, nullable=False, default=0)
+    erros = db.Column(db.Integer, nullable=False, default=0)
+    mensagem = db.Column(db.Text)
+    resultado = db.Column(db.Text) # resumo em JSON
+    arquivo_nome = db.Column(db.String(100))
+    arquivo_mimetype = db.Column(db.String(100)) # o arquivo em si fica em JOBS_DIR (caminho_resultado_job)
+    criado_em = db.Column(db.DateTime, nullable=False)
+    atualizado_em = db.Column(db.DateTime, nullable=False)
+    concluido_em = db.Column(db.DateTime)
+
+def versao_atual(nome):
+    versao = db.session.query(VersaoTabela.versao).filter_by(nome=nome).scalar()
+    return versao or 0
+
+def versoes_atuais(*nomes):
+    versoes = dict(db.session.query(VersaoTabela.nome, VersaoTabela.versao).filter(VersaoTabela.nome.in_(nomes)))
+    return tuple(versoes.get(nome) or 0 for nome in nomes)
+
+def marcar_alteracao(nome):
+    # Chamado na transação da escrita. O contador só é incrementado no commit
+    # (gravar_alteracoes_pendentes), para que a nova versão e os dados fiquem
+    # visíveis aos outros workers ao mesmo tempo.
+    db.session.info.setdefault('alteracoes_pendentes', set()).add(nome)
+
+# 🔒 Os contadores marcados na transação são incrementados logo antes do
+# COMMIT, todos juntos e sempre em ordem alfabética: cada linha de
+# versoes_tabelas fica travada só durante o commit, e duas transações nunca
+# esperam uma pela outra em ordens diferentes (o que no PostgreSQL seria um
+# deadlock). Os commits que mexem no mesmo contador ainda passam um de cada
+# vez por ele, mas só pelo UPDATE e o COMMIT, não pela transação inteira.
+@event.listens_for(db.session, 'before_commit')
+def gravar_alteracoes_pendentes(sessao):
+    if sessao.in_nested_transaction():
+        return
+    pendentes = sessao.info.pop('alteracoes_pendentes', None)
+    if not pendentes:
+        return
+    sessao.flush()
+    for nome in sorted(pendentes):
+        atualizados = sessao.query(VersaoTabela).filter_by(nome=nome).update(
+            {VersaoTabela.versao: VersaoTabela.versao + 1, VersaoTabela.alterado_em: agora()},
+            synchronize_session=False
+        )
+        if not atualizados:
+            sessao.add(VersaoTabela(nome=nome, versao=1, alterado_em=agora()))
+            sessao.flush()
+        if nome in TABELAS_SYNC:
+            podar_exclusoes(sessao, nome)
+
+@event.listens_for(db.session, 'after_transaction_end')
+def descartar_alteracoes_pendentes(sessao, transacao):
+    if transacao.parent is None:
+        sessao.info.pop('alteracoes_pendentes', None)
+
+def registrar_exclusoes(nome, ids):
+    # Na mesma transação da exclusão; versao_sync vem do RelogioSync()
+    if ids:
+        db.session.execute(insert(Exclusao), [
+            {"tabela": nome, "registro_id": id_, "excluido_em": agora()} for id_ in ids
+        ])
+
+# 🪦 Poda das exclusões: as mais velhas que SYNC_RETENCAO_EXCLUSOES_DIAS são
+# apagadas e horizonte_sync guarda a maior versão apagada. Um token que parou
+# antes do horizonte pode ter perdido exclusões e recebe 410 (sincronize do
+# zero). Roda no commit de uma escrita na tabela, no máximo uma vez por
+# INTERVALO_PODA_EXCLUSOES em cada worker, com a linha do contador já
+# travada, então só uma poda por tabela roda de cada vez.
+SYNC_RETENCAO_EXCLUSOES = timedelta(days=float(os.environ.get('SYNC_RETENCAO_EXCLUSOES_DIAS', 90)))
+INTERVALO_PODA_EXCLUSOES = 3600
+proxima_poda_exclusoes = {}
+
+def podar_exclusoes(sessao, nome):
+    instante = time.monotonic()
+    if proxima_poda_exclusoes.get(nome, 0) > instante:
+        return
+    proxima_poda_exclusoes[nome] = instante + INTERVALO_PODA_EXCLUSOES
+    horizonte = sessao.query(func.max(Exclusao.versao_sync)) \
+        .filter(Exclusao.tabela == nome, Exclusao.excluido_em < agora() - SYNC_RETENCAO_EXCLUSOES).scalar()
+    if horizonte is None:
+        return
+    sessao.query(Exclusao).filter(Exclusao.tabela == nome, Exclusao.versao_sync <= horizonte) \
+        .delete(synchronize_session=False)
+    sessao.query(VersaoTabela).filter_by(nome=nome).update(
+        {VersaoTabela.horizonte_sync: horizonte}, synchronize_session=False
+    )
+
+# 📄 Paginação por cursor (keyset): a próxima página começa logo depois da
+# última linha entregue, ordenada por (coluna, id). Nulos vão sempre para o fim.
+# Nas listagens, sem 'limit' nem 'cursor' na URL a lista vem inteira, como
+# antes da paginação, para os clientes que só leem o corpo da resposta.
+LIMITE_PADRAO_PAGINA = 100
+LIMITE_MAXIMO_PAGINA = 1000
+
+class ParametroInvalido(ValueError):
+    pass
+
+@app.errorhandler(ParametroInvalido)
+def tratar_parametro_invalido(e):
+    return jsonify({"sucesso": False, "erro": str(e)}), 400
+
+def codificar_cursor(valor, id_):
+    return base64.urlsafe_b64encode(json.dumps([valor, id_]).encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    try:
+        valor, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return valor, int(id_)
+    except Exception:
+        raise ParametroInvalido("Cursor inválido.")
+
+def ler_limite(padrao=LIMITE_PADRAO_PAGINA, maximo=LIMITE_MAXIMO_PAGINA):
+    try:
+        limite = int(request.args.get('limit', padrao))
+    except ValueError:
+        raise ParametroInvalido("O parâmetro 'limit' deve ser um número inteiro.")
+    if limite < 1:
+        raise ParametroInvalido("O parâmetro 'limit' deve ser maior que zero.")
+    return min(limite, maximo)
+
+def ler_limite_listagem():
+    # None (sem limite) quando o cliente não pediu paginação
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+    return ler_limite()
+
+def ler_ordenacao(colunas_ordenaveis, padrao='id'):
+    campo = request.args.get('ordenar', padrao)
+    if campo not in colunas_ordenaveis:
+        raise ParametroInvalido(f"Não é possível ordenar por '{campo}'. Use: {', '.join(colunas_ordenaveis)}")
+    direcao = request.args.get('direcao', 'asc').lower()
+    if direcao not in ('asc', 'desc'):
+        raise ParametroInvalido("O parâmetro 'direcao' deve ser 'asc' ou 'desc'.")
+    return campo, colunas_ordenaveis[campo], direcao == 'desc'
+
+def paginar_keyset(query, coluna, coluna_id, limite, descendente=False):
+    """Aplica cursor, ordenação e limite à query; devolve (linhas, próximo cursor).
+    Com limite None devolve todas as linhas, sem cursor."""
+    cursor = request.args.get('cursor')
+    depois = (lambda a, b: a < b) if descendente else (lambda a, b: a > b)
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor)
+        if coluna is coluna_id:
+            query = query.filter(depois(coluna_id, ultimo_id))
+        elif valor is None:
+            query = query.filter(coluna.is_(None), depois(coluna_id, ultimo_id))
+        else:
+            query = query.filter(or_(
+                depois(coluna, valor),
+                and_(coluna == valor, depois(coluna_id, ultimo_id)),
+                coluna.is_(None)
+            ))
+    if coluna is coluna_id:
+        ordem = [coluna_id.desc() if descendente else coluna_id.asc()]
+    else:
+        ordem = [(coluna.desc() if descendente else coluna.asc()).nulls_last(),
+                 coluna_id.desc() if descendente else coluna_id.asc()]
+    if limite is None:
+        return query.order_by(*ordem).all(), None
+    linhas = query.order_by(*ordem).limit(limite + 1).all()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo = codificar_cursor(getattr(ultima, coluna.key), getattr(ultima, coluna_id.key))
+    return linhas, proximo
+
+def resposta_paginada(lista, proximo_cursor):
+    resposta = resposta_json(lista)
+    if proximo_cursor:
+        resposta.headers['X-Proximo-Cursor'] = proximo_cursor
+    return resposta
+
+# ⚡ Respostas JSON grandes: orjson quando instalado (o jsonify do Flask usa o
+# módulo json da biblioteca padrão e ordena as chaves)
+def serializar_json(dados):
+    if orjson is not None:
+        return orjson.dumps(dados, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def resposta_json(dados, status=200):
+    return app.response_class(serializar_json(dados), status=status, mimetype='application/json')
+
+# 🏷️ GET condicional: o ETag é formado pelas versões (versoes_tabelas) das
+# tabelas de que a resposta depende e o Last-Modified pela última alteração
+# entre elas. Se o cliente já tem essa versão, a resposta é um 304 montado
+# só com a leitura das versões, sem consultar os dados nem serializar nada.
+# As versões são lidas antes dos dados, então o ETag nunca é mais novo que
+# o conteúdo entregue com ele.
+def resposta_condicional(nomes, gerar):
+    marcadores = db.session.query(VersaoTabela.nome, VersaoTabela.versao, VersaoTabela.alterado_em) \
+        .filter(VersaoTabela.nome.in_(nomes)).all()
+    versoes = {m.nome: m.versao for m in marcadores}
+    etag = '-'.join(str(versoes.get(nome) or 0) for nome in nomes)
+    datas = [m.alterado_em for m in marcadores if m.alterado_em]
+    alterado_em = max(datas).replace(tzinfo=timezone.utc, microsecond=0) if datas else None
+
+    # O 304 vale pelo ETag (as versões). O Last-Modified só tem precisão de
+    # segundos e duas escritas no mesmo segundo teriam a mesma data, então o
+    # If-Modified-Since sozinho só casa se a última alteração for de um
+    # segundo estritamente anterior ao informado.
+    if request.if_none_match:
+        nao_modificado = request.if_none_match.contains_weak(etag)
+    else:
+        nao_modificado = (alterado_em is not None and request.if_modified_since is not None
+                          and alterado_em < request.if_modified_since)
+    resposta = app.response_class(status=304) if nao_modificado else gerar()
+    if resposta.status_code in (200, 304):
+        resposta.set_etag(etag, weak=True)
+        if alterado_em:
+            resposta.last_modified = alterado_em
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+# 🗜️ Compressão das respostas JSON/texto acima de COMPRIMIR_A_PARTIR_DE_BYTES:
+# brotli quando o cliente aceita e o módulo está instalado, senão gzip.
+# Downloads (send_file) e respostas em fluxo (CSV) passam sem alteração.
+COMPRIMIR_A_PARTIR_DE_BYTES = int(os.environ.get('COMPRIMIR_A_PARTIR_DE_BYTES', 1024))
+TIPOS_COMPRIMIVEIS = {'application/json', 'text/plain', 'text/html'}
+
+@app.after_request
+def comprimir_resposta(resposta):
+    if (resposta.direct_passthrough or resposta.is_streamed or resposta.status_code in (204, 304)
+            or resposta.status_code < 200 or 'Content-Encoding' in resposta.headers
+            or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+    resposta.vary.add('Accept-Encoding')
+    corpo = resposta.get_data()
+    if len(corpo) < COMPRIMIR_A_PARTIR_DE_BYTES:
+        return resposta
+    codificacoes = request.accept_encodings
+    if brotli is not None and codificacoes['br']:
+        resposta.set_data(brotli.compress(corpo, quality=5))
+        resposta.headers['Content-Encoding'] = 'br'
+    elif codificacoes['gzip']:
+        resposta.set_data(gzip.compress(corpo, compresslevel=6))
+        resposta.headers['Content-Encoding'] = 'gzip'
+    return resposta
+
+# 🔑 Sessões por token (JWT assinado com HS256). O login, que roda o hash da
+# senha, emite um token de acesso curto e um token de renovação; as rotas
+# protegidas só verificam a assinatura do token, sem banco e sem novo hash.
+# A chave é obrigatória: uma chave gerada por processo faria cada worker do
+# gunicorn recusar os tokens emitidos pelos outros (e todo reinício derrubaria
+# as sessões). Sem ela o app sobe (o 'flask db upgrade' do build não precisa
+# dela), mas emitir ou verificar um token falha.
+JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or os.environ.get('SECRET_KEY')
+if not JWT_SECRET_KEY:
+    print("⚠️ JWT_SECRET_KEY (ou SECRET_KEY) não definida: login e rotas protegidas vão falhar até que seja definida.")
+JWT_ALGORITMO = 'HS256'
+JWT_VALIDADE_ACESSO = timedelta(minutes=int(os.environ.get('JWT_ACESSO_MINUTOS', 15)))
+JWT_VALIDADE_RENOVACAO = timedelta(days=int(os.environ.get('JWT_RENOVACAO_DIAS', 7)))
+
+def chave_jwt():
+    if not JWT_SECRET_KEY:
+        raise RuntimeError("Defina a variável de ambiente JWT_SECRET_KEY (ou SECRET_KEY) com a chave de assinatura dos tokens.")
+    return JWT_SECRET_KEY
+
+def emitir_token(usuario, tipo):
+    instante = datetime.now(timezone.utc)
+    validade = JWT_VALIDADE_ACESSO if tipo == 'acesso' else JWT_VALIDADE_RENOVACAO
+    return jwt.encode({
+        "sub": str(usuario.id),
+        "usuario": usuario.usuario,
+        "acesso": usuario.acesso,
+        "tipo": tipo,
+        "iat": instante,
+        "exp": instante + validade,
+        "jti": uuid.uuid4().hex
+    }, chave_jwt(), algorithm=JWT_ALGORITMO)
+
+def tokens_para(usuario):
+    return {
+        "access_token": emitir_token(usuario, 'acesso'),
+        "refresh_token": emitir_token(usuario, 'renovacao'),
+        "token_type": "Bearer",
+        "expira_em": int(JWT_VALIDADE_ACESSO.total_seconds())
+    }
+
+def decodificar_token(token, tipo):
+    dados = jwt.decode(token, chave_jwt(), algorithms=[JWT_ALGORITMO])
+    if dados.get('tipo') != tipo:
+        raise jwt.InvalidTokenError("Tipo de token incorreto")
+    return dados
+
+def token_da_requisicao():
+    cabecalho = request.headers.get('Authorization', '')
+    if cabecalho.startswith('Bearer '):
+        return cabecalho[len('Bearer '):].strip()
+    return None
+
+def requer_acesso(*acessos):
+    """Exige um token de acesso válido; se `acessos` for informado, o
+    Usuario.acesso gravado no token precisa estar entre eles."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def protegida(*args, **kwargs):
+            token = token_da_requisicao()
+            if not token:
+                return jsonify({"sucesso": False, "erro": "Autenticação necessária."}), 401
+            try:
+                g.usuario_token = decodificar_token(token, 'acesso')
+            except jwt.ExpiredSignatureError:
+                return jsonify({"sucesso": False, "erro": "Token expirado."}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({"sucesso": False, "erro": "Token inválido."}), 401
+            if acessos and g.usuario_token.get('acesso') not in acessos:
+                return jsonify({"sucesso": False, "erro": "Acesso negado."}), 403
+            return funcao(*args, **kwargs)
+        return protegida
+    return decorador
 
 # ✅ ROTA DE LOGIN MODIFICADA
 @app.route('/api/login', methods=['POST'])
@@ -139,12 +780,32 @@ def login():
 
     usuario = Usuario.query.filter_by(usuario=usuario_str).first()
     if usuario and check_password_hash(usuario.senha, senha):
-        return jsonify({"sucesso": True, "acesso": usuario.acesso, "mensagem": "Login bem-sucedido!"})
+        return jsonify({"sucesso": True, "acesso": usuario.acesso, "mensagem": "Login bem-sucedido!", **tokens_para(usuario)})
     else:
         return jsonify({"sucesso": False, "mensagem": "Usuário ou senha incorretos."})
 
+@app.route('/api/token/renovar', methods=['POST'])
+def renovar_token():
+    dados = request.get_json(silent=True) or {}
+    token = dados.get('refresh_token') or token_da_requisicao()
+    if not token:
+        return jsonify({"sucesso": False, "erro": "Token de renovação não enviado."}), 400
+    try:
+        conteudo = decodificar_token(token, 'renovacao')
+    except jwt.ExpiredSignatureError:
+        return jsonify({"sucesso": False, "erro": "Token de renovação expirado. Faça login novamente."}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"sucesso": False, "erro": "Token de renovação inválido."}), 401
+    # A renovação consulta o usuário (sem hash de senha) para refletir exclusões
+    # e mudanças de acesso feitas desde o login
+    usuario = Usuario.query.get(int(conteudo['sub']))
+    if not usuario:
+        return jsonify({"sucesso": False, "erro": "Usuário não encontrado."}), 401
+    return jsonify({"sucesso": True, "acesso": usuario.acesso, **tokens_para(usuario)}), 200
+
 # 🚀 ROTAS PARA GERENCIAMENTO DE USUÁRIOS
 @app.route('/api/usuarios', methods=['POST'])
+@requer_acesso('Administrador')
 def criar_usuario():
     dados = request.get_json()
     senha_hash = generate_password_hash(dados['senha'])
@@ -155,21 +816,33 @@ def criar_usuario():
         acesso=dados['acesso']
     )
     db.session.add(novo_usuario)
+    marcar_alteracao('usuarios')
     db.session.commit()
     return jsonify({"sucesso": True, "mensagem": "Usuário criado com sucesso!"}), 201
 
 @app.route('/api/usuarios', methods=['GET'])
+@requer_acesso('Administrador')
 def listar_usuarios():
-    usuarios = Usuario.query.all()
+    colunas_ordenaveis = {'id': Usuario.id, 'nome': Usuario.nome, 'usuario': Usuario.usuario}
+    limite = ler_limite_listagem()
+    _, coluna, descendente = ler_ordenacao(colunas_ordenaveis)
+    return resposta_condicional(['usuarios'], lambda: pagina_usuarios(coluna, limite, descendente))
+
+def pagina_usuarios(coluna, limite, descendente):
+    query = db.session.query(Usuario.id, Usuario.nome, Usuario.usuario, Usuario.acesso)
+    if request.args.get('acesso'):
+        query = query.filter(Usuario.acesso == request.args['acesso'])
+    usuarios, proximo = paginar_keyset(query, coluna, Usuario.id, limite, descendente)
     lista = [{
         "id": u.id,
         "nome": u.nome,
         "usuario": u.usuario,
         "acesso": u.acesso
     } for u in usuarios]
-    return jsonify(lista), 200
+    return resposta_paginada(lista, proximo)
 
 @app.route('/api/usuarios/<int:id>', methods=['PUT'])
+@requer_acesso('Administrador')
 def atualizar_usuario(id):
     dados = request.get_json()
     usuario = Usuario.query.get_or_404(id)
@@ -178,17 +851,21 @@ def atualizar_usuario(id):
     if 'senha' in dados and dados['senha']:
         usuario.senha = generate_password_hash(dados['senha'])
     usuario.acesso = dados['acesso']
+    marcar_alteracao('usuarios')
     db.session.commit()
     return jsonify({"sucesso": True, "mensagem": "Usuário atualizado com sucesso!"}), 200
 
 @app.route('/api/usuarios/<int:id>', methods=['DELETE'])
+@requer_acesso('Administrador')
 def excluir_usuario(id):
     usuario = Usuario.query.get_or_404(id)
     db.session.delete(usuario)
+    marcar_alteracao('usuarios')
     db.session.commit()
     return jsonify({"sucesso": True, "mensagem": "Usuário excluído com sucesso!"}), 200
 
 @app.route('/api/usuarios/<int:id>', methods=['GET'])
+@requer_acesso('Administrador')
 def obter_usuario(id):
     usuario = Usuario.query.get_or_404(id)
     return jsonify({
@@ -198,6 +875,22 @@ def obter_usuario(id):
         "acesso": usuario.acesso
     }), 200
 
+# 👤 Primeiro acesso: as rotas de usuários exigem um Administrador, então o
+# primeiro é criado pela linha de comando, depois do 'flask db upgrade':
+#   flask criar-admin --usuario admin --nome "Administrador"
+@app.cli.command('criar-admin')
+@click.option('--usuario', prompt='Usuário')
+@click.option('--nome', prompt='Nome')
+@click.password_option('--senha', prompt='Senha')
+def criar_admin(usuario, nome, senha):
+    """Cria um usuário Administrador."""
+    if Usuario.query.filter_by(usuario=usuario).first():
+        raise click.ClickException(f"O usuário '{usuario}' já existe.")
+    db.session.add(Usuario(nome=nome, usuario=usuario, senha=generate_password_hash(senha), acesso='Administrador'))
+    marcar_alteracao('usuarios')
+    db.session.commit()
+    click.echo(f"Administrador '{usuario}' criado.")
+
 # Outras rotas permanecem inalteradas
 # ... (manter todas as rotas de Cadastro, Planta Genérica, etc.) ...
 @app.route('/api/health', methods=['GET'])
@@ -211,8 +904,9 @@ def health_check():
 @app.route('/api/novo_cadastro_reurb', methods=['POST'])
 def novo_cadastro_reurb():
     dados = request.get_json()
-    modelo_columns = [c.name for c in CadastroReurb.__table__.columns]
+    modelo_columns = [c.name for c in CadastroReurb.__table__.columns if c.name not in CAMPOS_SINCRONIZACAO]
     dados_filtrados = {key: value for key, value in dados.items() if key in modelo_columns}
+    anexos = {key: value for key, value in dados.items() if key in CAMPOS_ANEXO}
 
     for campo in ['imovel_area_total', 'imovel_area_construida', 'reurb_renda_familiar']:
         if dados_filtrados.get(campo) == "" or dados_filtrados.get(campo) is None:
@@ -224,34 +918,247 @@ def novo_cadastro_reurb():
                 dados_filtrados[campo] = None
     try:
         novo = CadastroReurb(**dados_filtrados)
+        aplicar_avaliacao([novo])
+        marcar_alteracao('cadastros')
         db.session.add(novo)
+        if anexos:
+            db.session.flush()
+            gravar_anexos(novo.id, anexos)
         db.session.commit()
         return jsonify({"sucesso": True, "mensagem": "Cadastro REURB salvo com sucesso!"}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"sucesso": False, "erro": str(e)}), 500
 
+# 🧮 Leitura das tabelas da planta genérica (ordenadas por id, como o .first() original)
+def carregar_planta_generica():
+    return {
+        tipo: [serialize(item) for item in model.query.order_by(model.id).all()]
+        for tipo, (model, serialize) in MODELOS_PLANTA_GENERICA.items()
+    }
+
+def montar_tabelas_planta(linhas):
+    return TabelasPlanta(
+        logradouros=[(i['logradouro'], i['valor_m2']) for i in linhas['logradouros']],
+        padroes=[(i['descricao'], i['valor_m2']) for i in linhas['padroes']],
+        aliquotas=[(i['tipo'], i['aliquota']) for i in linhas['aliquotas']],
+        pgv=[(i['descricao'], i['valor_m2']) for i in linhas['pgv']]
+    )
+
+# 🗃️ Cache em memória (por worker) das tabelas da planta genérica
+class CachePlantaGenerica:
+    # Versão e dados ficam numa única tupla (versão, linhas, tabelas), trocada
+    # inteira sob o lock: quem lê pega sempre um retrato consistente. Não há
+    # invalidação explícita; a comparação com a versão do banco basta.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retrato = None
+        self.acertos = 0
+        self.falhas = 0
+
+    def _atual(self):
+        versao = versao_atual('planta_generica')
+        retrato = self._retrato
+        if retrato is not None and retrato[0] == versao:
+            with self._lock:
+                self.acertos += 1
+            return retrato
+        with self._lock:
+            retrato = self._retrato
+            if retrato is not None and retrato[0] == versao:
+                self.acertos += 1
+                return retrato
+            self.falhas += 1
+            # A versão é lida antes dos dados: se uma escrita entrar no meio,
+            # o cache fica com dados mais novos que a versão e é recarregado
+            # na próxima consulta, nunca o contrário.
+            linhas = carregar_planta_generica()
+            self._retrato = retrato = (versao, linhas, montar_tabelas_planta(linhas))
+            return retrato
+
+    def tabelas(self):
+        return self._atual()[2]
+
+    def linhas(self, tipo):
+        return self._atual()[1][tipo]
+
+    def estatisticas(self):
+        with self._lock:
+            retrato, acertos, falhas = self._retrato, self.acertos, self.falhas
+        total = acertos + falhas
+        return {
+            "versao": retrato[0] if retrato else None,
+            "acertos": acertos,
+            "falhas": falhas,
+            "taxa_acerto": (acertos / total) if total else None
+        }
+
+cache_planta = CachePlantaGenerica()
+
+# 🏗️ VVC dos cadastros com várias construções: uma única consulta agregada
+# (construcoes × padroes_construtivos, GROUP BY cadastro) para todo o lote
+def padroes_vigentes():
+    # Valor do m² de cada padrão: a primeira linha (menor id) por descrição,
+    # como o .first() original
+    return db.session.query(PadraoConstrutivo.descricao, PadraoConstrutivo.valor_m2).filter(
+        PadraoConstrutivo.id.in_(select(func.min(PadraoConstrutivo.id)).group_by(PadraoConstrutivo.descricao))
+    ).subquery()
+
+def vvc_das_construcoes(ids):
+    """{cadastro_id: soma de área construída × valor do m² do padrão} para os
+    cadastros da lista que têm construções."""
+    ids = sorted({i for i in ids if i is not None})
+    if not ids:
+        return {}
+    padroes = padroes_vigentes()
+    parcela = func.coalesce(Construcao.area_construida * padroes.c.valor_m2, 0.0)
+    linhas = db.session.query(Construcao.cadastro_id, func.sum(parcela)) \
+        .outerjoin(padroes, and_(padroes.c.descricao == Construcao.padrao, Construcao.padrao != '')) \
+        .filter(Construcao.cadastro_id.in_(ids)) \
+        .group_by(Construcao.cadastro_id).all()
+    return {cadastro_id: float(soma or 0.0) for cadastro_id, soma in linhas}
+
+def avaliar_cadastros(cadastros, tabelas):
+    # avaliar_registros para cadastros já gravados (com id), somando as construções
+    somas = vvc_das_construcoes([cad.id for cad in cadastros])
+    return avaliar_registros(cadastros, tabelas, [somas.get(cad.id) for cad in cadastros])
+
+# 💰 Manutenção incremental dos valores venais persistidos em cadastros_reurb
+def aplicar_avaliacao(cadastros, tabelas=None):
+    # Avalia objetos CadastroReurb ainda não gravados (ou alterados) da sessão
+    if not cadastros:
+        return
+    tabelas = tabelas or cache_planta.tabelas()
+    for cad, av in zip(cadastros, avaliar_cadastros(cadastros, tabelas)):
+        for campo in CAMPOS_VALOR_VENAL:
+            setattr(cad, campo, av[campo])
+
+def recalcular_valores(filtro=None, tabelas=None, tamanho_lote=2000, progresso=None):
+    """Recalcula os valores venais dos cadastros que atendem ao filtro (todos,
+    se nenhum), em lotes por id, e grava só os que mudaram (para não mandar à
+    sincronização cadastros iguais). Não faz commit (a não ser que o callback
+    de progresso o faça)."""
+    tabelas = tabelas or cache_planta.tabelas()
+    query = db.session.query(CadastroReurb.id, *[getattr(CadastroReurb, c) for c in COLUNAS_AVALIACAO],
+                             *[getattr(CadastroReurb, c) for c in CAMPOS_VALOR_VENAL])
+    if filtro is not None:
+        query = query.filter(filtro)
+    total = 0
+    ultimo_id = 0
+    while True:
+        lote = query.filter(CadastroReurb.id > ultimo_id).order_by(CadastroReurb.id).limit(tamanho_lote).all()
+        if not lote:
+            break
+        avaliacoes = avaliar_cadastros(lote, tabelas)
+        alterados = [
+            {"id": cad.id, **{campo: av[campo] for campo in CAMPOS_VALOR_VENAL}}
+            for cad, av in zip(lote, avaliacoes)
+            if any(getattr(cad, campo) != av[campo] for campo in CAMPOS_VALOR_VENAL)
+        ]
+        if alterados:
+            marcar_alteracao('cadastros')
+            db.session.execute(update(CadastroReurb), alterados)
+        total += len(lote)
+        ultimo_id = lote[-1].id
+        if progresso:
+            progresso(total)
+    return total
+
+def filtro_afetados_planta(tipo, chaves):
+    # Quais cadastros dependem das linhas alteradas da planta genérica
+    chaves = [c for c in chaves if c is not None]
+    if not chaves:
+        return None
+    if tipo == 'logradouros':
+        return CadastroReurb.imovel_logradouro.in_(chaves)
+    if tipo == 'padroes':
+        return or_(CadastroReurb.imovel_tipo_construcao.in_(chaves),
+                   CadastroReurb.id.in_(select(Construcao.cadastro_id).where(Construcao.padrao.in_(chaves))))
+    if tipo == 'aliquotas':
+        usos = [uso for (uso,) in db.session.query(CadastroReurb.imovel_uso).distinct()
+                if uso and any(padrao_ilike(uso).fullmatch(t) for t in chaves)]
+        return CadastroReurb.imovel_uso.in_(usos) if usos else None
+    return None  # PGV não entra no cálculo
+
+def recalcular_afetados_planta(tipo, chaves):
+    filtro = filtro_afetados_planta(tipo, chaves)
+    if filtro is None:
+        return 0
+    # Dentro da transação da escrita: as tabelas são lidas da própria sessão,
+    # sem passar pelo cache, para enxergar a alteração ainda não confirmada.
+    db.session.flush()
+    return recalcular_valores(filtro, montar_tabelas_planta(carregar_planta_generica()))
+
+def recalcular_apos_construcoes(cadastro_ids):
+    # O VVC depende das construções: reavalia os cadastros cujas construções mudaram
+    db.session.flush()
+    return recalcular_valores(CadastroReurb.id.in_(set(cadastro_ids)))
+
+COLUNAS_LISTAGEM_CADASTRO = [
+    CadastroReurb.id, CadastroReurb.req_nome, CadastroReurb.req_cpf, CadastroReurb.req_rg,
+    CadastroReurb.req_telefone, CadastroReurb.req_email, CadastroReurb.imovel_logradouro,
+    CadastroReurb.imovel_numero, CadastroReurb.imovel_bairro, CadastroReurb.inscricao_imobiliaria,
+    CadastroReurb.imovel_area_total, CadastroReurb.imovel_area_construida,
+    CadastroReurb.imovel_tipo_construcao, CadastroReurb.imovel_uso, CadastroReurb.reurb_renda_familiar,
+    CadastroReurb.vvt, CadastroReurb.vvc, CadastroReurb.vvi, CadastroReurb.iptu
+]
+
+ORDENACAO_CADASTRO = {
+    'id': CadastroReurb.id,
+    'nome': CadastroReurb.req_nome,
+    'cpf': CadastroReurb.req_cpf,
+    'bairro': CadastroReurb.imovel_bairro,
+    'logradouro': CadastroReurb.imovel_logradouro,
+    'inscricao_imobiliaria': CadastroReurb.inscricao_imobiliaria,
+    'area_total': CadastroReurb.imovel_area_total,
+    'renda_familiar': CadastroReurb.reurb_renda_familiar
+}
+
+def filtrar_cadastros(query, args):
+    # Filtros de igualdade simples, todos aplicados no banco
+    filtros_exatos = {
+        'bairro': CadastroReurb.imovel_bairro,
+        'logradouro': CadastroReurb.imovel_logradouro,
+        'cpf': CadastroReurb.req_cpf,
+        'inscricao_imobiliaria': CadastroReurb.inscricao_imobiliaria
+    }
+    for parametro, coluna in filtros_exatos.items():
+        if args.get(parametro):
+            query = query.filter(coluna == args[parametro])
+
+    tipo_reurb = args.get('tipo_reurb')
+    if tipo_reurb:
+        renda = CadastroReurb.reurb_renda_familiar
+        reurb_s = and_(renda.isnot(None), renda != 0, renda <= LIMITE_RENDA_REURB_S)
+        if tipo_reurb == 'REURB-S':
+            query = query.filter(reurb_s)
+        elif tipo_reurb == 'REURB-E':
+            query = query.filter(or_(renda.is_(None), renda == 0, renda > LIMITE_RENDA_REURB_S))
+        else:
+            raise ParametroInvalido("O parâmetro 'tipo_reurb' deve ser 'REURB-S' ou 'REURB-E'.")
+    return query
+
 @app.route('/api/novo_cadastro_reurb/listar', methods=['GET'])
 def listar_cadastros_reurb():
-    todos = CadastroReurb.query.all()
+    limite = ler_limite_listagem()
+    _, coluna, descendente = ler_ordenacao(ORDENACAO_CADASTRO)
+    query = filtrar_cadastros(db.session.query(*COLUNAS_LISTAGEM_CADASTRO), request.args)
+    return resposta_condicional(['cadastros', 'planta_generica'],
+                                lambda: pagina_cadastros(query, coluna, limite, descendente))
+
+def pagina_cadastros(query, coluna, limite, descendente):
+    # Só a página pedida é carregada; os valores venais vêm das colunas
+    # persistidas. Cadastros ainda sem valor gravado (anteriores ao recálculo
+    # inicial) são avaliados na hora.
+    todos, proximo = paginar_keyset(query, coluna, CadastroReurb.id, limite, descendente)
+    pendentes = [cad for cad in todos if cad.vvi is None]
+    avaliados = {}
+    if pendentes:
+        avaliados = dict(zip([cad.id for cad in pendentes], avaliar_cadastros(pendentes, cache_planta.tabelas())))
     lista = []
 
     for cad in todos:
-        vvt, vvc, vvi, iptu = 0.0, 0.0, 0.0, 0.0
-        try:
-            if cad.imovel_logradouro and cad.imovel_area_total:
-                valor_m2_terreno = ValorLogradouro.query.filter_by(logradouro=cad.imovel_logradouro).first()
-                if valor_m2_terreno: vvt = cad.imovel_area_total * valor_m2_terreno.valor_m2
-            if cad.imovel_tipo_construcao and cad.imovel_area_construida:
-                padrao_construtivo = PadraoConstrutivo.query.filter_by(descricao=cad.imovel_tipo_construcao).first()
-                if padrao_construtivo: vvc = cad.imovel_area_construida * padrao_construtivo.valor_m2
-            vvi = vvt + vvc
-            if cad.imovel_uso and vvi > 0:
-                aliquota_iptu = AliquotaIPTU.query.filter(AliquotaIPTU.tipo.ilike(f"%{cad.imovel_uso}%")).first()
-                if aliquota_iptu: iptu = vvi * (aliquota_iptu.aliquota / 100.0)
-        except Exception as e:
-            print(f"Erro ao calcular VVI/IPTU para o cadastro ID {cad.id}: {e}")
-
+        av = avaliados.get(cad.id) or {campo: getattr(cad, campo) for campo in CAMPOS_VALOR_VENAL}
         lista.append({
             "id": cad.id, "nome": cad.req_nome, "cpf": cad.req_cpf, "rg": cad.req_rg,
             "telefone": cad.req_telefone, "email": cad.req_email,
@@ -259,25 +1166,373 @@ def listar_cadastros_reurb():
             "inscricao_imobiliaria": cad.inscricao_imobiliaria,
             "area_total": cad.imovel_area_total, "area_construida": cad.imovel_area_construida,
             "renda_familiar": cad.reurb_renda_familiar,
-            "vvt": vvt,
-            "vvc": vvc,
-            "vvi": vvi,
-            "iptu": iptu,
-            "tipo_reurb": "REURB-S" if cad.reurb_renda_familiar and cad.reurb_renda_familiar <= 4000 else "REURB-E"
+            "vvt": av["vvt"],
+            "vvc": av["vvc"],
+            "vvi": av["vvi"],
+            "iptu": av["iptu"],
+            "tipo_reurb": classificar_reurb(cad.reurb_renda_familiar)
         })
-    return jsonify(lista), 200
+    return resposta_paginada(lista, proximo)
+
+# 🔄 Sincronização incremental: o token guarda, para cadastros e para
+# construções, a posição (versao_sync, id) até a qual o cliente já está em
+# dia. A resposta traz as linhas criadas ou alteradas depois disso (com os
+# valores venais), os ids excluídos e o token novo; sem token, vem a base
+# inteira. Aplique as exclusões antes das linhas e, com "mais": true, peça
+# de novo com o token recebido. Só entram versões abaixo do LimiteSync():
+# no PostgreSQL, uma transação de escrita longa (mesmo de outro banco do
+# servidor) segura a sincronização de todos até terminar.
+LIMITE_PADRAO_SYNC = 1000
+LIMITE_MAXIMO_SYNC = 5000
+
+COLUNAS_SYNC_CADASTRO = [c for c in CadastroReurb.__table__.columns if c.name not in CAMPOS_BUSCA]
+COLUNAS_SYNC_CONSTRUCAO = list(Construcao.__table__.columns)
+
+# Tokens de antes do RelogioSync (sem 'v') trazem versões de outra escala.
+# 'inicio' é o LimiteSync() da primeira página, sem token: as exclusões
+# abaixo dele são de linhas que o cliente nunca recebeu.
+FORMATO_TOKEN_SYNC = 2
+
+def codificar_token_sync(posicoes):
+    return base64.urlsafe_b64encode(json.dumps({'v': FORMATO_TOKEN_SYNC, **posicoes}).encode('utf-8')).decode('ascii')
+
+def decodificar_token_sync(token):
+    # Posição [versão, id]: id nulo quer dizer que a versão foi entregue inteira.
+    # Devolve None para um token de formato antigo.
+    if not token:
+        return {'cadastros': (-1, None), 'construcoes': (-1, None), 'inicio': None}
+    try:
+        posicoes = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        if posicoes.get('v') != FORMATO_TOKEN_SYNC:
+            return None
+        return {**{nome: (int(posicoes[nome][0]), None if posicoes[nome][1] is None else int(posicoes[nome][1]))
+                   for nome in TABELAS_SYNC},
+                'inicio': int(posicoes['inicio'])}
+    except Exception:
+        raise ParametroInvalido("Token de sincronização inválido.")
+
+def versao_completa(posicao):
+    # Última versão que o cliente já recebeu inteira
+    versao, id_ = posicao
+    return versao if id_ is None else versao - 1
+
+def faixa_sincronizacao(modelo, colunas, posicao, limite_versao, limite):
+    """Próximas linhas depois de `posicao` e abaixo de `limite_versao`, em
+    ordem de (versao_sync, id). Devolve (linhas, nova posição)."""
+    versao, id_ = posicao
+    depois = modelo.versao_sync > versao
+    if id_ is not None:
+        depois = or_(depois, and_(modelo.versao_sync == versao, modelo.id > id_))
+    linhas = db.session.execute(
+        select(*colunas).where(depois, modelo.versao_sync < limite_versao)
+        .order_by(modelo.versao_sync, modelo.id).limit(limite + 1)
+    ).all()
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        return linhas, (linhas[-1].versao_sync, linhas[-1].id)
+    return linhas, (limite_versao - 1, None)
+
+def exclusoes_sincronizacao(nome, desde, nova_posicao):
+    return list(db.session.scalars(
+        select(Exclusao.registro_id)
+        .where(Exclusao.tabela == nome, Exclusao.versao_sync > desde,
+               Exclusao.versao_sync <= versao_completa(nova_posicao))
+        .order_by(Exclusao.versao_sync, Exclusao.id)
+    ))
+
+def registro_sincronizacao(linha):
+    registro = dict(linha._mapping)
+    if registro['atualizado_em'] is not None:
+        registro['atualizado_em'] = registro['atualizado_em'].isoformat()
+    return registro
+
+@app.route('/api/novo_cadastro_reurb/sync', methods=['GET'])
+def sincronizar_cadastros():
+    since = request.args.get('since')
+    posicoes = decodificar_token_sync(since)
+    if posicoes is None:
+        return jsonify({"sucesso": False, "erro": "Token de sincronização de formato antigo. Sincronize do zero."}), 410
+    limite = ler_limite(LIMITE_PADRAO_SYNC, LIMITE_MAXIMO_SYNC)
+    # O limite é lido antes das linhas: o que for confirmado depois fica para
+    # a próxima sincronização
+    limite_versao = db.session.scalar(select(LimiteSync()))
+    inicio = posicoes['inicio'] if since else limite_versao
+    if inicio > limite_versao or any(posicoes[nome][0] >= limite_versao for nome in TABELAS_SYNC):
+        return jsonify({"sucesso": False, "erro": "Token de sincronização mais novo que a base. Sincronize do zero."}), 410
+
+    cadastros, nova_cadastros = faixa_sincronizacao(
+        CadastroReurb, COLUNAS_SYNC_CADASTRO, posicoes['cadastros'], limite_versao, limite)
+    construcoes, nova_construcoes = faixa_sincronizacao(
+        Construcao, COLUNAS_SYNC_CONSTRUCAO, posicoes['construcoes'], limite_versao, limite)
+    # Exclusões que o cliente ainda não recebeu, de linhas que ele pode ter.
+    # Na primeira página (sem token) ele ainda não tem nada a apagar.
+    desde = {nome: max(versao_completa(posicoes[nome]), inicio - 1) for nome in TABELAS_SYNC}
+    excluidos = {
+        nome: exclusoes_sincronizacao(nome, desde[nome], nova) if since else []
+        for nome, nova in (('cadastros', nova_cadastros), ('construcoes', nova_construcoes))
+    }
+    # O horizonte é lido depois das exclusões: uma poda que entre no meio
+    # aparece aqui e o token é recusado, em vez de faltar exclusão na resposta
+    if since:
+        horizontes = dict(db.session.query(VersaoTabela.nome, VersaoTabela.horizonte_sync)
+                          .filter(VersaoTabela.nome.in_(TABELAS_SYNC)))
+        if any(horizontes.get(nome) is not None and desde[nome] < horizontes[nome] for nome in TABELAS_SYNC):
+            return jsonify({"sucesso": False, "erro": "Token de sincronização anterior às exclusões guardadas. Sincronize do zero."}), 410
+
+    pendentes = [cad for cad in cadastros if cad.vvi is None]
+    avaliados = {}
+    if pendentes:
+        avaliados = dict(zip([cad.id for cad in pendentes], avaliar_cadastros(pendentes, cache_planta.tabelas())))
+    lista_cadastros = []
+    for cad in cadastros:
+        registro = registro_sincronizacao(cad)
+        registro.update(avaliados.get(cad.id, {}))
+        registro['tipo_reurb'] = classificar_reurb(cad.reurb_renda_familiar)
+        lista_cadastros.append(registro)
+
+    return resposta_json({
+        "cadastros": lista_cadastros,
+        "construcoes": [registro_sincronizacao(c) for c in construcoes],
+        "excluidos": excluidos,
+        "token": codificar_token_sync({'cadastros': nova_cadastros, 'construcoes': nova_construcoes, 'inicio': inicio}),
+        "mais": nova_cadastros[1] is not None or nova_construcoes[1] is not None
+    })
+
+# 🔎 Busca rápida por nome, CPF ou endereço, sem acento e por prefixo de palavra
+LIMITE_PADRAO_BUSCA = 20
+LIMITE_MAXIMO_BUSCA = 100
+
+def escapar_like(termo):
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def filtro_prefixo_palavra(coluna, termo):
+    # 'termo%' casa o início do campo; '% termo%' o início de qualquer palavra.
+    # Termos curtos ficam só no prefixo (o índice de trigramas precisa de 3 letras).
+    padrao = escapar_like(termo)
+    condicoes = [coluna.like(f"{padrao}%", escape='\\')]
+    if len(termo) >= 3:
+        condicoes.append(coluna.like(f"% {padrao}%", escape='\\'))
+    return or_(*condicoes)
+
+@app.route('/api/novo_cadastro_reurb/buscar', methods=['GET'])
+def buscar_cadastros_reurb():
+    termo = (request.args.get('q') or '').strip()
+    if not termo:
+        return jsonify({"sucesso": False, "erro": "Informe o termo de busca no parâmetro 'q'."}), 400
+    campo = request.args.get('campo', 'todos')
+    if campo not in ('todos', 'nome', 'cpf', 'endereco'):
+        raise ParametroInvalido("O parâmetro 'campo' deve ser 'todos', 'nome', 'cpf' ou 'endereco'.")
+    try:
+        limite = min(max(int(request.args.get('limit', LIMITE_PADRAO_BUSCA)), 1), LIMITE_MAXIMO_BUSCA)
+    except ValueError:
+        raise ParametroInvalido("O parâmetro 'limit' deve ser um número inteiro.")
+
+    texto = normalizar_texto(termo)
+    digitos = somente_digitos(termo)
+    condicoes = []
+    if campo in ('todos', 'nome') and texto:
+        condicoes.append(filtro_prefixo_palavra(CadastroReurb.busca_nome, texto))
+    if campo in ('todos', 'endereco') and texto:
+        condicoes.append(filtro_prefixo_palavra(CadastroReurb.busca_endereco, texto))
+    if campo in ('todos', 'cpf') and digitos and (campo == 'cpf' or len(digitos) >= 3):
+        condicoes.append(CadastroReurb.busca_cpf.like(f"{digitos}%"))
+        condicoes.append(CadastroReurb.inscricao_imobiliaria.like(f"{escapar_like(termo)}%", escape='\\'))
+    if not condicoes:
+        return jsonify([]), 200
+
+    resultados = (db.session.query(
+            CadastroReurb.id, CadastroReurb.req_nome, CadastroReurb.req_cpf, CadastroReurb.imovel_logradouro,
+            CadastroReurb.imovel_numero, CadastroReurb.imovel_bairro, CadastroReurb.inscricao_imobiliaria,
+            CadastroReurb.vvi, CadastroReurb.iptu)
+        .filter(or_(*condicoes))
+        .order_by(CadastroReurb.busca_nome.asc().nulls_last(), CadastroReurb.id)
+        .limit(limite)
+        .all())
+    return jsonify([{
+        "id": r.id, "nome": r.req_nome, "cpf": r.req_cpf,
+        "endereco": f"{r.imovel_logradouro or ''}, {r.imovel_numero or ''}",
+        "bairro": r.imovel_bairro, "inscricao_imobiliaria": r.inscricao_imobiliaria,
+        "vvi": r.vvi, "iptu": r.iptu
+    } for r in resultados]), 200
+
+# 📎 Anexos (fotos, croqui e documentos de posse) ficam fora da linha do
+# cadastro: o conteúdo, decodificado e sem repetição, na tabela anexos; as
+# referências, na ordem original, em anexos_cadastro. O GET do cadastro só
+# devolve metadados e URLs, a não ser que ?campos= peça o texto de um campo.
+TAMANHO_PEDACO_ANEXO = 256 * 1024
+# Servidos inline; os demais (SVG, HTML...) vão como download
+MIMETYPES_INLINE = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'application/pdf', 'text/plain'}
+
+def remover_vinculos_anexos(cadastro_ids, campos=None):
+    """Apaga as referências e devolve os hashes que elas usavam."""
+    filtro = AnexoCadastro.cadastro_id.in_(cadastro_ids)
+    if campos is not None:
+        filtro = and_(filtro, AnexoCadastro.campo.in_(campos))
+    hashes = set(db.session.scalars(select(AnexoCadastro.anexo_hash).where(filtro)))
+    if hashes:
+        AnexoCadastro.query.filter(filtro).delete(synchronize_session=False)
+    return hashes
+
+def insert_sem_conflito(modelo):
+    """INSERT ... ON CONFLICT DO NOTHING, no PostgreSQL e no SQLite."""
+    dialeto = db.session.get_bind().dialect.name
+    return {'postgresql': insert_postgresql, 'sqlite': insert_sqlite}[dialeto](modelo).on_conflict_do_nothing()
+
+def coletar_anexos_orfaos(hashes):
+    if hashes:
+        # Trava os candidatos antes de apagar, pulando os que outra transação
+        # segura: gravar_anexos trava com FOR KEY SHARE o conteúdo que está
+        # vinculando, que portanto não é órfão (esperar por ela levaria a
+        # deadlock quando duas requisições trocam anexos entre si). O DELETE,
+        # numa instrução nova, ainda confere os vínculos já gravados.
+        candidatos = list(db.session.scalars(
+            select(Anexo.hash).where(Anexo.hash.in_(hashes)).with_for_update(skip_locked=True)))
+        if candidatos:
+            em_uso = select(AnexoCadastro.anexo_hash).where(AnexoCadastro.anexo_hash.in_(candidatos))
+            Anexo.query.filter(Anexo.hash.in_(candidatos), Anexo.hash.not_in(em_uso)).delete(synchronize_session=False)
+
+def gravar_anexos(cadastro_id, valores):
+    """Substitui os anexos dos campos em `valores` ({campo: texto}); vazio ou None remove o campo."""
+    antigos = remover_vinculos_anexos([cadastro_id], list(valores))
+    conteudos = {}
+    vinculos = []
+    for campo, valor in valores.items():
+        if valor is None or valor == '':
+            continue
+        if not isinstance(valor, str):
+            valor = json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+        partes, em_lista = decompor(valor)
+        for posicao, (conteudo, mimetype, formato) in enumerate(partes):
+            hash_ = hash_anexo(conteudo)
+            conteudos.setdefault(hash_, (conteudo, mimetype))
+            vinculos.append({"cadastro_id": cadastro_id, "campo": campo, "posicao": posicao, "anexo_hash": hash_,
+                             "formato": formato, "mimetype": mimetype, "em_lista": em_lista})
+    if conteudos:
+        # O conteúdo é gravado com ON CONFLICT DO NOTHING (outra requisição pode
+        # estar gravando o mesmo) e depois travado com FOR KEY SHARE, para que a
+        # coleta de órfãos de outra transação não o apague antes dos vínculos;
+        # o que ela apagou entre as duas instruções é gravado de novo.
+        pendentes = sorted(conteudos)
+        while pendentes:
+            db.session.execute(insert_sem_conflito(Anexo), [
+                {"hash": hash_, "mimetype": conteudos[hash_][1], "tamanho": len(conteudos[hash_][0]),
+                 "conteudo": conteudos[hash_][0], "criado_em": agora()}
+                for hash_ in pendentes])
+            travados = set(db.session.scalars(
+                select(Anexo.hash).where(Anexo.hash.in_(pendentes)).order_by(Anexo.hash)
+                .with_for_update(key_share=True)))
+            pendentes = [hash_ for hash_ in pendentes if hash_ not in travados]
+        db.session.execute(insert(AnexoCadastro), vinculos)
+    coletar_anexos_orfaos(antigos - set(conteudos))
+
+def valores_anexos(cadastro_ids, campos=CAMPOS_ANEXO):
+    """Texto original dos campos de anexo, numa única consulta: {cadastro_id: {campo: texto}}."""
+    linhas = db.session.execute(
+        select(AnexoCadastro.cadastro_id, AnexoCadastro.campo, AnexoCadastro.formato, AnexoCadastro.mimetype,
+               AnexoCadastro.em_lista, Anexo.conteudo)
+        .join(Anexo, Anexo.hash == AnexoCadastro.anexo_hash)
+        .where(AnexoCadastro.cadastro_id.in_(cadastro_ids), AnexoCadastro.campo.in_(campos))
+        .order_by(AnexoCadastro.cadastro_id, AnexoCadastro.campo, AnexoCadastro.posicao)
+    )
+    partes = {}
+    for linha in linhas:
+        em_lista, lista = partes.setdefault((linha.cadastro_id, linha.campo), (linha.em_lista, []))
+        lista.append((linha.conteudo, linha.mimetype, linha.formato))
+    valores = {}
+    for (cadastro_id, campo), (em_lista, lista) in partes.items():
+        valores.setdefault(cadastro_id, {})[campo] = recompor(lista, em_lista)
+    return valores
+
+def metadados_anexos(cadastro_id):
+    linhas = db.session.execute(
+        select(AnexoCadastro.campo, AnexoCadastro.mimetype, Anexo.hash, Anexo.tamanho)
+        .join(Anexo, Anexo.hash == AnexoCadastro.anexo_hash)
+        .where(AnexoCadastro.cadastro_id == cadastro_id)
+        .order_by(AnexoCadastro.campo, AnexoCadastro.posicao)
+    )
+    anexos = {campo: [] for campo in CAMPOS_ANEXO}
+    for linha in linhas:
+        anexos[linha.campo].append({"hash": linha.hash, "mimetype": linha.mimetype,
+                                    "tamanho": linha.tamanho, "url": f"/api/anexos/{linha.hash}"})
+    return anexos
 
 @app.route('/api/novo_cadastro_reurb/<int:id>', methods=['GET'])
 def obter_cadastro_reurb(id):
+    # ?campos=req_nome,imovel_fotos,anexos limita a resposta a esses campos
+    colunas = [c.name for c in CadastroReurb.__table__.columns if c.name not in CAMPOS_BUSCA]
+    pedidos = [c.strip() for c in request.args.get('campos', '').split(',') if c.strip()]
+    invalidos = [c for c in pedidos if c not in colunas + CAMPOS_ANEXO + ['anexos']]
+    if invalidos:
+        raise ParametroInvalido(f"Campos inválidos: {', '.join(invalidos)}")
+    if pedidos:
+        colunas = ['id'] + [c for c in pedidos if c in colunas and c != 'id']
     try:
-        cadastro = CadastroReurb.query.get(id)
+        cadastro = db.session.execute(
+            select(*[getattr(CadastroReurb, c) for c in colunas]).where(CadastroReurb.id == id)
+        ).first()
         if not cadastro:
             return jsonify({"sucesso": False, "erro": "Cadastro não encontrado"}), 404
-        dados_cadastro = {c.name: getattr(cadastro, c.name) for c in cadastro.__table__.columns}
+        dados_cadastro = dict(cadastro._mapping)
+        campos_anexo = [c for c in pedidos if c in CAMPOS_ANEXO]
+        if campos_anexo:
+            textos = valores_anexos([id], campos_anexo).get(id, {})
+            dados_cadastro.update({campo: textos.get(campo) for campo in campos_anexo})
+        if not pedidos or 'anexos' in pedidos:
+            dados_cadastro['anexos'] = metadados_anexos(id)
         return jsonify(dados_cadastro), 200
     except Exception as e:
         return jsonify({"sucesso": False, "erro": str(e)}), 500
 
+@app.route('/api/novo_cadastro_reurb/<int:id>/anexos', methods=['GET'])
+def listar_anexos_cadastro(id):
+    if db.session.get(CadastroReurb, id) is None:
+        return jsonify({"sucesso": False, "erro": "Cadastro não encontrado"}), 404
+    return jsonify(metadados_anexos(id)), 200
+
+# 📎 Conteúdo de um anexo, lido do banco em pedaços de TAMANHO_PEDACO_ANEXO.
+# O hash é o próprio ETag (o conteúdo nunca muda), então o navegador pode
+# guardar a resposta indefinidamente; Range permite retomar downloads e
+# exibir PDFs grandes aos poucos.
+@app.route('/api/anexos/<string:hash_>', methods=['GET'])
+def baixar_anexo(hash_):
+    anexo = db.session.execute(
+        select(Anexo.hash, Anexo.mimetype, Anexo.tamanho).where(Anexo.hash == hash_)
+    ).first()
+    if not anexo:
+        return jsonify({"sucesso": False, "erro": "Anexo não encontrado"}), 404
+    inline = anexo.mimetype.split(';')[0].strip().lower() in MIMETYPES_INLINE
+    cabecalhos = {
+        'ETag': f'"{anexo.hash}"',
+        'Cache-Control': 'private, max-age=31536000, immutable',
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+        'Content-Disposition': 'inline' if inline else f'attachment; filename={anexo.hash[:16]}'
+    }
+    if request.if_none_match.contains_weak(anexo.hash):
+        return Response(status=304, headers=cabecalhos)
+
+    inicio, fim, status = 0, anexo.tamanho, 200
+    if request.range and request.if_range.etag in (None, anexo.hash) and request.if_range.date is None:
+        intervalo = request.range.range_for_length(anexo.tamanho)
+        if intervalo is None:
+            cabecalhos['Content-Range'] = f'bytes */{anexo.tamanho}'
+            return Response(status=416, headers=cabecalhos)
+        inicio, fim = intervalo
+        status = 206
+        cabecalhos['Content-Range'] = f'bytes {inicio}-{fim - 1}/{anexo.tamanho}'
+    cabecalhos['Content-Length'] = str(fim - inicio)
+
+    def pedacos():
+        for posicao in range(inicio, fim, TAMANHO_PEDACO_ANEXO):
+            tamanho = min(TAMANHO_PEDACO_ANEXO, fim - posicao)
+            pedaco = db.session.execute(
+                select(func.substr(Anexo.conteudo, posicao + 1, tamanho)).where(Anexo.hash == hash_)
+            ).scalar()
+            yield bytes(pedaco)
+
+    return Response(stream_with_context(pedacos()), status=status, headers=cabecalhos,
+                    content_type=anexo.mimetype if inline else 'application/octet-stream')
+
 @app.route('/api/novo_cadastro_reurb/<int:id>', methods=['PUT'])
 def atualizar_cadastro_reurb(id):
     try:
@@ -285,6 +1540,8 @@ def atualizar_cadastro_reurb(id):
         if not cadastro:
             return jsonify({"sucesso": False, "erro": "Cadastro não encontrado"}), 404
         dados = request.get_json()
+        anexos = {key: value for key, value in dados.items() if key in CAMPOS_ANEXO}
+        marcar_alteracao('cadastros')
         for key, value in dados.items():
             if key in ['imovel_area_total', 'imovel_area_construida', 'reurb_renda_familiar']:
                 if value == "" or value is None:
@@ -294,8 +1551,12 @@ def atualizar_cadastro_reurb(id):
                         value = float(value)
                     except (ValueError, TypeError):
                         value = None
-            if hasattr(cadastro, key):
+            if hasattr(cadastro, key) and key not in CAMPOS_SINCRONIZACAO:
                 setattr(cadastro, key, value)
+        if anexos:
+            gravar_anexos(id, anexos)
+        aplicar_avaliacao([cadastro])
+        cadastro.atualizado_em = agora()  # garante o UPDATE (e a nova versao_sync) mesmo só com anexos
         db.session.commit()
         return jsonify({"sucesso": True, "mensagem": "Cadastro atualizado com sucesso!"}), 200
     except Exception as e:
@@ -308,8 +1569,14 @@ def excluir_cadastro_reurb(id):
     if not cadastro:
         return jsonify({"sucesso": False, "erro": "Cadastro não encontrado"}), 404
     try:
+        marcar_alteracao('cadastros')
+        marcar_alteracao('construcoes')
+        construcoes = [c for (c,) in db.session.query(Construcao.id).filter_by(cadastro_id=id)]
         Construcao.query.filter_by(cadastro_id=id).delete()
+        coletar_anexos_orfaos(remover_vinculos_anexos([id]))
         db.session.delete(cadastro)
+        registrar_exclusoes('construcoes', construcoes)
+        registrar_exclusoes('cadastros', [id])
         db.session.commit()
         return jsonify({"sucesso": True, "mensagem": "Cadastro excluído com sucesso"}), 200
     except Exception as e:
@@ -324,17 +1591,21 @@ def adicionar_construcao(cadastro_id):
         area_construida=dados.get("area_construida"), uso=dados.get("uso"),
         padrao=dados.get("padrao"), tipo=dados.get("tipo")
     )
+    marcar_alteracao('construcoes')
     db.session.add(nova)
+    recalcular_apos_construcoes([cadastro_id])
     db.session.commit()
     return jsonify({"sucesso": True, "mensagem": "Construção salva com sucesso!"}), 201
 
 @app.route('/api/construcoes/<int:cadastro_id>', methods=['GET'])
 def listar_construcoes(cadastro_id):
-    construcoes = Construcao.query.filter_by(cadastro_id=cadastro_id).all()
-    return jsonify([{
-        "id": c.id, "area_total": c.area_total, "area_construida": c.area_construida,
-        "uso": c.uso, "padrao": c.padrao, "tipo": c.tipo
-    } for c in construcoes]), 200
+    def gerar():
+        construcoes = Construcao.query.filter_by(cadastro_id=cadastro_id).all()
+        return resposta_json([{
+            "id": c.id, "area_total": c.area_total, "area_construida": c.area_construida,
+            "uso": c.uso, "padrao": c.padrao, "tipo": c.tipo
+        } for c in construcoes])
+    return resposta_condicional(['construcoes'], gerar)
 
 @app.route('/api/construcoes/<int:id>', methods=['DELETE'])
 def excluir_construcao(id):
@@ -342,51 +1613,498 @@ def excluir_construcao(id):
     if not construcao:
         return jsonify({"sucesso": False, "erro": "Construção não encontrada"}), 404
     try:
+        marcar_alteracao('construcoes')
         db.session.delete(construcao)
+        registrar_exclusoes('construcoes', [id])
+        recalcular_apos_construcoes([construcao.cadastro_id])
         db.session.commit()
         return jsonify({"sucesso": True, "mensagem": "Construção excluída com sucesso"}), 200
     except Exception as e:
         return jsonify({"sucesso": False, "erro": str(e)}), 500
 
+MODELOS_PLANTA_GENERICA = {
+    'pgv': (PGV, lambda item: {"id": item.id, "descricao": item.descricao, "valor_m2": item.valor_m2}),
+    'padroes': (PadraoConstrutivo, lambda item: {"id": item.id, "descricao": item.descricao, "valor_m2": item.valor_m2}),
+    'logradouros': (ValorLogradouro, lambda item: {"id": item.id, "logradouro": item.logradouro, "valor_m2": item.valor_m2}),
+    'aliquotas': (AliquotaIPTU, lambda item: {"id": item.id, "tipo": item.tipo, "aliquota": item.aliquota})
+}
+
+# Campo pelo qual cada tabela é consultada no cálculo dos valores venais
+CHAVES_PLANTA_GENERICA = {'pgv': 'descricao', 'padroes': 'descricao', 'logradouros': 'logradouro', 'aliquotas': 'tipo'}
+
+def chave_planta(tipo, item):
+    return getattr(item, CHAVES_PLANTA_GENERICA[tipo])
+
 @app.route('/api/planta_generica/<string:tipo>', methods=['GET', 'POST'])
 def planta_generica_crud(tipo):
-    model_map = {
-        'pgv': (PGV, lambda item: {"id": item.id, "descricao": item.descricao, "valor_m2": item.valor_m2}),
-        'padroes': (PadraoConstrutivo, lambda item: {"id": item.id, "descricao": item.descricao, "valor_m2": item.valor_m2}),
-        'logradouros': (ValorLogradouro, lambda item: {"id": item.id, "logradouro": item.logradouro, "valor_m2": item.valor_m2}),
-        'aliquotas': (AliquotaIPTU, lambda item: {"id": item.id, "tipo": item.tipo, "aliquota": item.aliquota})
-    }
-    if tipo not in model_map:
+    if tipo not in MODELOS_PLANTA_GENERICA:
         return jsonify({"sucesso": False, "erro": "Tipo de planta genérica inválido"}), 400
     
-    model, serialize = model_map[tipo]
+    model, serialize = MODELOS_PLANTA_GENERICA[tipo]
     try:
         if request.method == 'POST':
             dados = request.get_json()
             novo_item = model(**dados)
             db.session.add(novo_item)
+            marcar_alteracao('planta_generica')
+            recalcular_afetados_planta(tipo, [chave_planta(tipo, novo_item)])
             db.session.commit()
             return jsonify({"sucesso": True, "mensagem": f"{tipo.upper()} salvo com sucesso!"}), 201
         elif request.method == 'GET':
-            todos_itens = model.query.all()
-            return jsonify([serialize(item) for item in todos_itens]), 200
+            return resposta_condicional(['planta_generica'], lambda: resposta_json(cache_planta.linhas(tipo)))
     except Exception as e:
+        db.session.rollback()
         return jsonify({"sucesso": False, "erro": str(e)}), 500
 
 @app.route('/api/planta_generica/<string:tipo>/<int:item_id>', methods=['DELETE'])
 def excluir_planta_generica_item(tipo, item_id):
-    model_map = {'pgv': PGV, 'padroes': PadraoConstrutivo, 'logradouros': ValorLogradouro, 'aliquotas': AliquotaIPTU}
-    if tipo not in model_map:
+    if tipo not in MODELOS_PLANTA_GENERICA:
         return jsonify({"sucesso": False, "erro": "Tipo de planta genérica inválido"}), 400
     
-    model = model_map[tipo]
+    model, _ = MODELOS_PLANTA_GENERICA[tipo]
     try:
         item = model.query.get(item_id)
         if not item:
             return jsonify({"sucesso": False, "erro": "Item não encontrado."}), 404
         db.session.delete(item)
+        marcar_alteracao('planta_generica')
+        recalcular_afetados_planta(tipo, [chave_planta(tipo, item)])
         db.session.commit()
         return jsonify({"sucesso": True, "mensagem": f"{tipo.upper()} excluído com sucesso!"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"sucesso": False, "erro": str(e)}), 500
+
+# 📦 Operações em lote: todos os itens são validados primeiro; se algum for
+# inválido nada é gravado. Os válidos são aplicados numa única transação,
+# com INSERT/UPDATE em lote, e a resposta traz o resultado de cada item.
+MODOS_LOTE_PLANTA = ('inserir', 'atualizar', 'upsert', 'substituir')
+MODOS_LOTE_CONSTRUCAO = ('inserir', 'atualizar', 'substituir')
+
+def validar_item_lote(model, item, exigir_obrigatorios, ignorar=('id',)):
+    """Converte um item do lote nos campos do modelo. Devolve (dados, erro)."""
+    if not isinstance(item, dict):
+        return None, "Item deve ser um objeto JSON"
+    dados = {}
+    for coluna in model.__table__.columns:
+        if coluna.name in ignorar:
+            continue
+        if coluna.name not in item:
+            if exigir_obrigatorios and not coluna.nullable:
+                return None, f"Campo obrigatório ausente: '{coluna.name}'"
+            continue
+        valor = item[coluna.name]
+        if valor is None or valor == "":
+            if not coluna.nullable:
+                return None, f"Campo obrigatório vazio: '{coluna.name}'"
+            dados[coluna.name] = None
+        elif isinstance(coluna.type, Float):
+            try:
+                dados[coluna.name] = float(valor)
+            except (ValueError, TypeError):
+                return None, f"Valor numérico inválido em '{coluna.name}': {valor!r}"
+        else:
+            valor = str(valor)
+            tamanho_maximo = getattr(coluna.type, 'length', None)
+            if tamanho_maximo and len(valor) > tamanho_maximo:
+                return None, f"'{coluna.name}' excede {tamanho_maximo} caracteres"
+            dados[coluna.name] = valor
+    return dados, None
+
+def ler_lote(modos):
+    corpo = request.get_json(silent=True) or {}
+    modo = corpo.get('modo', 'inserir')
+    if modo not in modos:
+        raise ParametroInvalido(f"Modo inválido. Use: {', '.join(modos)}")
+    itens = corpo.get('itens')
+    if not isinstance(itens, list):
+        raise ParametroInvalido("Envie os itens do lote numa lista em 'itens'.")
+    return modo, itens
+
+def resposta_lote_invalido(resultados):
+    return jsonify({
+        "sucesso": False,
+        "erro": "Lote rejeitado: há itens inválidos. Nada foi gravado.",
+        "resultados": resultados
+    }), 400
+
+# Os ids voltam na ordem das linhas (sort_by_parameter_order); sem isso o
+# RETURNING de um INSERT em lote pode vir em qualquer ordem
+def inserir_em_lote(model, linhas):
+    if not linhas:
+        return []
+    return list(db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), linhas).scalars())
+
+@app.route('/api/planta_generica/<string:tipo>/lote', methods=['POST'])
+def planta_generica_lote(tipo):
+    if tipo not in MODELOS_PLANTA_GENERICA:
+        return jsonify({"sucesso": False, "erro": "Tipo de planta genérica inválido"}), 400
+    model, _ = MODELOS_PLANTA_GENERICA[tipo]
+    campo_chave = CHAVES_PLANTA_GENERICA[tipo]
+    coluna_chave = getattr(model, campo_chave)
+    modo, itens = ler_lote(MODOS_LOTE_PLANTA)
+
+    # 1) Validação de todos os itens
+    resultados = []
+    validos = []
+    chaves_vistas = set()
+    for indice, item in enumerate(itens):
+        exigir = modo in ('inserir', 'substituir', 'upsert')
+        dados, erro = validar_item_lote(model, item, exigir_obrigatorios=exigir)
+        if not erro and modo in ('atualizar', 'upsert'):
+            chave = dados.get(campo_chave)
+            if chave is None and not (modo == 'atualizar' and isinstance(item.get('id'), int)):
+                erro = f"Informe '{campo_chave}' (ou 'id') para localizar o item"
+            elif chave is not None and chave in chaves_vistas:
+                erro = f"'{campo_chave}' repetido no lote: {chave!r}"
+            chaves_vistas.add(chave)
+        resultados.append({"indice": indice, "status": "erro" if erro else "valido", **({"erro": erro} if erro else {})})
+        validos.append((indice, item, dados))
+    if any(r["status"] == "erro" for r in resultados):
+        return resposta_lote_invalido(resultados)
+
+    # 2) Localiza as linhas existentes de uma vez (vale a de menor id, como no cálculo)
+    existentes = {}
+    if modo in ('atualizar', 'upsert'):
+        chaves = [dados[campo_chave] for _, _, dados in validos if dados.get(campo_chave) is not None]
+        for linha in model.query.filter(coluna_chave.in_(chaves)).order_by(model.id.desc()).all():
+            existentes[getattr(linha, campo_chave)] = linha
+        ids = [item['id'] for _, item, _ in validos if isinstance(item.get('id'), int)]
+        por_id = {linha.id: linha for linha in model.query.filter(model.id.in_(ids)).all()} if ids else {}
+
+    try:
+        chaves_afetadas = set()
+        para_inserir = []
+        para_atualizar = []
+        if modo == 'substituir':
+            chaves_afetadas.update(c for (c,) in db.session.query(coluna_chave).distinct())
+            db.session.query(model).delete(synchronize_session=False)
+            para_inserir = validos
+        else:
+            for indice, item, dados in validos:
+                if modo == 'inserir':
+                    para_inserir.append((indice, item, dados))
+                    continue
+                atual = por_id.get(item.get('id')) if modo == 'atualizar' and isinstance(item.get('id'), int) \
+                    else existentes.get(dados.get(campo_chave))
+                if atual is not None:
+                    chaves_afetadas.add(getattr(atual, campo_chave))
+                    para_atualizar.append((indice, {"id": atual.id, **dados}))
+                elif modo == 'upsert':
+                    para_inserir.append((indice, item, dados))
+                else:
+                    resultados[indice] = {"indice": indice, "status": "erro", "erro": "Item não encontrado"}
+            if any(r["status"] == "erro" for r in resultados):
+                db.session.rollback()
+                return resposta_lote_invalido(resultados)
+
+        if para_atualizar:
+            db.session.execute(update(model), [linha for _, linha in para_atualizar])
+        for indice, linha in para_atualizar:
+            chaves_afetadas.add(linha.get(campo_chave))
+            resultados[indice] = {"indice": indice, "status": "atualizado", "id": linha["id"]}
+        novos_ids = inserir_em_lote(model, [dados for _, _, dados in para_inserir])
+        for (indice, _, dados), novo_id in zip(para_inserir, novos_ids):
+            chaves_afetadas.add(dados.get(campo_chave))
+            resultados[indice] = {"indice": indice, "status": "inserido", "id": novo_id}
+
+        marcar_alteracao('planta_generica')
+        recalculados = recalcular_afetados_planta(tipo, list(chaves_afetadas))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"sucesso": False, "erro": str(e)}), 500
+
+    return jsonify({
+        "sucesso": True,
+        "mensagem": f"Lote de {tipo.upper()} processado com sucesso!",
+        "inseridos": len(para_inserir),
+        "atualizados": len(para_atualizar),
+        "cadastros_recalculados": recalculados,
+        "resultados": resultados
+    }), 200
+
+@app.route('/api/construcoes/<int:cadastro_id>/lote', methods=['POST'])
+def construcoes_lote(cadastro_id):
+    if db.session.query(CadastroReurb.id).filter_by(id=cadastro_id).first() is None:
+        return jsonify({"sucesso": False, "erro": "Cadastro não encontrado"}), 404
+    modo, itens = ler_lote(MODOS_LOTE_CONSTRUCAO)
+
+    resultados = []
+    validos = []
+    for indice, item in enumerate(itens):
+        dados, erro = validar_item_lote(Construcao, item, exigir_obrigatorios=False,
+                                        ignorar=('id', 'cadastro_id', *CAMPOS_SINCRONIZACAO))
+        if not erro and modo == 'atualizar' and not isinstance(item.get('id'), int):
+            erro = "Informe o 'id' da construção a atualizar"
+        resultados.append({"indice": indice, "status": "erro" if erro else "valido", **({"erro": erro} if erro else {})})
+        validos.append((indice, item, dados))
+
+    if modo == 'atualizar' and not any(r["status"] == "erro" for r in resultados):
+        ids = [item['id'] for _, item, _ in validos]
+        do_cadastro = {c for (c,) in db.session.query(Construcao.id)
+                       .filter(Construcao.id.in_(ids), Construcao.cadastro_id == cadastro_id)}
+        for indice, item, _ in validos:
+            if item['id'] not in do_cadastro:
+                resultados[indice] = {"indice": indice, "status": "erro", "erro": "Construção não encontrada neste cadastro"}
+    if any(r["status"] == "erro" for r in resultados):
+        return resposta_lote_invalido(resultados)
+
+    try:
+        marcar_alteracao('construcoes')
+        if modo == 'atualizar':
+            db.session.execute(update(Construcao), [{"id": item['id'], **dados} for _, item, dados in validos])
+            for indice, item, _ in validos:
+                resultados[indice] = {"indice": indice, "status": "atualizado", "id": item['id']}
+        else:
+            if modo == 'substituir':
+                registrar_exclusoes('construcoes', [c for (c,) in db.session.query(Construcao.id)
+                                                    .filter_by(cadastro_id=cadastro_id)])
+                Construcao.query.filter_by(cadastro_id=cadastro_id).delete(synchronize_session=False)
+            novos_ids = inserir_em_lote(Construcao, [{"cadastro_id": cadastro_id, **dados} for _, _, dados in validos])
+            for (indice, _, _), novo_id in zip(validos, novos_ids):
+                resultados[indice] = {"indice": indice, "status": "inserido", "id": novo_id}
+        recalcular_apos_construcoes([cadastro_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"sucesso": False, "erro": str(e)}), 500
+
+    return jsonify({"sucesso": True, "mensagem": "Lote de construções processado com sucesso!", "resultados": resultados}), 200
+
+@app.route('/api/admin/recalcular_valores', methods=['POST'])
+@requer_acesso('Administrador')
+def recalcular_todos_valores():
+    inicio = time.perf_counter()
+    try:
+        total = recalcular_valores()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"sucesso": False, "erro": str(e)}), 500
+    return jsonify({
+        "sucesso": True,
+        "cadastros_recalculados": total,
+        "tempo_segundos": round(time.perf_counter() - inicio, 3)
+    }), 200
+
+@app.route('/api/cache/planta_generica', methods=['GET'])
+def estatisticas_cache_planta():
+    return jsonify(cache_planta.estatisticas()), 200
+
+# 📈 Painel fiscal: totais e médias calculados no banco com GROUP BY sobre os
+# valores venais persistidos. O resultado fica em cache por worker e é
+# recalculado quando muda a versão de 'cadastros', 'construcoes' ou
+# 'planta_generica'.
+CAMPOS_RESUMO = ['cadastros', 'vvc_total', 'vvi_total', 'vvi_medio', 'iptu_total', 'iptu_medio',
+                 'area_total', 'area_construida']
+
+RESUMO_VAZIO = {'cadastros': 0, 'vvc_total': 0.0, 'vvi_total': 0.0, 'vvi_medio': None, 'iptu_total': 0.0,
+                'iptu_medio': None, 'area_total': 0.0, 'area_construida': 0.0}
+
+def colunas_resumo():
+    return [
+        func.count(CadastroReurb.id).label('cadastros'),
+        func.coalesce(func.sum(CadastroReurb.vvc), 0.0).label('vvc_total'),
+        func.coalesce(func.sum(CadastroReurb.vvi), 0.0).label('vvi_total'),
+        func.avg(CadastroReurb.vvi).label('vvi_medio'),
+        func.coalesce(func.sum(CadastroReurb.iptu), 0.0).label('iptu_total'),
+        func.avg(CadastroReurb.iptu).label('iptu_medio'),
+        func.coalesce(func.sum(CadastroReurb.imovel_area_total), 0.0).label('area_total'),
+        func.coalesce(func.sum(CadastroReurb.imovel_area_construida), 0.0).label('area_construida')
+    ]
+
+def resumo(linha, **extras):
+    return {**extras, **{campo: getattr(linha, campo) for campo in CAMPOS_RESUMO}}
+
+# Por padrão construtivo só o VVC é repartido: nos cadastros com construções
+# ele vem de cada construção (construcoes.padrao), nos demais do padrão do
+# próprio cadastro, como no cálculo. Assim a soma dos vvc_total por padrão
+# fecha com o VVC geral. Um cadastro com construções de padrões diferentes
+# conta em cada um deles em 'cadastros'.
+def estatisticas_por_padrao():
+    padroes = padroes_vigentes()
+    com_construcoes = db.session.query(
+        Construcao.padrao.label('padrao'), padroes.c.valor_m2,
+        func.count(func.distinct(Construcao.cadastro_id)).label('cadastros'),
+        func.count(Construcao.id).label('construcoes'),
+        func.coalesce(func.sum(Construcao.area_construida), 0.0).label('area_construida'),
+        func.coalesce(func.sum(Construcao.area_construida * padroes.c.valor_m2), 0.0).label('vvc_total')
+    ).outerjoin(padroes, and_(padroes.c.descricao == Construcao.padrao, Construcao.padrao != '')) \
+        .filter(Construcao.cadastro_id.isnot(None)) \
+        .group_by(Construcao.padrao, padroes.c.valor_m2).all()
+
+    tem_construcao = select(Construcao.id).where(Construcao.cadastro_id == CadastroReurb.id).exists()
+    sem_construcoes = db.session.query(
+        CadastroReurb.imovel_tipo_construcao.label('padrao'), padroes.c.valor_m2,
+        func.count(CadastroReurb.id).label('cadastros'),
+        func.coalesce(func.sum(CadastroReurb.imovel_area_construida), 0.0).label('area_construida'),
+        func.coalesce(func.sum(CadastroReurb.vvc), 0.0).label('vvc_total')
+    ).outerjoin(padroes, padroes.c.descricao == CadastroReurb.imovel_tipo_construcao) \
+        .filter(~tem_construcao) \
+        .group_by(CadastroReurb.imovel_tipo_construcao, padroes.c.valor_m2).all()
+
+    por_padrao = {}
+    for linha in [*com_construcoes, *sem_construcoes]:
+        item = por_padrao.setdefault(linha.padrao, {
+            "padrao": linha.padrao, "valor_m2": linha.valor_m2, "cadastros": 0, "construcoes": 0,
+            "area_construida": 0.0, "vvc_total": 0.0
+        })
+        item["cadastros"] += linha.cadastros
+        item["construcoes"] += getattr(linha, 'construcoes', 0)
+        item["area_construida"] += linha.area_construida
+        item["vvc_total"] += linha.vvc_total
+    return sorted(por_padrao.values(), key=lambda item: (item["padrao"] is None, item["padrao"] or ''))
+
+def calcular_estatisticas():
+    renda = CadastroReurb.reurb_renda_familiar
+    tipo_reurb = case(
+        (and_(renda.isnot(None), renda != 0, renda <= LIMITE_RENDA_REURB_S), 'REURB-S'), else_='REURB-E'
+    ).label('tipo_reurb')
+
+    geral = db.session.query(
+        *colunas_resumo(), func.coalesce(func.sum(case((CadastroReurb.vvi.is_(None), 1), else_=0)), 0).label('sem_valor')
+    ).one()
+
+    por_bairro = db.session.query(CadastroReurb.imovel_bairro, *colunas_resumo()) \
+        .group_by(CadastroReurb.imovel_bairro).order_by(CadastroReurb.imovel_bairro).all()
+
+    por_uso = db.session.query(CadastroReurb.imovel_uso, *colunas_resumo()) \
+        .group_by(CadastroReurb.imovel_uso).order_by(CadastroReurb.imovel_uso).all()
+
+    por_tipo_reurb = db.session.query(tipo_reurb, *colunas_resumo()).group_by(tipo_reurb).all()
+
+    # A alíquota de cada uso segue a mesma regra (ILIKE) do cálculo do IPTU;
+    # são poucos usos distintos, então ela vem das tabelas em cache.
+    tabelas = cache_planta.tabelas()
+    por_tipo = {l.tipo_reurb: resumo(l) for l in por_tipo_reurb}
+    return {
+        "geral": resumo(geral, cadastros_sem_valor_venal=geral.sem_valor),
+        "por_bairro": [resumo(l, bairro=l.imovel_bairro) for l in por_bairro],
+        "por_uso": [resumo(l, uso=l.imovel_uso, aliquota=tabelas.aliquota_para_uso(l.imovel_uso) if l.imovel_uso else None)
+                    for l in por_uso],
+        "por_padrao_construtivo": estatisticas_por_padrao(),
+        "por_tipo_reurb": {
+            tipo: por_tipo.get(tipo, RESUMO_VAZIO) for tipo in ('REURB-S', 'REURB-E')
+        },
+        "gerado_em": agora().isoformat()
+    }
+
+class CacheEstatisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retrato = None # (versões, dados), trocado inteiro
+
+    def obter(self):
+        versoes = versoes_atuais('cadastros', 'construcoes', 'planta_generica')
+        retrato = self._retrato
+        if retrato is not None and retrato[0] == versoes:
+            return retrato[1]
+        with self._lock:
+            if self._retrato is None or self._retrato[0] != versoes:
+                self._retrato = (versoes, calcular_estatisticas())
+            return self._retrato[1]
+
+cache_estatisticas = CacheEstatisticas()
+
+@app.route('/api/estatisticas', methods=['GET'])
+def estatisticas_fiscais():
+    try:
+        return jsonify(cache_estatisticas.obter()), 200
+    except Exception as e:
+        return jsonify({"sucesso": False, "erro": str(e)}), 500
+
+# 🔮 Simulação de uma nova planta genérica, somente leitura: cada worker
+# guarda um retrato colunar (pandas) dos cadastros e das construções, com a
+# avaliação pelas tabelas vigentes, enquanto as versões de 'cadastros',
+# 'construcoes' e 'planta_generica' não mudam. Cada simulação só reavalia
+# esse retrato com as tabelas propostas e compara, sem tocar no banco.
+TAMANHO_LOTE_RETRATO = 50000
+
+# Campo do valor proposto em cada tabela (a chave vem de CHAVES_PLANTA_GENERICA)
+CAMPOS_VALOR_SIMULACAO = {'logradouros': 'valor_m2', 'padroes': 'valor_m2', 'aliquotas': 'aliquota'}
+
+def ler_tabela_colunar(colunas, numericas=(), categoricas=()):
+    import pandas as pd
+    nomes = [c.key for c in colunas]
+    consulta = select(*colunas).execution_options(yield_per=TAMANHO_LOTE_RETRATO)
+    partes = [pd.DataFrame.from_records(particao, columns=nomes)
+              for particao in db.session.execute(consulta).partitions()]
+    df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=nomes)
+    for coluna in numericas:
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype(float)
+    for coluna in categoricas:
+        df[coluna] = df[coluna].astype('category')
+    return df
+
+def carregar_retrato_simulacao():
+    cadastros = ler_tabela_colunar(
+        [CadastroReurb.id, CadastroReurb.imovel_bairro, *[getattr(CadastroReurb, c) for c in COLUNAS_AVALIACAO]],
+        numericas=['imovel_area_total', 'imovel_area_construida', 'reurb_renda_familiar'],
+        categoricas=['imovel_bairro', 'imovel_logradouro', 'imovel_tipo_construcao', 'imovel_uso']
+    )
+    construcoes = ler_tabela_colunar(
+        [Construcao.cadastro_id, Construcao.area_construida, Construcao.padrao],
+        numericas=['area_construida'], categoricas=['padrao']
+    )
+    tabelas = montar_tabelas_planta(carregar_planta_generica())
+    return cadastros, construcoes, tabelas, avaliar_base(cadastros, construcoes, tabelas)
+
+class CacheRetratoSimulacao:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retrato = None # (versões, retrato), trocado inteiro
+
+    def obter(self):
+        versoes = versoes_atuais('cadastros', 'construcoes', 'planta_generica')
+        retrato = self._retrato
+        if retrato is not None and retrato[0] == versoes:
+            return retrato[1]
+        with self._lock:
+            if self._retrato is None or self._retrato[0] != versoes:
+                self._retrato = (versoes, carregar_retrato_simulacao())
+            return self._retrato[1]
+
+cache_retrato_simulacao = CacheRetratoSimulacao()
+
+def ler_propostas_simulacao(dados):
+    propostas = {}
+    for tipo, campo_valor in CAMPOS_VALOR_SIMULACAO.items():
+        itens = dados.get(tipo) or []
+        if not isinstance(itens, list):
+            raise ParametroInvalido(f"'{tipo}' deve ser uma lista.")
+        chave = CHAVES_PLANTA_GENERICA[tipo]
+        pares = []
+        for item in itens:
+            if not isinstance(item, dict) or not item.get(chave):
+                raise ParametroInvalido(f"Cada item de '{tipo}' precisa de '{chave}' e '{campo_valor}'.")
+            try:
+                valor = float(item.get(campo_valor))
+            except (TypeError, ValueError):
+                valor = None
+            if valor is None or valor != valor or valor in (float('inf'), float('-inf')) or valor < 0:
+                raise ParametroInvalido(f"Valor inválido em '{tipo}' para '{item[chave]}': {item.get(campo_valor)!r}")
+            pares.append((str(item[chave]), valor))
+        propostas[tipo] = pares
+    if not any(propostas.values()):
+        raise ParametroInvalido("Informe ao menos um valor proposto em 'logradouros', 'padroes' ou 'aliquotas'.")
+    return propostas
+
+@app.route('/api/simulacao', methods=['POST'])
+@requer_acesso()
+def simular_planta_generica():
+    propostas = ler_propostas_simulacao(request.get_json(silent=True) or {})
+    try:
+        inicio = time.perf_counter()
+        cadastros, construcoes, tabelas, atual = cache_retrato_simulacao.obter()
+        simulada = avaliar_base(cadastros, construcoes, tabelas_propostas(tabelas, **propostas))
+        resultado = resumir_simulacao(cadastros['imovel_bairro'], atual, simulada)
+        return resposta_json({
+            "sucesso": True,
+            "propostas": {tipo: len(pares) for tipo, pares in propostas.items()},
+            **resultado,
+            "tempo_segundos": round(time.perf_counter() - inicio, 3)
+        })
     except Exception as e:
         return jsonify({"sucesso": False, "erro": str(e)}), 500
         
@@ -394,6 +2112,325 @@ def excluir_planta_generica_item(tipo, item_id):
 # INÍCIO: NOVAS ROTAS PARA IMPORTAÇÃO E EXPORTAÇÃO DE DADOS
 # =======================================================================
 
+# 📥 Importação em fluxo: o arquivo é lido em lotes (CSV via módulo csv,
+# XLSX via openpyxl em modo somente leitura), cada lote é validado linha a
+# linha, avaliado e gravado com um único INSERT em lote, com commit por lote.
+# Linhas inválidas entram no relatório de rejeições em vez de abortar o arquivo.
+# No modo 'atualizar' cada linha é procurada entre os cadastros existentes
+# pela inscrição imobiliária e/ou pelo CPF (colunas indexadas): linhas novas
+# são inseridas, as que mudaram são atualizadas em lote e as idênticas
+# (mesmo hash de conteúdo) são ignoradas.
+TAMANHO_LOTE_IMPORTACAO = int(os.environ.get('TAMANHO_LOTE_IMPORTACAO', 2000))
+MAXIMO_REJEICOES_RELATADAS = 1000
+MODOS_IMPORTACAO = ('inserir', 'atualizar')
+# Como casar a linha com um cadastro existente; 'inscricao_ou_cpf' usa a
+# inscrição quando a linha tem uma e o CPF quando não tem
+CHAVES_IMPORTACAO = ('inscricao_ou_cpf', 'inscricao', 'cpf')
+
+MAPA_COLUNAS_IMPORTACAO = {
+    'Nome Completo': 'req_nome',
+    'CPF': 'req_cpf',
+    'RG': 'req_rg',
+    'Telefone Principal': 'req_telefone',
+    'E-mail': 'req_email',
+    'Inscrição Imobiliária': 'inscricao_imobiliaria',
+    'Logradouro do Imóvel': 'imovel_logradouro',
+    'Número do Imóvel': 'imovel_numero',
+    'Bairro do Imóvel': 'imovel_bairro',
+    'Área Total do Lote (m²)': 'imovel_area_total',
+    'Área Construída (m²)': 'imovel_area_construida',
+    'Uso Principal do Imóvel': 'imovel_uso',
+    'Padrão Construtivo': 'imovel_tipo_construcao',
+    'Renda familiar mensal total (R$)': 'reurb_renda_familiar'
+}
+
+CAMPOS_NUMERICOS_CADASTRO = ['imovel_area_total', 'imovel_area_construida', 'reurb_renda_familiar']
+
+# Colunas que a importação pode preencher (os valores venais são sempre calculados)
+COLUNAS_IMPORTAVEIS = {
+    c.name: c for c in CadastroReurb.__table__.columns
+    if c.name != 'id' and c.name not in CAMPOS_VALOR_VENAL + CAMPOS_BUSCA + CAMPOS_SINCRONIZACAO
+}
+
+# Conta todas as linhas rejeitadas, mas guarda só as MAXIMO_REJEICOES_RELATADAS
+# de menor número (um heap), para que um arquivo inteiro inválido não encha a memória
+class RelatorioRejeicoes:
+    def __init__(self, maximo=MAXIMO_REJEICOES_RELATADAS):
+        self.maximo = maximo
+        self.total = 0
+        self._guardadas = [] # (-linha, -ordem de chegada, erro): o topo é a de maior número
+
+    def adicionar(self, linha, erro):
+        self.total += 1
+        item = (-linha, -self.total, erro)
+        if len(self._guardadas) < self.maximo:
+            heapq.heappush(self._guardadas, item)
+        elif item > self._guardadas[0]:
+            heapq.heapreplace(self._guardadas, item)
+
+    def lista(self):
+        return [{"linha": -linha, "erro": erro} for linha, _, erro in sorted(self._guardadas, reverse=True)]
+
+def _detectar_csv(amostra):
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        texto = decodificador.decode(amostra, final=False)
+        codificacao = 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto = amostra.decode('latin-1')
+        codificacao = 'latin-1'
+    primeira_linha = texto.lstrip('\ufeff').split('\n', 1)[0]
+    try:
+        separador = csv.Sniffer().sniff(texto.lstrip('\ufeff'), delimiters=';,\t|').delimiter
+    except csv.Error:
+        separador = ';' if primeira_linha.count(';') >= primeira_linha.count(',') else ','
+    return codificacao, separador
+
+def ler_linhas_planilha(arquivo, nome_arquivo):
+    """Gera (número da linha no arquivo, dicionário cabeçalho -> valor) sem
+    carregar a planilha inteira na memória."""
+    if nome_arquivo.endswith('.csv'):
+        amostra = arquivo.read(64 * 1024)
+        arquivo.seek(0)
+        codificacao, separador = _detectar_csv(amostra)
+        # A codificação é detectada pelo início do arquivo; bytes inválidos
+        # mais adiante viram U+FFFD e a linha é rejeitada na validação, em vez
+        # de abortar a importação depois de lotes já gravados
+        texto = io.TextIOWrapper(arquivo, encoding=codificacao, errors='replace', newline='')
+        leitor = csv.reader(texto, delimiter=separador)
+        cabecalho = [c.strip() for c in next(leitor, [])]
+        for numero, valores in enumerate(leitor, start=2):
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(cabecalho, valores))
+    elif nome_arquivo.endswith('.xlsx'):
+        import openpyxl
+        planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = planilha.active.iter_rows(values_only=True)
+            cabecalho = [str(c).strip() if c is not None else '' for c in next(linhas, ())]
+            for numero, valores in enumerate(linhas, start=2):
+                if any(v not in (None, '') for v in valores):
+                    yield numero, dict(zip(cabecalho, valores))
+        finally:
+            planilha.close()
+    else:
+        raise ParametroInvalido("Formato de arquivo não suportado. Use .xlsx ou .csv")
+
+def _converter_numero(valor):
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip().replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        # Formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+def validar_linha_importacao(registro):
+    """Converte uma linha da planilha nos campos de CadastroReurb.
+    Devolve (dados, None) ou (None, mensagem de erro)."""
+    dados = {}
+    for cabecalho, valor in registro.items():
+        campo = MAPA_COLUNAS_IMPORTACAO.get(cabecalho, cabecalho)
+        coluna = COLUNAS_IMPORTAVEIS.get(campo)
+        if coluna is None or valor is None:
+            continue
+        if isinstance(valor, float) and valor != valor:  # NaN
+            continue
+        if isinstance(valor, str):
+            valor = valor.strip()
+            if valor == '':
+                continue
+            if '\ufffd' in valor:
+                return None, f"Caracteres inválidos para a codificação do arquivo em '{cabecalho}'"
+        if campo in CAMPOS_NUMERICOS_CADASTRO:
+            try:
+                dados[campo] = _converter_numero(valor)
+            except (ValueError, TypeError):
+                return None, f"Valor numérico inválido em '{cabecalho}': {valor!r}"
+            continue
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)
+        valor = str(valor)
+        tamanho_maximo = getattr(coluna.type, 'length', None)
+        if tamanho_maximo and len(valor) > tamanho_maximo:
+            return None, f"'{cabecalho}' excede {tamanho_maximo} caracteres"
+        dados[campo] = valor
+    if not dados:
+        return None, "Linha sem nenhuma coluna reconhecida"
+    return dados, None
+
+def gravar_lote_importacao(lote, rejeicoes):
+    # Um INSERT em lote (executemany); se o banco recusar, a transação do
+    # lote é desfeita e as linhas são gravadas uma a uma para isolar a culpada.
+    campos = sorted({campo for _, dados in lote for campo in dados})
+    linhas = [{campo: dados.get(campo) for campo in campos} for _, dados in lote]
+    for linha, av in zip(linhas, avaliar_registros(
+            [{c: l.get(c) for c in COLUNAS_AVALIACAO} for l in linhas], cache_planta.tabelas())):
+        linha.update({campo: av[campo] for campo in CAMPOS_VALOR_VENAL})
+        linha.update(campos_busca(linha))
+    try:
+        marcar_alteracao('cadastros')
+        db.session.execute(insert(CadastroReurb), linhas)
+        db.session.commit()
+        return len(linhas)
+    except Exception:
+        db.session.rollback()
+    gravados = 0
+    marcar_alteracao('cadastros')
+    for (numero, _), linha in zip(lote, linhas):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(CadastroReurb), [linha])
+            gravados += 1
+        except Exception as e:
+            rejeicoes.adicionar(numero, str(getattr(e, 'orig', e)).strip())
+    db.session.commit()
+    return gravados
+
+def chave_importacao(dados, chave):
+    inscricao = dados.get('inscricao_imobiliaria')
+    cpf = somente_digitos(dados.get('req_cpf'))
+    if chave in ('inscricao', 'inscricao_ou_cpf') and inscricao:
+        return ('inscricao', inscricao)
+    if chave in ('cpf', 'inscricao_ou_cpf') and cpf:
+        return ('cpf', cpf)
+    return None
+
+def hash_conteudo(valores):
+    # Hash dos campos na ordem dada; números entram como float, para que 120
+    # vindo da planilha e 120.0 vindo do banco tenham o mesmo hash
+    normalizados = [float(v) if isinstance(v, (int, float)) else v for v in valores]
+    return hashlib.blake2b(json.dumps(normalizados, ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+def gravar_atualizacoes_importacao(alteracoes, rejeicoes):
+    # alteracoes: (número da linha, id, registro completo já mesclado)
+    tabelas = cache_planta.tabelas()
+    somas = vvc_das_construcoes([id_ for _, id_, _ in alteracoes])
+    avaliacoes = avaliar_registros([r for _, _, r in alteracoes], tabelas, [somas.get(id_) for _, id_, _ in alteracoes])
+    linhas = []
+    for (_, id_, registro), av in zip(alteracoes, avaliacoes):
+        linhas.append({"id": id_, **registro, **{campo: av[campo] for campo in CAMPOS_VALOR_VENAL},
+                       **campos_busca(registro)})
+    try:
+        marcar_alteracao('cadastros')
+        db.session.execute(update(CadastroReurb), linhas)
+        db.session.commit()
+        return len(linhas)
+    except Exception:
+        db.session.rollback()
+    gravados = 0
+    marcar_alteracao('cadastros')
+    for (numero, _, _), linha in zip(alteracoes, linhas):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(update(CadastroReurb), [linha])
+            gravados += 1
+        except Exception as e:
+            rejeicoes.adicionar(numero, str(getattr(e, 'orig', e)).strip())
+    db.session.commit()
+    return gravados
+
+def gravar_lote_atualizacao(lote, rejeicoes, chave):
+    """Modo 'atualizar': devolve (inseridos, atualizados, inalterados)."""
+    chaves = [chave_importacao(dados, chave) for _, dados in lote]
+    inscricoes = {valor for tipo, valor in filter(None, chaves) if tipo == 'inscricao'}
+    cpfs = {valor for tipo, valor in filter(None, chaves) if tipo == 'cpf'}
+
+    # Só as colunas que a comparação, a avaliação e a busca precisam
+    campos = {campo for _, dados in lote for campo in dados}
+    campos.update(COLUNAS_AVALIACAO)
+    campos.update(['req_nome', 'req_cpf', 'inscricao_imobiliaria', 'imovel_logradouro', 'imovel_numero', 'imovel_bairro'])
+    campos = sorted(campos)
+    existentes = {}
+    if inscricoes or cpfs:
+        condicoes = []
+        if inscricoes:
+            condicoes.append(CadastroReurb.inscricao_imobiliaria.in_(inscricoes))
+        if cpfs:
+            condicoes.append(CadastroReurb.busca_cpf.in_(cpfs))
+        consulta = db.session.query(CadastroReurb.id, CadastroReurb.busca_cpf,
+                                    *[getattr(CadastroReurb, c) for c in campos]) \
+            .filter(or_(*condicoes)).order_by(CadastroReurb.id)
+        # Havendo duplicatas antigas, a linha casa com o cadastro mais antigo
+        for linha in consulta:
+            if linha.inscricao_imobiliaria in inscricoes:
+                existentes.setdefault(('inscricao', linha.inscricao_imobiliaria), linha)
+            if linha.busca_cpf in cpfs:
+                existentes.setdefault(('cpf', linha.busca_cpf), linha)
+
+    novos, alteracoes, inalterados = [], [], 0
+    for (numero, dados), chave_linha in zip(lote, chaves):
+        existente = existentes.get(chave_linha) if chave_linha else None
+        if existente is None:
+            novos.append((numero, dados))
+            continue
+        # Células vazias não apagam o que já está gravado: compara e grava
+        # só os campos que a linha traz
+        ordem = sorted(dados)
+        if hash_conteudo([dados[c] for c in ordem]) == hash_conteudo([getattr(existente, c) for c in ordem]):
+            inalterados += 1
+            continue
+        registro = {c: getattr(existente, c) for c in campos}
+        registro.update(dados)
+        alteracoes.append((numero, existente.id, registro))
+
+    atualizados = gravar_atualizacoes_importacao(alteracoes, rejeicoes) if alteracoes else 0
+    inseridos = gravar_lote_importacao(novos, rejeicoes) if novos else 0
+    return inseridos, atualizados, inalterados
+
+def importar_planilha(arquivo, nome_arquivo, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, progresso=None,
+                      modo='inserir', chave='inscricao_ou_cpf'):
+    contagem = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+    rejeicoes = RelatorioRejeicoes()
+    lote = []
+    chaves_do_lote = set()
+
+    def gravar():
+        if modo == 'atualizar':
+            inseridos, atualizados, inalterados = gravar_lote_atualizacao(lote, rejeicoes, chave)
+            contagem["atualizados"] += atualizados
+            contagem["inalterados"] += inalterados
+        else:
+            inseridos = gravar_lote_importacao(lote, rejeicoes)
+        contagem["inseridos"] += inseridos
+        lote.clear()
+        chaves_do_lote.clear()
+        if progresso:
+            progresso(sum(contagem.values()), rejeicoes.total)
+
+    for numero, registro in ler_linhas_planilha(arquivo, nome_arquivo):
+        dados, erro = validar_linha_importacao(registro)
+        if erro:
+            rejeicoes.adicionar(numero, erro)
+            continue
+        if modo == 'atualizar':
+            # A mesma chave repetida no arquivo: grava o lote antes, para que
+            # a linha seguinte encontre (e atualize) a anterior
+            chave_linha = chave_importacao(dados, chave)
+            if chave_linha is not None and chave_linha in chaves_do_lote:
+                gravar()
+            chaves_do_lote.add(chave_linha)
+        lote.append((numero, dados))
+        if len(lote) >= tamanho_lote:
+            gravar()
+    if lote:
+        gravar()
+    return {
+        "importados": contagem["inseridos"] + contagem["atualizados"],
+        **contagem,
+        "rejeitados": rejeicoes.total,
+        "rejeicoes": rejeicoes.lista()
+    }
+
+def ler_parametros_importacao(formulario):
+    modo = formulario.get('modo') or 'inserir'
+    chave = formulario.get('chave') or 'inscricao_ou_cpf'
+    if modo not in MODOS_IMPORTACAO:
+        raise ParametroInvalido(f"O parâmetro 'modo' deve ser um de: {', '.join(MODOS_IMPORTACAO)}.")
+    if chave not in CHAVES_IMPORTACAO:
+        raise ParametroInvalido(f"O parâmetro 'chave' deve ser um de: {', '.join(CHAVES_IMPORTACAO)}.")
+    return modo, chave
+
 @app.route('/api/importar', methods=['POST'])
 def importar_dados():
     if 'arquivo' not in request.files:
@@ -402,102 +2439,206 @@ def importar_dados():
     arquivo = request.files['arquivo']
     if arquivo.filename == '':
         return jsonify({"sucesso": False, "erro": "Nenhum arquivo selecionado."}), 400
+    if not arquivo.filename.endswith(('.xlsx', '.csv')):
+        return jsonify({"sucesso": False, "erro": "Formato de arquivo não suportado. Use .xlsx ou .csv"}), 400
+    modo, chave = ler_parametros_importacao(request.form)
 
     try:
-        # Leitura de Excel ou CSV
-        if arquivo.filename.endswith('.xlsx'):
-            df = pd.read_excel(arquivo)
-        elif arquivo.filename.endswith('.csv'):
-            try:
-                df = pd.read_csv(arquivo, sep=None, engine='python', encoding='utf-8-sig')
-            except Exception:
-                try:
-                    df = pd.read_csv(arquivo, sep=';', encoding='utf-8-sig')
-                except Exception:
-                    df = pd.read_csv(arquivo, sep=',', encoding='utf-8-sig')
-        else:
-            return jsonify({"sucesso": False, "erro": "Formato de arquivo não suportado. Use .xlsx ou .csv"}), 400
-
-        # Mapeamento das colunas (mantive seu original aqui!)
-        mapa_colunas = {
-            'Nome Completo': 'req_nome',
-            'CPF': 'req_cpf',
-            'RG': 'req_rg',
-            'Telefone Principal': 'req_telefone',
-            'E-mail': 'req_email',
-            'Inscrição Imobiliária': 'inscricao_imobiliaria',
-            'Logradouro do Imóvel': 'imovel_logradouro',
-            'Número do Imóvel': 'imovel_numero',
-            'Bairro do Imóvel': 'imovel_bairro',
-            'Área Total do Lote (m²)': 'imovel_area_total',
-            'Área Construída (m²)': 'imovel_area_construida',
-            'Uso Principal do Imóvel': 'imovel_uso',
-            'Padrão Construtivo': 'imovel_tipo_construcao',
-            'Renda familiar mensal total (R$)': 'reurb_renda_familiar'
-        }
-        df.rename(columns=mapa_colunas, inplace=True)
-        dados_para_db = df.to_dict(orient='records')
+        resultado = importar_planilha(arquivo.stream, arquivo.filename, modo=modo, chave=chave)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"sucesso": False, "erro": f"Ocorreu um erro ao processar o arquivo: {str(e)}"}), 500
 
-        for registro_dict in dados_para_db:
-            modelo_columns = [c.name for c in CadastroReurb.__table__.columns]
-            dados_filtrados = {key: value for key, value in registro_dict.items() if key in modelo_columns and pd.notna(value)}
+    if modo == 'atualizar':
+        mensagem = (f"{resultado['inseridos']} registros inseridos, {resultado['atualizados']} atualizados "
+                    f"e {resultado['inalterados']} sem alteração.")
+    else:
+        mensagem = f"{resultado['importados']} registros importados com sucesso!"
+    if resultado['rejeitados']:
+        mensagem += f" {resultado['rejeitados']} linhas rejeitadas."
+    return jsonify({"sucesso": True, "mensagem": mensagem, **resultado}), 201
 
-            for campo in ['imovel_area_total', 'imovel_area_construida', 'reurb_renda_familiar']:
-                if campo in dados_filtrados and (dados_filtrados[campo] == "" or pd.isna(dados_filtrados[campo])):
-                    dados_filtrados[campo] = None
 
-            novo_cadastro = CadastroReurb(**dados_filtrados)
-            db.session.add(novo_cadastro)
+# 📤 Exportação em fluxo: as linhas vêm do banco em lotes por cursor no
+# servidor (yield_per) e vão direto para o formato de saída, sem montar a
+# lista inteira na memória. CSV/CSV.gz são enviados enquanto são gerados;
+# XLSX (openpyxl write-only) e Parquet são escritos num arquivo temporário.
+TAMANHO_LOTE_EXPORTACAO = 1000
 
-        db.session.commit()
-        return jsonify({"sucesso": True, "mensagem": f"{len(dados_para_db)} registros importados com sucesso!"}), 201
+FORMATOS_EXPORTACAO = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'cadastros_reurb.xlsx'),
+    'csv': ('text/csv; charset=utf-8', 'cadastros_reurb.csv'),
+    'csv.gz': ('application/gzip', 'cadastros_reurb.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'cadastros_reurb.parquet')
+}
 
-    except Exception as e:
-        db.session.rollback()
-        print("Erro ao importar:", str(e))  # 👈 log para debug
-        return jsonify({"sucesso": False, "erro": f"Ocorreu um erro ao processar o arquivo: {str(e)}"}), 500
+MAPA_NOMES_AMIGAVEIS = {
+    'req_nome': 'Nome Completo', 'req_cpf': 'CPF', 'req_rg': 'RG', 'req_telefone': 'Telefone',
+    'req_email': 'E-mail', 'inscricao_imobiliaria': 'Inscrição Imobiliária',
+    'imovel_logradouro': 'Logradouro', 'imovel_numero': 'Número', 'imovel_bairro': 'Bairro',
+    'imovel_area_total': 'Área do Lote (m²)', 'imovel_area_construida': 'Área Construída (m²)',
+    'reurb_renda_familiar': 'Renda Familiar (R$)', 'imovel_uso': 'Uso do Imóvel',
+    'vvt': 'Valor Venal do Terreno (R$)', 'vvc': 'Valor Venal da Construção (R$)',
+    'vvi': 'Valor Venal do Imóvel (R$)', 'iptu': 'IPTU (R$)', 'tipo_reurb': 'Tipo de REURB'
+}
+
+def colunas_exportacao(colunas_selecionadas, incluir_valores):
+    if not colunas_selecionadas:
+        # 👇 se não vier nada do frontend, pega todas as colunas do modelo
+        colunas_selecionadas = [c.name for c in CadastroReurb.__table__.columns
+                                if c.name not in CAMPOS_VALOR_VENAL + CAMPOS_BUSCA + CAMPOS_SINCRONIZACAO]
+    colunas = list(colunas_selecionadas)
+    if incluir_valores:
+        colunas += [c for c in CAMPOS_VALOR_VENAL + ['tipo_reurb'] if c not in colunas]
+    return colunas
 
+def lotes_exportacao(colunas, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+    """Gera listas de tuplas (uma por cadastro, na ordem de `colunas`)."""
+    modelo = CadastroReurb.__table__.columns
+    precisa_avaliar = any(c in CAMPOS_VALOR_VENAL for c in colunas)
+    buscar = [c for c in colunas if c in modelo]
+    if precisa_avaliar:
+        buscar += [c for c in COLUNAS_AVALIACAO + CAMPOS_VALOR_VENAL if c not in buscar]
+    if 'tipo_reurb' in colunas and 'reurb_renda_familiar' not in buscar:
+        buscar.append('reurb_renda_familiar')
+    # Anexos só entram se foram pedidos explicitamente em `colunas`
+    campos_anexo = [c for c in colunas if c in CAMPOS_ANEXO]
+    consulta = (select(CadastroReurb.id, *[getattr(CadastroReurb, c) for c in buscar])
+                .order_by(CadastroReurb.id)
+                .execution_options(yield_per=tamanho_lote))
+    tabelas = cache_planta.tabelas() if precisa_avaliar else None
+    for particao in db.session.execute(consulta).partitions():
+        avaliados = {}
+        if precisa_avaliar:
+            pendentes = [linha for linha in particao if linha.vvi is None]
+            if pendentes:
+                avaliados = dict(zip([l.id for l in pendentes], avaliar_cadastros(pendentes, tabelas)))
+        anexos = valores_anexos([l.id for l in particao], campos_anexo) if campos_anexo else {}
+        lote = []
+        for linha in particao:
+            registro = linha._mapping
+            av = avaliados.get(linha.id)
+            valores = []
+            for col in colunas:
+                if col == 'tipo_reurb':
+                    valores.append(classificar_reurb(registro['reurb_renda_familiar']))
+                elif av is not None and col in CAMPOS_VALOR_VENAL:
+                    valores.append(av[col])
+                elif col in CAMPOS_ANEXO:
+                    valores.append(anexos.get(linha.id, {}).get(col, ''))
+                else:
+                    valores.append(registro.get(col, ''))
+            lote.append(tuple(valores))
+        yield lote
+
+def gerar_csv(colunas, lotes, comprimir=False):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+
+    def esvaziar():
+        dados = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(dados) if compressor else dados
+
+    buffer.write('\ufeff')  # BOM para o Excel reconhecer UTF-8
+    escritor.writerow([MAPA_NOMES_AMIGAVEIS.get(c, c) for c in colunas])
+    for lote in lotes:
+        escritor.writerows(lote)
+        pedaco = esvaziar()
+        if pedaco:
+            yield pedaco
+    final = esvaziar()
+    if compressor:
+        final += compressor.flush()
+    if final:
+        yield final
+
+def escrever_xlsx(destino, colunas, lotes):
+    import openpyxl
+    planilha = openpyxl.Workbook(write_only=True)
+    aba = planilha.create_sheet('Cadastros')
+    aba.append([MAPA_NOMES_AMIGAVEIS.get(c, c) for c in colunas])
+    for lote in lotes:
+        for linha in lote:
+            aba.append(linha)
+    planilha.save(destino)
+
+def escrever_parquet(destino, colunas, lotes):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ParametroInvalido("A exportação em Parquet requer o pacote pyarrow instalado no servidor.")
+    modelo = CadastroReurb.__table__.columns
+    campos = []
+    for col in colunas:
+        if col in modelo and isinstance(modelo[col].type, Integer):
+            tipo = pa.int64()
+        elif col in CAMPOS_VALOR_VENAL or (col in modelo and isinstance(modelo[col].type, Float)):
+            tipo = pa.float64()
+        elif col in modelo and isinstance(modelo[col].type, DateTime):
+            tipo = pa.timestamp('us')  # horário UTC, sem fuso (ver agora())
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(MAPA_NOMES_AMIGAVEIS.get(col, col), tipo))
+    esquema = pa.schema(campos)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for lote in lotes:
+            if lote:
+                colunas_lote = list(zip(*lote))
+                escritor.write_batch(pa.record_batch(
+                    [pa.array(valores, type=campo.type) for valores, campo in zip(colunas_lote, esquema)],
+                    schema=esquema
+                ))
+
+def escrever_exportacao(destino, formato, colunas, lotes):
+    if formato in ('csv', 'csv.gz'):
+        for pedaco in gerar_csv(colunas, lotes, comprimir=(formato == 'csv.gz')):
+            destino.write(pedaco)
+    elif formato == 'xlsx':
+        escrever_xlsx(destino, colunas, lotes)
+    elif formato == 'parquet':
+        escrever_parquet(destino, colunas, lotes)
+
+def ler_parametros_exportacao(dados):
+    formato = (dados.get('formato') or 'xlsx').lower()
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ParametroInvalido(f"Formato de exportação inválido. Use: {', '.join(FORMATOS_EXPORTACAO)}")
+    colunas = colunas_exportacao(dados.get('colunas', []), bool(dados.get('incluir_valores')))
+    return formato, colunas
 
 @app.route('/api/exportar', methods=['POST'])
 def exportar_dados():
     try:
-        colunas_selecionadas = request.json.get('colunas', [])
-        if not colunas_selecionadas:
-            # 👇 se não vier nada do frontend, pega todas as colunas do modelo
-            colunas_selecionadas = [c.name for c in CadastroReurb.__table__.columns]
-
-        cadastros = CadastroReurb.query.all()
-        dados_para_exportar = []
-        for cad in cadastros:
-            registro = {col: getattr(cad, col, '') for col in colunas_selecionadas}
-            dados_para_exportar.append(registro)
-
-        if not dados_para_exportar:
-            return jsonify({"sucesso": False, "erro": "Não há dados para exportar."}), 400
+        formato, colunas = ler_parametros_exportacao(request.get_json(silent=True) or {})
+        mimetype, nome_arquivo = FORMATOS_EXPORTACAO[formato]
 
-        df = pd.DataFrame(dados_para_exportar)
+        if db.session.query(CadastroReurb.id).first() is None:
+            return jsonify({"sucesso": False, "erro": "Não há dados para exportar."}), 400
 
-        mapa_nomes_amigaveis = {
-            'req_nome': 'Nome Completo', 'req_cpf': 'CPF', 'req_rg': 'RG', 'req_telefone': 'Telefone',
-            'req_email': 'E-mail', 'inscricao_imobiliaria': 'Inscrição Imobiliária',
-            'imovel_logradouro': 'Logradouro', 'imovel_numero': 'Número', 'imovel_bairro': 'Bairro',
-            'imovel_area_total': 'Área do Lote (m²)', 'imovel_area_construida': 'Área Construída (m²)',
-            'reurb_renda_familiar': 'Renda Familiar (R$)', 'imovel_uso': 'Uso do Imóvel'
-        }
-        df.rename(columns=mapa_nomes_amigaveis, inplace=True)
+        if formato in ('csv', 'csv.gz'):
+            resposta = Response(
+                stream_with_context(gerar_csv(colunas, lotes_exportacao(colunas), comprimir=(formato == 'csv.gz'))),
+                mimetype=mimetype
+            )
+            resposta.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo}'
+            return resposta
 
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Cadastros')
+        output = tempfile.TemporaryFile()
+        escrever_exportacao(output, formato, colunas, lotes_exportacao(colunas))
         output.seek(0)
 
         return send_file(
             output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            mimetype=mimetype,
             as_attachment=True,
-            download_name='cadastros_reurb.xlsx'
+            download_name=nome_arquivo
         )
 
+    except ParametroInvalido:
+        raise
     except Exception as e:
         print("Erro ao exportar:", str(e))  # 👈 log para debug
         return jsonify({"sucesso": False, "erro": str(e)}), 500
@@ -506,8 +2647,223 @@ def exportar_dados():
 # FIM: NOVAS ROTAS PARA IMPORTAÇÃO E EXPORTAÇÃO DE DADOS
 # =======================================================================
 
+# =======================================================================
+# INÍCIO: TAREFAS EM SEGUNDO PLANO (IMPORTAÇÃO, EXPORTAÇÃO E RECÁLCULO)
+# =======================================================================
+# A requisição só registra a tarefa e devolve o id (HTTP 202); o trabalho roda
+# num pool limitado de threads do próprio worker, com o progresso gravado na
+# tabela jobs por uma conexão separada (visível a todos os workers na hora).
+# O resultado das exportações é gravado em disco, em JOBS_DIR, e o download é
+# servido direto do arquivo: a memória fica constante e o banco não guarda o
+# arquivo. Todos os workers da instância enxergam o diretório; com várias
+# instâncias, JOBS_DIR precisa ser um volume compartilhado. Os arquivos são
+# apagados depois de JOBS_RETENCAO_HORAS.
+JOBS_DIR = os.environ.get('JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'reurb_jobs')
+JOBS_RETENCAO = timedelta(hours=float(os.environ.get('JOBS_RETENCAO_HORAS', 24)))
+JOBS_MAX_THREADS = int(os.environ.get('JOBS_MAX_THREADS', 2))
+JOBS_MAX_PENDENTES = int(os.environ.get('JOBS_MAX_PENDENTES', 10))
+# Tarefa em execução sem sinal de vida há mais tempo que isso é informada como
+# interrompida (por exemplo, o worker que a executava foi reiniciado). Tarefas
+# ainda na fila não contam: o tempo de espera na fila não é falta de progresso.
+JOBS_TEMPO_LIMITE = timedelta(seconds=int(os.environ.get('JOBS_TEMPO_LIMITE_SEGUNDOS', 900)))
+
+_executor_jobs = None
+_futuros_jobs = set()
+_lock_jobs = threading.Lock()
+
+def atualizar_job(job_id, **campos):
+    # Conexão própria: não interfere na transação (nem no cursor) da tarefa
+    campos['atualizado_em'] = agora()
+    with db.engine.begin() as conexao:
+        conexao.execute(update(Job.__table__).where(Job.__table__.c.id == job_id).values(**campos))
+
+def caminho_resultado_job(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.resultado")
+
+def apagar_resultados_antigos():
+    # Chamado a cada nova tarefa: remove os arquivos de resultado vencidos
+    limite = time.time() - JOBS_RETENCAO.total_seconds()
+    try:
+        nomes = os.listdir(JOBS_DIR)
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        caminho = os.path.join(JOBS_DIR, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            continue  # apagado por outro worker
+
+def _executar_job(job_id, funcao, *args):
+    with app.app_context():
+        atualizar_job(job_id, status='executando')
+        try:
+            resultado = funcao(job_id, *args)
+            atualizar_job(job_id, status='concluido', concluido_em=agora(), resultado=json.dumps(resultado))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Erro na tarefa %s", job_id)
+            atualizar_job(job_id, status='erro', concluido_em=agora(), mensagem=str(e))
+        finally:
+            db.session.remove()
+
+def enfileirar_job(tipo, funcao, *args, arquivo_nome=None, arquivo_mimetype=None):
+    global _executor_jobs
+    with _lock_jobs:
+        _futuros_jobs.difference_update({f for f in _futuros_jobs if f.done()})
+        if len(_futuros_jobs) >= JOBS_MAX_PENDENTES:
+            return None
+        if _executor_jobs is None:
+            # Criado só no primeiro uso, depois do fork dos workers do gunicorn
+            _executor_jobs = ThreadPoolExecutor(max_workers=JOBS_MAX_THREADS, thread_name_prefix='job')
+        apagar_resultados_antigos()
+        job = Job(id=uuid.uuid4().hex, tipo=tipo, status='pendente', processados=0, erros=0,
+                  arquivo_nome=arquivo_nome, arquivo_mimetype=arquivo_mimetype,
+                  criado_em=agora(), atualizado_em=agora())
+        db.session.add(job)
+        db.session.commit()
+        _futuros_jobs.add(_executor_jobs.submit(_executar_job, job.id, funcao, *args))
+        return job.id
+
+def resposta_job_enfileirado(job_id):
+    if job_id is None:
+        return jsonify({"sucesso": False, "erro": "Fila de processamento cheia. Tente novamente em instantes."}), 503
+    return jsonify({
+        "sucesso": True,
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
+def _job_importar(job_id, caminho, nome_arquivo, modo='inserir', chave='inscricao_ou_cpf'):
+    try:
+        with open(caminho, 'rb') as arquivo:
+            resultado = importar_planilha(
+                arquivo, nome_arquivo, modo=modo, chave=chave,
+                progresso=lambda processados, rejeitados: atualizar_job(job_id, processados=processados, erros=rejeitados)
+            )
+    finally:
+        os.remove(caminho)
+    processados = resultado['inseridos'] + resultado['atualizados'] + resultado['inalterados']
+    atualizar_job(job_id, processados=processados, erros=resultado['rejeitados'])
+    return resultado
+
+def _job_exportar(job_id, formato, colunas):
+    contagem = {"linhas": 0}
+
+    def lotes_com_progresso():
+        for lote in lotes_exportacao(colunas):
+            contagem["linhas"] += len(lote)
+            atualizar_job(job_id, processados=contagem["linhas"])
+            yield lote
+
+    # Grava num arquivo parcial e só o renomeia para o nome final quando
+    # terminar: o download nunca vê um arquivo pela metade
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    caminho = caminho_resultado_job(job_id)
+    parcial = f"{caminho}.parcial"
+    try:
+        with open(parcial, 'wb') as destino:
+            escrever_exportacao(destino, formato, colunas, lotes_com_progresso())
+        os.replace(parcial, caminho)
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    return {"linhas": contagem["linhas"], "formato": formato, "bytes": os.path.getsize(caminho)}
+
+def _job_recalcular(job_id):
+    inicio = time.perf_counter()
+
+    def progresso(total):
+        db.session.commit()
+        atualizar_job(job_id, processados=total)
+
+    total = recalcular_valores(progresso=progresso)
+    db.session.commit()
+    return {"cadastros_recalculados": total, "tempo_segundos": round(time.perf_counter() - inicio, 3)}
+
+@app.route('/api/jobs/importar', methods=['POST'])
+def job_importar():
+    if 'arquivo' not in request.files:
+        return jsonify({"sucesso": False, "erro": "Nenhum arquivo enviado."}), 400
+    arquivo = request.files['arquivo']
+    if arquivo.filename == '':
+        return jsonify({"sucesso": False, "erro": "Nenhum arquivo selecionado."}), 400
+    if not arquivo.filename.endswith(('.xlsx', '.csv')):
+        return jsonify({"sucesso": False, "erro": "Formato de arquivo não suportado. Use .xlsx ou .csv"}), 400
+    modo, chave = ler_parametros_importacao(request.form)
+
+    # O upload é copiado para um arquivo temporário que a thread da tarefa lê e apaga
+    descritor, caminho = tempfile.mkstemp(suffix=os.path.splitext(arquivo.filename)[1])
+    with os.fdopen(descritor, 'wb') as destino:
+        arquivo.save(destino)
+    job_id = enfileirar_job('importar', _job_importar, caminho, arquivo.filename, modo, chave)
+    if job_id is None:
+        os.remove(caminho)
+    return resposta_job_enfileirado(job_id)
+
+@app.route('/api/jobs/exportar', methods=['POST'])
+def job_exportar():
+    formato, colunas = ler_parametros_exportacao(request.get_json(silent=True) or {})
+    mimetype, nome_arquivo = FORMATOS_EXPORTACAO[formato]
+    job_id = enfileirar_job('exportar', _job_exportar, formato, colunas,
+                            arquivo_nome=nome_arquivo, arquivo_mimetype=mimetype)
+    return resposta_job_enfileirado(job_id)
+
+@app.route('/api/jobs/recalcular_valores', methods=['POST'])
+@requer_acesso('Administrador')
+def job_recalcular_valores():
+    return resposta_job_enfileirado(enfileirar_job('recalcular', _job_recalcular))
+
+@app.route('/api/jobs/<string:job_id>', methods=['GET'])
+def status_job(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+    # Só informa a interrupção; o registro não é alterado aqui
+    status, mensagem = job.status, job.mensagem
+    if job.status == 'executando' and job.atualizado_em < agora() - JOBS_TEMPO_LIMITE:
+        status, mensagem = 'erro', 'Tarefa interrompida (sem progresso dentro do tempo limite).'
+    return jsonify({
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": status,
+        "processados": job.processados,
+        "erros": job.erros,
+        "mensagem": mensagem,
+        "resultado": json.loads(job.resultado) if job.resultado else None,
+        "criado_em": job.criado_em.isoformat(),
+        "atualizado_em": job.atualizado_em.isoformat(),
+        "concluido_em": job.concluido_em.isoformat() if job.concluido_em else None,
+        "download_url": f"/api/jobs/{job.id}/resultado" if job.status == 'concluido' and job.arquivo_nome else None
+    }), 200
+
+@app.route('/api/jobs/<string:job_id>/resultado', methods=['GET'])
+def resultado_job(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+    if job.status != 'concluido' or not job.arquivo_nome:
+        return jsonify({"sucesso": False, "erro": "A tarefa ainda não tem arquivo de resultado."}), 409
+    caminho = caminho_resultado_job(job.id)
+    if not os.path.exists(caminho):
+        return jsonify({"sucesso": False, "erro": "O arquivo do resultado não está mais disponível."}), 410
+    resposta = send_file(
+        caminho,
+        mimetype=job.arquivo_mimetype,
+        as_attachment=True,
+        download_name=job.arquivo_nome
+    )
+    # O mimetype do CSV já traz o charset; o send_file acrescentaria outro
+    resposta.headers['Content-Type'] = job.arquivo_mimetype
+    return resposta
+
+# =======================================================================
+# FIM: TAREFAS EM SEGUNDO PLANO
+# =======================================================================
 
 
 # ▶️ Início do servidor (esta parte não é usada pelo Render, mas é boa para testes locais)
 if __name__ == '__main__':
+    preparar_banco()
     app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
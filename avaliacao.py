@@ -0,0 +1,177 @@
+# avaliacao.py - MOTOR DE AVALIAÇÃO (VVT / VVC / VVI / IPTU) EM LOTE
+#
+# Calcula os valores venais de um conjunto inteiro de cadastros de uma só vez,
+# a partir das tabelas da planta genérica carregadas uma única vez na memória.
+# As regras são exatamente as mesmas do cálculo linha a linha que existia em
+# listar_cadastros_reurb:
+#   - VVT = área do lote × valor do m² do logradouro (igualdade exata)
+#   - VVC = área construída × valor do m² do padrão construtivo (igualdade exata);
+#     quando o cadastro tem construções (tabela construcoes), o VVC é a soma
+#     dessa conta sobre as construções, calculada no banco e recebida pronta
+#   - VVI = VVT + VVC
+#   - IPTU = VVI × alíquota / 100, onde a alíquota é a primeira cujo tipo
+#     casa com ILIKE '%<uso>%' (somente quando VVI > 0)
+#   - REURB-S quando a renda familiar é informada e <= 4000, senão REURB-E
+#
+# O pandas/numpy só é importado na primeira avaliação, para não pesar na
+# inicialização de cada worker.
+
+import re
+
+LIMITE_RENDA_REURB_S = 4000
+
+# Campos de cadastros_reurb de que o cálculo depende e campos que ele produz
+COLUNAS_AVALIACAO = ['imovel_logradouro', 'imovel_area_total', 'imovel_tipo_construcao',
+                     'imovel_area_construida', 'imovel_uso', 'reurb_renda_familiar']
+CAMPOS_VALOR_VENAL = ['vvt', 'vvc', 'vvi', 'iptu']
+
+
+def padrao_ilike(termo):
+    # Converte o padrão '%<termo>%' do ILIKE do PostgreSQL em regex:
+    # '%' -> qualquer sequência, '_' -> um caractere, '\' escapa o próximo.
+    partes = ['.*']
+    escapar = False
+    for ch in termo:
+        if escapar:
+            partes.append(re.escape(ch))
+            escapar = False
+        elif ch == '\\':
+            escapar = True
+        elif ch == '%':
+            partes.append('.*')
+        elif ch == '_':
+            partes.append('.')
+        else:
+            partes.append(re.escape(ch))
+    partes.append('.*')
+    return re.compile(''.join(partes), re.IGNORECASE | re.DOTALL)
+
+
+class TabelasPlanta:
+    """Tabelas da planta genérica prontas para consulta em memória.
+
+    Cada tabela é recebida como uma sequência de pares (chave, valor) já
+    ordenada por id; quando há chaves repetidas vale a primeira, como o
+    `.first()` das consultas originais.
+    """
+
+    def __init__(self, logradouros, padroes, aliquotas, pgv=()):
+        self.pgv = {}
+        for descricao, valor_m2 in pgv:
+            self.pgv.setdefault(descricao, valor_m2)
+        self.logradouros = {}
+        for logradouro, valor_m2 in logradouros:
+            self.logradouros.setdefault(logradouro, valor_m2)
+        self.padroes = {}
+        for descricao, valor_m2 in padroes:
+            self.padroes.setdefault(descricao, valor_m2)
+        self.aliquotas = [(tipo, aliquota) for tipo, aliquota in aliquotas]
+        self._aliquota_por_uso = {}
+
+    def aliquota_para_uso(self, uso):
+        if uso not in self._aliquota_por_uso:
+            regex = padrao_ilike(uso)
+            self._aliquota_por_uso[uso] = next(
+                (aliquota for tipo, aliquota in self.aliquotas if tipo is not None and regex.fullmatch(tipo)),
+                None
+            )
+        return self._aliquota_por_uso[uso]
+
+
+def classificar_reurb(renda_familiar):
+    if renda_familiar and renda_familiar <= LIMITE_RENDA_REURB_S:
+        return "REURB-S"
+    return "REURB-E"
+
+
+def _texto_preenchido(serie):
+    if serie.dtype.name == 'category':
+        return serie.notna() & serie.ne('')
+    return serie.notna() & serie.astype(object).ne('')
+
+
+def _numero_preenchido(serie):
+    return serie.notna() & serie.ne(0)
+
+
+def _texto(serie):
+    # Colunas categóricas (o retrato da simulação) ficam como estão
+    return serie if serie.dtype.name == 'category' else serie.astype(object)
+
+
+def mapear_valores(serie, valores):
+    """serie.map(valores) como float; em colunas categóricas o dicionário é
+    aplicado uma vez por categoria, não uma vez por linha."""
+    import numpy as np
+    import pandas as pd
+
+    if serie.dtype.name != 'category':
+        return serie.map(valores).astype(float)
+    por_categoria = np.append(np.asarray(serie.cat.categories.map(valores), dtype=float), np.nan)
+    return pd.Series(por_categoria[serie.cat.codes.to_numpy()], index=serie.index)
+
+
+def avaliar_lote(df, tabelas):
+    """Avalia um DataFrame de cadastros de uma vez.
+
+    Colunas usadas: imovel_logradouro, imovel_area_total, imovel_tipo_construcao,
+    imovel_area_construida, imovel_uso e reurb_renda_familiar. A coluna opcional
+    vvc_construcoes traz o VVC já somado das construções; onde ela é nula valem
+    os campos de construção do próprio cadastro. Devolve um DataFrame com o
+    mesmo índice e as colunas vvt, vvc, vvi, iptu e tipo_reurb.
+    """
+    import numpy as np
+    import pandas as pd
+
+    area_total = pd.to_numeric(df['imovel_area_total'], errors='coerce').astype(float)
+    area_construida = pd.to_numeric(df['imovel_area_construida'], errors='coerce').astype(float)
+    renda = pd.to_numeric(df['reurb_renda_familiar'], errors='coerce').astype(float)
+    logradouro = _texto(df['imovel_logradouro'])
+    tipo_construcao = _texto(df['imovel_tipo_construcao'])
+    uso = _texto(df['imovel_uso'])
+
+    # 🧮 VVT e VVC: um único "merge" por dicionário em vez de uma consulta por linha
+    valor_terreno = mapear_valores(logradouro, tabelas.logradouros)
+    tem_vvt = _texto_preenchido(logradouro) & _numero_preenchido(area_total) & valor_terreno.notna()
+    vvt = np.where(tem_vvt, area_total * valor_terreno, 0.0)
+
+    valor_construcao = mapear_valores(tipo_construcao, tabelas.padroes)
+    tem_vvc = _texto_preenchido(tipo_construcao) & _numero_preenchido(area_construida) & valor_construcao.notna()
+    vvc = np.where(tem_vvc, area_construida * valor_construcao, 0.0)
+    if 'vvc_construcoes' in df:
+        soma_construcoes = pd.to_numeric(df['vvc_construcoes'], errors='coerce').astype(float)
+        vvc = np.where(soma_construcoes.notna(), soma_construcoes, vvc)
+
+    vvi = vvt + vvc
+
+    # 🧮 IPTU: o ILIKE é resolvido uma vez por uso distinto, não por cadastro
+    tem_uso = _texto_preenchido(uso)
+    aliquotas_por_uso = {u: tabelas.aliquota_para_uso(u) for u in uso[tem_uso].unique()}
+    aliquota = mapear_valores(uso, aliquotas_por_uso).where(tem_uso)
+    tem_iptu = tem_uso & (vvi > 0) & aliquota.notna()
+    iptu = np.where(tem_iptu, vvi * (aliquota / 100.0), 0.0)
+
+    reurb_s = renda.notna() & renda.ne(0) & (renda <= LIMITE_RENDA_REURB_S)
+    tipo_reurb = np.where(reurb_s, 'REURB-S', 'REURB-E')
+
+    return pd.DataFrame({
+        'vvt': vvt, 'vvc': vvc, 'vvi': vvi, 'iptu': iptu, 'tipo_reurb': tipo_reurb
+    }, index=df.index)
+
+
+def avaliar_registros(registros, tabelas, vvc_construcoes=None):
+    """Atalho para listas de dicionários/linhas: devolve uma lista de dicts
+    {vvt, vvc, vvi, iptu, tipo_reurb} com floats nativos do Python.
+    `vvc_construcoes`, se informado, é alinhado a `registros` (None para os
+    cadastros sem construções)."""
+    if not registros:
+        return []
+    import pandas as pd
+    df = pd.DataFrame.from_records(
+        [{c: (r[c] if isinstance(r, dict) else getattr(r, c)) for c in COLUNAS_AVALIACAO} for r in registros],
+        columns=COLUNAS_AVALIACAO
+    )
+    if vvc_construcoes is not None:
+        df['vvc_construcoes'] = pd.Series(list(vvc_construcoes), index=df.index, dtype=object)
+    resultado = avaliar_lote(df, tabelas)
+    return resultado.to_dict(orient='records')
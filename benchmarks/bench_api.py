@@ -0,0 +1,267 @@
+# bench_api.py - BENCHMARK REPRODUTÍVEL DAS ROTAS PRINCIPAIS
+#
+# Gera um conjunto de dados sintético (gerar_dados.py) num SQLite temporário
+# ou no PostgreSQL indicado, e mede pelo cliente de testes do Flask as rotas
+# de login, listagem, consulta, importação, simulação e exportação: latência (p50/p90/p99),
+# vazão, número de consultas SQL por requisição e pico de memória (RSS).
+# O resultado é salvo em JSON em benchmarks/resultados/ para comparar rodadas.
+#
+# Exemplos:
+#   python benchmarks/bench_api.py --escala 10k
+#   python benchmarks/bench_api.py --escala 100k --banco postgresql://localhost/reurb_bench
+#   python benchmarks/bench_api.py --escala 10k --comparar benchmarks/resultados/anterior.json
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gerar_dados import ESCALAS, SENHA_ADMIN, popular  # noqa: E402
+
+
+def pico_rss_mb():
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+class ContadorConsultas:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args, **kwargs):
+        self.total += 1
+
+
+def medir(nome, cliente, contador, repeticoes, requisicao, log=print):
+    """Executa `requisicao(cliente, i)` `repeticoes` vezes e resume os tempos."""
+    tempos = []
+    consultas = []
+    tamanhos = []
+    falhas = 0
+    inicio_total = time.perf_counter()
+    for i in range(repeticoes):
+        antes = contador.total
+        inicio = time.perf_counter()
+        resposta = requisicao(cliente, i)
+        corpo = resposta.get_data()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.total - antes)
+        tamanhos.append(len(corpo))
+        if resposta.status_code >= 400:
+            falhas += 1
+    duracao = time.perf_counter() - inicio_total
+    resultado = {
+        'repeticoes': repeticoes,
+        'falhas': falhas,
+        'latencia_ms': {
+            'p50': round(percentil(tempos, 50), 2),
+            'p90': round(percentil(tempos, 90), 2),
+            'p99': round(percentil(tempos, 99), 2),
+            'max': round(max(tempos), 2)
+        },
+        'vazao_req_s': round(repeticoes / duracao, 2),
+        'consultas_sql_por_req': round(sum(consultas) / len(consultas), 1),
+        'bytes_resposta_medio': int(sum(tamanhos) / len(tamanhos)),
+        'pico_rss_mb': pico_rss_mb()
+    }
+    log(f"  {nome:<22} p50={resultado['latencia_ms']['p50']:>9.2f}ms  p99={resultado['latencia_ms']['p99']:>9.2f}ms  "
+        f"{resultado['vazao_req_s']:>8.1f} req/s  {resultado['consultas_sql_por_req']:>6.1f} SQL/req"
+        + (f"  ({falhas} falhas)" if falhas else ""))
+    return resultado
+
+
+def csv_importacao(linhas, semente):
+    rnd = random.Random(semente)
+    saida = io.StringIO()
+    saida.write("Nome Completo;CPF;Logradouro do Imóvel;Número do Imóvel;Bairro do Imóvel;"
+                "Área Total do Lote (m²);Área Construída (m²);Uso Principal do Imóvel;"
+                "Padrão Construtivo;Renda familiar mensal total (R$)\n")
+    for i in range(linhas):
+        saida.write(f"Pessoa Importada {i};{rnd.randint(10**10, 10**11 - 1)};Rua Importação {i % 50};{i};Centro;"
+                    f"{rnd.uniform(80, 500):.2f};{rnd.uniform(20, 200):.2f};Residencial;Normal;"
+                    f"{rnd.uniform(500, 8000):.2f}\n")
+    return saida.getvalue().encode('utf-8')
+
+
+def versao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def executar(args):
+    escala = ESCALAS[args.escala]
+    arquivo_temporario = None
+    if args.banco == 'sqlite':
+        descritor, arquivo_temporario = tempfile.mkstemp(suffix='.sqlite', prefix='bench_reurb_')
+        os.close(descritor)
+        os.environ['DATABASE_URL'] = f"sqlite:///{arquivo_temporario}"
+    else:
+        os.environ['DATABASE_URL'] = args.banco
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-' + 'x' * 32)
+
+    rss_antes_import = pico_rss_mb()
+    inicio_import = time.perf_counter()
+    import app as app_modulo
+    tempo_import = time.perf_counter() - inicio_import
+
+    print(f"Gerando {escala} cadastros ({args.banco})...")
+    resumo_dados = popular(app_modulo, escala, args.semente, log=(lambda *_: None) if args.silencioso else print)
+
+    app = app_modulo.app
+    cliente = app.test_client()
+    rnd = random.Random(args.semente)
+    with app.app_context():
+        contador = ContadorConsultas(app_modulo.db.engine)
+        maior_id = app_modulo.db.session.query(app_modulo.db.func.max(app_modulo.CadastroReurb.id)).scalar()
+        menor_id = app_modulo.db.session.query(app_modulo.db.func.min(app_modulo.CadastroReurb.id)).scalar()
+
+    repeticoes = args.repeticoes
+    resultados = {}
+    print("Medindo:")
+
+    def login(c, i):
+        return c.post('/api/login', json={'usuario': 'benchmark', 'senha': SENHA_ADMIN})
+    resultados['login'] = medir('login', cliente, contador, max(5, repeticoes // 5), login)
+    token = login(cliente, 0).get_json().get('access_token')
+    cabecalho = {'Authorization': f'Bearer {token}'} if token else {}
+
+    resultados['listar_primeira_pagina'] = medir(
+        'listar (1ª página)', cliente, contador, repeticoes,
+        lambda c, i: c.get('/api/novo_cadastro_reurb/listar?limit=100'))
+
+    cursores = {'atual': None}
+
+    def listar_sequencial(c, i):
+        url = '/api/novo_cadastro_reurb/listar?limit=100'
+        if cursores['atual']:
+            url += f"&cursor={cursores['atual']}"
+        resposta = c.get(url)
+        cursores['atual'] = resposta.headers.get('X-Proximo-Cursor')
+        return resposta
+    resultados['listar_paginando'] = medir('listar (paginando)', cliente, contador, repeticoes, listar_sequencial)
+
+    resultados['listar_filtrado'] = medir(
+        'listar (filtro bairro)', cliente, contador, repeticoes,
+        lambda c, i: c.get('/api/novo_cadastro_reurb/listar?limit=100&bairro=Centro&ordenar=nome'))
+
+    resultados['obter'] = medir(
+        'obter', cliente, contador, repeticoes,
+        lambda c, i: c.get(f'/api/novo_cadastro_reurb/{rnd.randint(menor_id, maior_id)}'))
+
+    resultados['buscar'] = medir(
+        'buscar', cliente, contador, repeticoes,
+        lambda c, i: c.get(f"/api/novo_cadastro_reurb/buscar?q={rnd.choice(['silva', 'maria jo', 'rua'])}"))
+
+    linhas_importacao = args.linhas_importacao
+    conteudo_csv = csv_importacao(linhas_importacao, args.semente)
+    resultados['importar'] = medir(
+        f'importar ({linhas_importacao} linhas)', cliente, contador, args.repeticoes_pesadas,
+        lambda c, i: c.post('/api/importar', data={'arquivo': (io.BytesIO(conteudo_csv), 'bench.csv')},
+                            content_type='multipart/form-data'))
+    resultados['importar']['linhas_por_segundo'] = round(
+        linhas_importacao / (resultados['importar']['latencia_ms']['p50'] / 1000), 1)
+
+    resultados['simulacao'] = medir(
+        'simulacao', cliente, contador, args.repeticoes_pesadas,
+        lambda c, i: c.post('/api/simulacao', headers=cabecalho, json={
+            'padroes': [{'descricao': 'Normal', 'valor_m2': 1200 + i}],
+            'aliquotas': [{'tipo': 'Residencial', 'aliquota': 0.8}]
+        }))
+
+    for formato in ('csv', 'xlsx'):
+        resultados[f'exportar_{formato}'] = medir(
+            f'exportar ({formato})', cliente, contador, args.repeticoes_pesadas,
+            lambda c, i, formato=formato: c.post('/api/exportar', json={'formato': formato, 'incluir_valores': True}))
+
+    relatorio = {
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': versao_git(),
+        'escala': args.escala,
+        'banco': 'sqlite' if args.banco == 'sqlite' else args.banco.split('://', 1)[0],
+        'semente': args.semente,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'dados': resumo_dados,
+        'inicializacao': {
+            'tempo_import_app_s': round(tempo_import, 3),
+            'rss_antes_import_mb': rss_antes_import
+        },
+        'pico_rss_mb': pico_rss_mb(),
+        'rotas': resultados
+    }
+
+    if arquivo_temporario:
+        os.remove(arquivo_temporario)
+    return relatorio
+
+
+def comparar(atual, anterior):
+    print(f"\nComparação com {anterior.get('commit')} ({anterior.get('data')}):")
+    for rota, medida in atual['rotas'].items():
+        antes = anterior.get('rotas', {}).get(rota)
+        if not antes:
+            continue
+        p50_atual, p50_antes = medida['latencia_ms']['p50'], antes['latencia_ms']['p50']
+        variacao = (p50_atual - p50_antes) / p50_antes * 100 if p50_antes else 0.0
+        print(f"  {rota:<24} p50 {p50_antes:>9.2f} -> {p50_atual:>9.2f} ms ({variacao:+.1f}%)  "
+              f"SQL/req {antes['consultas_sql_por_req']} -> {medida['consultas_sql_por_req']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das rotas da API de REURB com dados sintéticos.")
+    parser.add_argument('--escala', choices=ESCALAS, default='10k')
+    parser.add_argument('--banco', default='sqlite',
+                        help="'sqlite' (arquivo temporário) ou uma URL do PostgreSQL. ATENÇÃO: os dados do banco são apagados.")
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--repeticoes-pesadas', type=int, default=3, help="Repetições de importação e exportação")
+    parser.add_argument('--linhas-importacao', type=int, default=5000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default=os.path.join(RAIZ, 'benchmarks', 'resultados'))
+    parser.add_argument('--comparar', help="JSON de uma rodada anterior para comparar")
+    parser.add_argument('--silencioso', action='store_true')
+    args = parser.parse_args()
+
+    relatorio = executar(args)
+
+    os.makedirs(args.saida, exist_ok=True)
+    nome = f"{relatorio['data'].replace(':', '').replace('-', '')[:15]}_{relatorio['escala']}_{relatorio['banco']}.json"
+    caminho = os.path.join(args.saida, nome)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nPico de RSS: {relatorio['pico_rss_mb']} MB. Resultado salvo em {caminho}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(relatorio, json.load(arquivo))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# gerar_dados.py - GERADOR DE DADOS SINTÉTICOS DE REURB PARA OS BENCHMARKS
+#
+# Cria cadastros (com construções), valores de logradouro, padrões construtivos,
+# alíquotas e um usuário administrador no banco configurado em DATABASE_URL.
+# Os dados são determinísticos para uma mesma semente e escala, para que
+# rodadas diferentes sejam comparáveis.
+#
+# Uso direto:  DATABASE_URL=sqlite:///bench.sqlite python benchmarks/gerar_dados.py --escala 10k
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ESCALAS = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+BAIRROS = ['Centro', 'Vila Nova', 'Jardim das Flores', 'São José', 'Alto da Serra', 'Beira Rio',
+           'Conjunto Esperança', 'Parque Industrial', 'Boa Vista', 'Santa Luzia']
+TIPOS_VIA = ['Rua', 'Avenida', 'Travessa', 'Passagem', 'Alameda']
+NOMES = ['Maria', 'José', 'Ana', 'João', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Adriana', 'Luíza',
+         'Raimundo', 'Sebastião', 'Joana', 'Márcia', 'Pedro', 'Conceição', 'Lucas', 'Fernanda']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira', 'Costa', 'Rodrigues',
+              'Almeida', 'Nascimento', 'Araújo', 'Carvalho', 'Gomes', 'Ribeiro', 'Barbosa']
+PADROES = [('Baixo', 650.0), ('Normal', 980.0), ('Médio', 1350.0), ('Alto', 1900.0), ('Precário', 420.0)]
+ALIQUOTAS = [('Residencial', 0.6), ('Comercial', 1.2), ('Misto', 0.9), ('Terreno Baldio', 2.0)]
+USOS = ['Residencial', 'Residencial', 'Residencial', 'Comercial', 'Misto', 'Institucional']
+
+SENHA_ADMIN = 'benchmark'
+
+
+def logradouros_para(total_cadastros, rnd):
+    quantidade = max(20, total_cadastros // 50)
+    return [f"{rnd.choice(TIPOS_VIA)} {rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {i}" for i in range(quantidade)]
+
+
+def cpf_ficticio(rnd):
+    return ''.join(str(rnd.randint(0, 9)) for _ in range(11))
+
+
+def gerar_cadastro(rnd, logradouros):
+    nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+    area_total = round(rnd.uniform(80, 600), 2)
+    construida = round(area_total * rnd.uniform(0.2, 0.9), 2) if rnd.random() > 0.1 else None
+    return {
+        'req_nome': nome,
+        'req_cpf': cpf_ficticio(rnd),
+        'req_rg': str(rnd.randint(1_000_000, 9_999_999)),
+        'req_telefone': f"(91) 9{rnd.randint(1000, 9999)}-{rnd.randint(1000, 9999)}",
+        'req_email': f"{nome.split()[0].lower()}{rnd.randint(1, 9999)}@exemplo.com",
+        'imovel_logradouro': rnd.choice(logradouros),
+        'imovel_numero': str(rnd.randint(1, 3000)),
+        'imovel_bairro': rnd.choice(BAIRROS),
+        'imovel_cidade': 'Município Exemplo',
+        'imovel_uf': 'PA',
+        'inscricao_imobiliaria': f"{rnd.randint(1, 99):02d}.{rnd.randint(1, 999):03d}.{rnd.randint(1, 9999):04d}",
+        'imovel_area_total': area_total,
+        'imovel_area_construida': construida,
+        'imovel_uso': rnd.choice(USOS),
+        'imovel_tipo_construcao': rnd.choice(PADROES)[0] if construida else None,
+        'reurb_renda_familiar': round(rnd.uniform(600, 9000), 2) if rnd.random() > 0.05 else None,
+    }
+
+
+def gerar_construcoes(rnd, cadastro_id):
+    return [{
+        'cadastro_id': cadastro_id,
+        'area_total': round(rnd.uniform(20, 200), 2),
+        'area_construida': round(rnd.uniform(15, 180), 2),
+        'uso': rnd.choice(USOS),
+        'padrao': rnd.choice(PADROES)[0],
+        'tipo': rnd.choice(['Casa', 'Anexo', 'Galpão', 'Sala'])
+    } for _ in range(rnd.choice([0, 0, 1, 1, 2, 3]))]
+
+
+def popular(app_modulo, total, semente=42, lote=5000, log=print):
+    """Apaga os dados existentes e gera `total` cadastros sintéticos."""
+    from sqlalchemy import insert, select, func
+    from werkzeug.security import generate_password_hash
+
+    m = app_modulo
+    db = m.db
+    rnd = random.Random(semente)
+    inicio = time.perf_counter()
+    m.preparar_banco()
+    with m.app.app_context():
+        for model in (m.Construcao, m.CadastroReurb, m.ValorLogradouro, m.PadraoConstrutivo,
+                      m.AliquotaIPTU, m.PGV, m.Usuario):
+            db.session.query(model).delete()
+        logradouros = logradouros_para(total, rnd)
+        db.session.execute(insert(m.ValorLogradouro), [
+            {'logradouro': l, 'valor_m2': round(rnd.uniform(35, 480), 2)} for l in logradouros])
+        db.session.execute(insert(m.PGV), [
+            {'descricao': b, 'valor_m2': round(rnd.uniform(35, 480), 2)} for b in BAIRROS])
+        db.session.execute(insert(m.PadraoConstrutivo), [{'descricao': d, 'valor_m2': v} for d, v in PADROES])
+        db.session.execute(insert(m.AliquotaIPTU), [{'tipo': t, 'aliquota': a} for t, a in ALIQUOTAS])
+        db.session.add(m.Usuario(nome='Benchmark', usuario='benchmark',
+                                 senha=generate_password_hash(SENHA_ADMIN), acesso='Administrador'))
+        for nome in ('planta_generica', 'cadastros', 'construcoes', 'usuarios'):
+            m.marcar_alteracao(nome)
+        db.session.commit()
+
+        gerados = 0
+        while gerados < total:
+            quantidade = min(lote, total - gerados)
+            linhas = [gerar_cadastro(rnd, logradouros) for _ in range(quantidade)]
+            for linha in linhas:
+                linha.update(m.campos_busca(linha))
+            ids = list(db.session.execute(insert(m.CadastroReurb).returning(m.CadastroReurb.id), linhas).scalars())
+            construcoes = [c for cadastro_id in ids for c in gerar_construcoes(rnd, cadastro_id)]
+            if construcoes:
+                db.session.execute(insert(m.Construcao), construcoes)
+            db.session.commit()
+            gerados += quantidade
+            log(f"  {gerados}/{total} cadastros")
+
+        m.recalcular_valores()
+        db.session.commit()
+        total_construcoes = db.session.scalar(select(func.count()).select_from(m.Construcao))
+    log(f"Dados gerados em {time.perf_counter() - inicio:.1f}s ({total} cadastros, {total_construcoes} construções)")
+    return {'cadastros': total, 'construcoes': total_construcoes, 'logradouros': len(logradouros)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de REURB no banco de DATABASE_URL.")
+    parser.add_argument('--escala', choices=ESCALAS, default='10k')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    if not os.environ.get('DATABASE_URL'):
+        parser.error("Defina DATABASE_URL (ex.: sqlite:///bench.sqlite)")
+    import app as app_modulo
+    popular(app_modulo, ESCALAS[args.escala], args.semente)
+
+
+if __name__ == '__main__':
+    main()
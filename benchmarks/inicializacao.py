@@ -0,0 +1,228 @@
+# inicializacao.py - TEMPO DE INICIALIZAÇÃO E MEMÓRIA POR WORKER
+#
+# Mede, em processos novos (como um worker do gunicorn recém-criado ou um
+# cold start do Render), quanto tempo leva o `import app`, a memória (RSS)
+# logo depois dele e depois da primeira requisição, e quais módulos pesados
+# já foram carregados. Com --gunicorn N sobe de verdade um gunicorn com N
+# workers e mede o tempo até responder e o RSS de cada worker (Linux).
+# O resultado é salvo em JSON em benchmarks/resultados/, como o bench_api.py.
+#
+# Exemplos:
+#   python benchmarks/inicializacao.py
+#   python benchmarks/inicializacao.py --repeticoes 10 --gunicorn 4
+#   python benchmarks/inicializacao.py --comparar benchmarks/resultados/anterior_inicializacao.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ['pandas', 'numpy', 'openpyxl', 'pyarrow', 'alembic', 'flask_migrate']
+
+
+def rss_atual_mb(pid='self'):
+    # VmRSS do /proc (Linux); fora dele, o pico do próprio processo
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return round(int(linha.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid != 'self':
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def medir_processo():
+    # Roda dentro do processo filho: importa o app do zero e faz as primeiras requisições
+    sys.path.insert(0, RAIZ)
+    rss_inicial = rss_atual_mb()
+    inicio = time.perf_counter()
+    import app as app_modulo
+    tempo_import = time.perf_counter() - inicio
+    rss_import = rss_atual_mb()
+    modulos_import = [m for m in MODULOS_PESADOS if m in sys.modules]
+
+    cliente = app_modulo.app.test_client()
+    inicio = time.perf_counter()
+    cliente.get('/api/health')
+    tempo_health = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    cliente.get('/api/novo_cadastro_reurb/listar?limit=100')
+    tempo_listar = time.perf_counter() - inicio
+
+    print(json.dumps({
+        'tempo_import_s': round(tempo_import, 3),
+        'primeira_health_ms': round(tempo_health * 1000, 1),
+        'primeira_listagem_ms': round(tempo_listar * 1000, 1),
+        'rss_interpretador_mb': rss_inicial,
+        'rss_apos_import_mb': rss_import,
+        'rss_apos_listagem_mb': rss_atual_mb(),
+        'modulos_pesados_no_import': modulos_import
+    }))
+
+
+def executar_filho(ambiente, *argumentos):
+    resultado = subprocess.run([sys.executable, os.path.abspath(__file__), *argumentos], env=ambiente,
+                               capture_output=True, text=True, check=True)
+    return json.loads(resultado.stdout.strip().splitlines()[-1]) if resultado.stdout.strip() else None
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def medir_gunicorn(ambiente, workers, tempo_limite=60):
+    porta = porta_livre()
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{porta}', 'app:app'],
+                                cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if time.perf_counter() - inicio > tempo_limite:
+                raise RuntimeError("O gunicorn não respondeu dentro do tempo limite.")
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{porta}/api/health', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+        tempo_primeira_resposta = time.perf_counter() - inicio
+        # Espera todos os workers terminarem de subir antes de medir a memória
+        time.sleep(2)
+        with open(f'/proc/{processo.pid}/task/{processo.pid}/children', encoding='ascii') as arquivo:
+            filhos = [int(pid) for pid in arquivo.read().split()]
+        rss_workers = [rss_atual_mb(pid) for pid in filhos]
+        return {
+            'workers': workers,
+            'tempo_primeira_resposta_s': round(tempo_primeira_resposta, 3),
+            'rss_master_mb': rss_atual_mb(processo.pid),
+            'rss_por_worker_mb': rss_workers,
+            'rss_total_mb': round(sum(r for r in rss_workers if r) + (rss_atual_mb(processo.pid) or 0), 1)
+        }
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+
+def resumir(amostras, campo):
+    valores = [a[campo] for a in amostras]
+    return {'mediana': round(statistics.median(valores), 3), 'min': min(valores), 'max': max(valores)}
+
+
+def versao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def executar(args):
+    ambiente = dict(os.environ)
+    ambiente.setdefault('JWT_SECRET_KEY', 'benchmark-' + 'x' * 32)
+    arquivo_temporario = None
+    if args.banco == 'sqlite':
+        descritor, arquivo_temporario = tempfile.mkstemp(suffix='.sqlite', prefix='bench_inicio_')
+        os.close(descritor)
+        ambiente['DATABASE_URL'] = f"sqlite:///{arquivo_temporario}"
+    else:
+        ambiente['DATABASE_URL'] = args.banco
+
+    try:
+        executar_filho(ambiente, '--preparar-banco')
+        amostras = []
+        for i in range(args.repeticoes):
+            amostras.append(executar_filho(ambiente, '--filho'))
+            print(f"  {i + 1}/{args.repeticoes}: import {amostras[-1]['tempo_import_s']:.3f}s, "
+                  f"RSS {amostras[-1]['rss_apos_import_mb']} MB")
+        relatorio = {
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': versao_git(),
+            'banco': 'sqlite' if args.banco == 'sqlite' else args.banco.split('://', 1)[0],
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'repeticoes': args.repeticoes,
+            'processo': {campo: resumir(amostras, campo) for campo in (
+                'tempo_import_s', 'primeira_health_ms', 'primeira_listagem_ms',
+                'rss_apos_import_mb', 'rss_apos_listagem_mb')},
+            'modulos_pesados_no_import': amostras[-1]['modulos_pesados_no_import']
+        }
+        if args.gunicorn:
+            relatorio['gunicorn'] = medir_gunicorn(ambiente, args.gunicorn)
+        return relatorio
+    finally:
+        if arquivo_temporario:
+            os.remove(arquivo_temporario)
+
+
+def comparar(atual, anterior):
+    print(f"\nComparação com {anterior.get('commit')} ({anterior.get('data')}):")
+    for campo, medida in atual['processo'].items():
+        antes = anterior.get('processo', {}).get(campo)
+        if not antes:
+            continue
+        variacao = (medida['mediana'] - antes['mediana']) / antes['mediana'] * 100 if antes['mediana'] else 0.0
+        print(f"  {campo:<24} {antes['mediana']:>9} -> {medida['mediana']:>9} ({variacao:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização e a memória por worker do app.")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--banco', default='sqlite',
+                        help="'sqlite' (arquivo temporário) ou uma URL do PostgreSQL já migrado")
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS',
+                        help="Também sobe um gunicorn com WORKERS workers e mede o RSS de cada um (Linux)")
+    parser.add_argument('--saida', default=os.path.join(RAIZ, 'benchmarks', 'resultados'))
+    parser.add_argument('--comparar', help="JSON de uma rodada anterior para comparar")
+    parser.add_argument('--filho', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--preparar-banco', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        medir_processo()
+        return
+    if args.preparar_banco:
+        sys.path.insert(0, RAIZ)
+        import app as app_modulo
+        app_modulo.preparar_banco()
+        return
+
+    relatorio = executar(args)
+    processo = relatorio['processo']
+    print(f"\nimport app: {processo['tempo_import_s']['mediana']}s (mediana), "
+          f"RSS após import: {processo['rss_apos_import_mb']['mediana']} MB, "
+          f"após a 1ª listagem: {processo['rss_apos_listagem_mb']['mediana']} MB")
+    print(f"Módulos pesados carregados no import: {', '.join(relatorio['modulos_pesados_no_import']) or 'nenhum'}")
+    if 'gunicorn' in relatorio:
+        g = relatorio['gunicorn']
+        print(f"gunicorn ({g['workers']} workers): 1ª resposta em {g['tempo_primeira_resposta_s']}s, "
+              f"RSS por worker {g['rss_por_worker_mb']} MB, total {g['rss_total_mb']} MB")
+
+    os.makedirs(args.saida, exist_ok=True)
+    nome = f"{relatorio['data'].replace(':', '').replace('-', '')[:15]}_inicializacao.json"
+    caminho = os.path.join(args.saida, nome)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado salvo em {caminho}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(relatorio, json.load(arquivo))
+
+
+if __name__ == '__main__':
+    main()
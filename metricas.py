@@ -0,0 +1,142 @@
+# metricas.py - MÉTRICAS NO FORMATO TEXTO DO PROMETHEUS
+#
+# Contadores e histogramas simples, mantidos em memória por processo. Com
+# vários workers do gunicorn, defina METRICAS_DIR: cada worker grava de tempos
+# em tempos um retrato das suas séries em <METRICAS_DIR>/<pid>.json e a rota
+# de métricas soma os retratos de todos os workers, então qualquer worker que
+# atenda o scrape devolve o total da instância.
+
+import json
+import os
+import threading
+import time
+
+LIMITES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_BYTES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+LIMITES_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class RegistroMetricas:
+    def __init__(self, diretorio=None, intervalo_gravacao=5.0):
+        self.diretorio = diretorio
+        self.intervalo_gravacao = intervalo_gravacao
+        self._definicoes = {}
+        self._series = {}
+        self._lock = threading.Lock()
+        self._ultima_gravacao = 0.0
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def contador(self, nome, ajuda):
+        self._definicoes[nome] = {"tipo": "counter", "ajuda": ajuda}
+        self._series[nome] = {}
+
+    def histograma(self, nome, ajuda, limites):
+        self._definicoes[nome] = {"tipo": "histogram", "ajuda": ajuda, "limites": list(limites)}
+        self._series[nome] = {}
+
+    def incrementar(self, nome, rotulos, valor=1):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            series = self._series[nome]
+            series[chave] = series.get(chave, 0) + valor
+
+    def observar(self, nome, rotulos, valor):
+        chave = tuple(sorted(rotulos.items()))
+        limites = self._definicoes[nome]["limites"]
+        with self._lock:
+            serie = self._series[nome].get(chave)
+            if serie is None:
+                serie = self._series[nome][chave] = {"baldes": [0] * (len(limites) + 1), "soma": 0.0, "total": 0}
+            indice = next((i for i, limite in enumerate(limites) if valor <= limite), len(limites))
+            serie["baldes"][indice] += 1
+            serie["soma"] += valor
+            serie["total"] += 1
+
+    # 💾 Retratos por processo, para somar os workers
+
+    def _retrato(self):
+        with self._lock:
+            return {nome: [[list(chave), valor] for chave, valor in series.items()]
+                    for nome, series in self._series.items()}
+
+    def gravar(self):
+        if not self.diretorio:
+            return
+        caminho = os.path.join(self.diretorio, f"{os.getpid()}.json")
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self._retrato(), arquivo)
+        os.replace(temporario, caminho)
+        self._ultima_gravacao = time.monotonic()
+
+    def talvez_gravar(self):
+        if self.diretorio and time.monotonic() - self._ultima_gravacao >= self.intervalo_gravacao:
+            self.gravar()
+
+    def _retratos(self):
+        if not self.diretorio:
+            yield self._retrato()
+            return
+        self.gravar()
+        for nome_arquivo in os.listdir(self.diretorio):
+            if not nome_arquivo.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.diretorio, nome_arquivo), encoding='utf-8') as arquivo:
+                    yield json.load(arquivo)
+            except (OSError, ValueError):
+                continue  # worker gravando neste instante ou arquivo corrompido
+
+    def _agregar(self):
+        totais = {nome: {} for nome in self._definicoes}
+        for retrato in self._retratos():
+            for nome, series in retrato.items():
+                if nome not in totais:
+                    continue
+                for chave, valor in series:
+                    chave = tuple(tuple(par) for par in chave)
+                    atual = totais[nome].get(chave)
+                    if not isinstance(valor, dict):
+                        totais[nome][chave] = (atual or 0) + valor
+                    elif atual is None:
+                        totais[nome][chave] = {"baldes": list(valor["baldes"]), "soma": valor["soma"], "total": valor["total"]}
+                    else:
+                        atual["baldes"] = [a + b for a, b in zip(atual["baldes"], valor["baldes"])]
+                        atual["soma"] += valor["soma"]
+                        atual["total"] += valor["total"]
+        return totais
+
+    def exportar_texto(self):
+        linhas = []
+        for nome, series in self._agregar().items():
+            definicao = self._definicoes[nome]
+            linhas.append(f"# HELP {nome} {definicao['ajuda']}")
+            linhas.append(f"# TYPE {nome} {definicao['tipo']}")
+            for chave, valor in sorted(series.items()):
+                if definicao["tipo"] == "counter":
+                    linhas.append(f"{nome}{_rotulos(chave)} {_numero(valor)}")
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(definicao["limites"] + ["+Inf"], valor["baldes"]):
+                    acumulado += quantidade
+                    linhas.append(f"{nome}_bucket{_rotulos(chave + (('le', _numero(limite)),))} {acumulado}")
+                linhas.append(f"{nome}_sum{_rotulos(chave)} {_numero(valor['soma'])}")
+                linhas.append(f"{nome}_count{_rotulos(chave)} {valor['total']}")
+        return "\n".join(linhas) + "\n"
+
+
+def _numero(valor):
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return f"{valor:.1f}"
+    return repr(valor)
+
+
+def _rotulos(chave):
+    if not chave:
+        return ""
+    escapados = (f'{nome}="{str(valor).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                 for nome, valor in chave)
+    return "{" + ",".join(escapados) + "}"
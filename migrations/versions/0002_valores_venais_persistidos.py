@@ -0,0 +1,56 @@
+"""valores venais persistidos em cadastros_reurb e contador de versão por tabela
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 19:25:02.114870
+
+versoes_tabelas não existia no esquema original (0001). Bancos em que ela já
+foi criada pelo db.create_all() das versões intermediárias só recebem a
+linha 'planta_generica', se faltar.
+
+Depois do upgrade, rode POST /api/admin/recalcular_valores uma vez para
+preencher os cadastros existentes (até lá eles são avaliados na leitura).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+versoes_tabelas = sa.table('versoes_tabelas', sa.column('nome', sa.String), sa.column('versao', sa.Integer))
+
+
+def upgrade():
+    conexao = op.get_bind()
+    if not sa.inspect(conexao).has_table('versoes_tabelas'):
+        op.create_table('versoes_tabelas',
+        sa.Column('nome', sa.String(length=50), nullable=False),
+        sa.Column('versao', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('nome')
+        )
+    existe = conexao.execute(
+        sa.select(versoes_tabelas.c.nome).where(versoes_tabelas.c.nome == 'planta_generica')
+    ).first()
+    if not existe:
+        op.bulk_insert(versoes_tabelas, [{'nome': 'planta_generica', 'versao': 0}])
+
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vvt', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('vvc', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('vvi', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('iptu', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        batch_op.drop_column('iptu')
+        batch_op.drop_column('vvi')
+        batch_op.drop_column('vvc')
+        batch_op.drop_column('vvt')
+
+    op.drop_table('versoes_tabelas')
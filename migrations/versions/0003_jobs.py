@@ -0,0 +1,38 @@
+"""tabela de tarefas em segundo plano
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 19:52:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('processados', sa.Integer(), nullable=False),
+    sa.Column('erros', sa.Integer(), nullable=False),
+    sa.Column('mensagem', sa.Text(), nullable=True),
+    sa.Column('resultado', sa.Text(), nullable=True),
+    sa.Column('arquivo_nome', sa.String(length=100), nullable=True),
+    sa.Column('arquivo_mimetype', sa.String(length=100), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+    sa.Column('concluido_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('jobs')
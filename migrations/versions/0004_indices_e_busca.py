@@ -0,0 +1,124 @@
+"""índices das colunas de consulta e colunas normalizadas para a busca
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:14:51.902337
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+TAMANHO_LOTE = 5000
+
+
+def _normalizar(valor):
+    if not valor:
+        return None
+    sem_acento = unicodedata.normalize('NFKD', str(valor)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acento.lower().split()) or None
+
+
+def _digitos(valor):
+    return ''.join(ch for ch in str(valor or '') if ch.isdigit()) or None
+
+
+def _preencher_busca():
+    # Preenche as colunas normalizadas dos cadastros existentes, em lotes por id
+    conexao = op.get_bind()
+    cadastros = sa.table('cadastros_reurb', sa.column('id', sa.Integer), sa.column('req_nome', sa.String),
+                         sa.column('req_cpf', sa.String), sa.column('imovel_logradouro', sa.String),
+                         sa.column('imovel_numero', sa.String), sa.column('imovel_bairro', sa.String),
+                         sa.column('busca_nome', sa.String), sa.column('busca_cpf', sa.String),
+                         sa.column('busca_endereco', sa.String))
+    ultimo_id = 0
+    while True:
+        lote = conexao.execute(
+            sa.select(cadastros.c.id, cadastros.c.req_nome, cadastros.c.req_cpf, cadastros.c.imovel_logradouro,
+                      cadastros.c.imovel_numero, cadastros.c.imovel_bairro)
+            .where(cadastros.c.id > ultimo_id).order_by(cadastros.c.id).limit(TAMANHO_LOTE)
+        ).all()
+        if not lote:
+            break
+        conexao.execute(
+            cadastros.update().where(cadastros.c.id == sa.bindparam('b_id')).values(
+                busca_nome=sa.bindparam('b_nome'), busca_cpf=sa.bindparam('b_cpf'),
+                busca_endereco=sa.bindparam('b_endereco')),
+            [{
+                'b_id': linha.id,
+                'b_nome': _normalizar(linha.req_nome),
+                'b_cpf': _digitos(linha.req_cpf),
+                'b_endereco': (_normalizar(' '.join(str(v) for v in (linha.imovel_logradouro, linha.imovel_numero,
+                                                                     linha.imovel_bairro) if v)) or '')[:300] or None
+            } for linha in lote]
+        )
+        ultimo_id = lote[-1].id
+
+
+def upgrade():
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('busca_nome', sa.String(length=150), nullable=True))
+        batch_op.add_column(sa.Column('busca_cpf', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('busca_endereco', sa.String(length=300), nullable=True))
+        batch_op.create_index(batch_op.f('ix_cadastros_reurb_req_cpf'), ['req_cpf'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cadastros_reurb_inscricao_imobiliaria'), ['inscricao_imobiliaria'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cadastros_reurb_imovel_logradouro'), ['imovel_logradouro'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cadastros_reurb_imovel_bairro'), ['imovel_bairro'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cadastros_reurb_imovel_tipo_construcao'), ['imovel_tipo_construcao'], unique=False)
+        batch_op.create_index('ix_cadastros_reurb_busca_cpf', ['busca_cpf'], unique=False,
+                              postgresql_ops={'busca_cpf': 'text_pattern_ops'})
+
+    with op.batch_alter_table('construcoes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_construcoes_cadastro_id'), ['cadastro_id'], unique=False)
+
+    with op.batch_alter_table('padroes_construtivos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_padroes_construtivos_descricao'), ['descricao'], unique=False)
+
+    with op.batch_alter_table('valores_logradouro', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_valores_logradouro_logradouro'), ['logradouro'], unique=False)
+
+    _preencher_busca()
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_cadastros_reurb_busca_nome_trgm', 'cadastros_reurb', ['busca_nome'],
+                        postgresql_using='gin', postgresql_ops={'busca_nome': 'gin_trgm_ops'})
+        op.create_index('ix_cadastros_reurb_busca_endereco_trgm', 'cadastros_reurb', ['busca_endereco'],
+                        postgresql_using='gin', postgresql_ops={'busca_endereco': 'gin_trgm_ops'})
+        op.create_index('ix_cadastros_reurb_inscricao_prefixo', 'cadastros_reurb', ['inscricao_imobiliaria'],
+                        postgresql_ops={'inscricao_imobiliaria': 'varchar_pattern_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_cadastros_reurb_inscricao_prefixo', table_name='cadastros_reurb')
+        op.drop_index('ix_cadastros_reurb_busca_endereco_trgm', table_name='cadastros_reurb')
+        op.drop_index('ix_cadastros_reurb_busca_nome_trgm', table_name='cadastros_reurb')
+
+    with op.batch_alter_table('valores_logradouro', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_valores_logradouro_logradouro'))
+
+    with op.batch_alter_table('padroes_construtivos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_padroes_construtivos_descricao'))
+
+    with op.batch_alter_table('construcoes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_construcoes_cadastro_id'))
+
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        batch_op.drop_index('ix_cadastros_reurb_busca_cpf')
+        batch_op.drop_index(batch_op.f('ix_cadastros_reurb_imovel_tipo_construcao'))
+        batch_op.drop_index(batch_op.f('ix_cadastros_reurb_imovel_bairro'))
+        batch_op.drop_index(batch_op.f('ix_cadastros_reurb_imovel_logradouro'))
+        batch_op.drop_index(batch_op.f('ix_cadastros_reurb_inscricao_imobiliaria'))
+        batch_op.drop_index(batch_op.f('ix_cadastros_reurb_req_cpf'))
+        batch_op.drop_column('busca_endereco')
+        batch_op.drop_column('busca_cpf')
+        batch_op.drop_column('busca_nome')
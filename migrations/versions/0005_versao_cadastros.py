@@ -0,0 +1,32 @@
+"""contador de versão dos cadastros
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 23:05:12.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+versoes_tabelas = sa.table('versoes_tabelas', sa.column('nome', sa.String), sa.column('versao', sa.Integer))
+
+
+def upgrade():
+    conexao = op.get_bind()
+    existe = conexao.execute(
+        sa.select(versoes_tabelas.c.nome).where(versoes_tabelas.c.nome == 'cadastros')
+    ).first()
+    if not existe:
+        op.bulk_insert(versoes_tabelas, [{'nome': 'cadastros', 'versao': 0}])
+
+
+def downgrade():
+    op.execute(versoes_tabelas.delete().where(versoes_tabelas.c.nome == 'cadastros'))
@@ -0,0 +1,36 @@
+"""data da última alteração por tabela (ETag / Last-Modified)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 23:41:37.105264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+versoes_tabelas = sa.table('versoes_tabelas', sa.column('nome', sa.String), sa.column('versao', sa.Integer))
+
+
+def upgrade():
+    with op.batch_alter_table('versoes_tabelas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('alterado_em', sa.DateTime(), nullable=True))
+
+    conexao = op.get_bind()
+    existentes = {nome for (nome,) in conexao.execute(sa.select(versoes_tabelas.c.nome))}
+    novas = [{'nome': nome, 'versao': 0} for nome in ('construcoes', 'usuarios') if nome not in existentes]
+    if novas:
+        op.bulk_insert(versoes_tabelas, novas)
+
+
+def downgrade():
+    op.execute(versoes_tabelas.delete().where(versoes_tabelas.c.nome.in_(['construcoes', 'usuarios'])))
+    with op.batch_alter_table('versoes_tabelas', schema=None) as batch_op:
+        batch_op.drop_column('alterado_em')
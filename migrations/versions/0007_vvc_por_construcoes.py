@@ -0,0 +1,35 @@
+"""VVC somado das construções: invalida os valores gravados dos cadastros com construções
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:12:08.640219
+
+Os valores venais desses cadastros foram gravados com a regra antiga (só os
+campos de construção do próprio cadastro). Eles voltam a nulo, o que faz a
+listagem e a exportação os avaliarem na hora com a regra nova, até que o
+recálculo (POST /api/jobs/recalcular_valores) os grave de novo.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cadastros = sa.table('cadastros_reurb', sa.column('id', sa.Integer), sa.column('vvt', sa.Float),
+                         sa.column('vvc', sa.Float), sa.column('vvi', sa.Float), sa.column('iptu', sa.Float))
+    construcoes = sa.table('construcoes', sa.column('cadastro_id', sa.Integer))
+    op.execute(
+        cadastros.update()
+        .where(cadastros.c.id.in_(sa.select(construcoes.c.cadastro_id)))
+        .values(vvt=None, vvc=None, vvi=None, iptu=None)
+    )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,203 @@
+"""anexos (fotos, croqui e documentos de posse) fora da linha do cadastro
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 01:03:51.274806
+
+Cria as tabelas anexos e anexos_cadastro, copia o conteúdo das colunas
+imovel_docs_posse, imovel_fotos e imovel_croqui em lotes de
+TAMANHO_LOTE cadastros (por id) e só então remove as colunas. O downgrade
+recria as colunas e remonta o texto original a partir dos anexos.
+
+As funções de decomposição são uma cópia congelada das de anexos.py nesta
+revisão: mudanças futuras naquele módulo não alteram o que esta migração faz.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+TAMANHO_LOTE = 500
+
+CAMPOS_ANEXO = ['imovel_docs_posse', 'imovel_fotos', 'imovel_croqui']
+
+MIMETYPE_TEXTO = 'text/plain; charset=utf-8'
+
+PADRAO_DATA_URL = re.compile(r'data:([\w.+-]+/[\w.+-]+);base64,(.*)', re.DOTALL)
+
+
+def hash_anexo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _decompor_item(item):
+    combinacao = PADRAO_DATA_URL.fullmatch(item)
+    if combinacao:
+        try:
+            conteudo = base64.b64decode(combinacao.group(2), validate=True)
+        except (binascii.Error, ValueError):
+            pass
+        else:
+            return conteudo, combinacao.group(1), 'data_url'
+    return item.encode('utf-8'), MIMETYPE_TEXTO, 'texto'
+
+
+def recompor(partes, em_lista):
+    itens = [
+        f"data:{mimetype};base64,{base64.b64encode(conteudo).decode('ascii')}" if formato == 'data_url'
+        else bytes(conteudo).decode('utf-8')
+        for conteudo, mimetype, formato in partes
+    ]
+    if em_lista:
+        return json.dumps(itens, ensure_ascii=False, separators=(',', ':'))
+    return itens[0]
+
+
+def decompor(valor):
+    lista = None
+    if valor.startswith('['):
+        try:
+            lista = json.loads(valor)
+        except ValueError:
+            lista = None
+        if not (isinstance(lista, list) and lista and all(isinstance(item, str) for item in lista)):
+            lista = None
+    partes = [_decompor_item(item) for item in (lista if lista is not None else [valor])]
+    em_lista = lista is not None
+    if recompor(partes, em_lista) != valor:
+        return [(valor.encode('utf-8'), MIMETYPE_TEXTO, 'texto')], False
+    return partes, em_lista
+
+
+anexos = sa.table('anexos', sa.column('hash', sa.String), sa.column('mimetype', sa.String),
+                  sa.column('tamanho', sa.Integer), sa.column('conteudo', sa.LargeBinary),
+                  sa.column('criado_em', sa.DateTime))
+anexos_cadastro = sa.table('anexos_cadastro', sa.column('cadastro_id', sa.Integer), sa.column('campo', sa.String),
+                           sa.column('posicao', sa.Integer), sa.column('anexo_hash', sa.String),
+                           sa.column('formato', sa.String), sa.column('mimetype', sa.String),
+                           sa.column('em_lista', sa.Boolean))
+cadastros = sa.table('cadastros_reurb', sa.column('id', sa.Integer),
+                     *[sa.column(campo, sa.Text) for campo in CAMPOS_ANEXO])
+
+
+def upgrade():
+    op.create_table('anexos',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('mimetype', sa.String(length=100), nullable=False),
+    sa.Column('tamanho', sa.Integer(), nullable=False),
+    sa.Column('conteudo', sa.LargeBinary(), nullable=False),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_table('anexos_cadastro',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cadastro_id', sa.Integer(), nullable=False),
+    sa.Column('campo', sa.String(length=30), nullable=False),
+    sa.Column('posicao', sa.Integer(), nullable=False),
+    sa.Column('anexo_hash', sa.String(length=64), nullable=False),
+    sa.Column('formato', sa.String(length=10), nullable=False),
+    sa.Column('mimetype', sa.String(length=100), nullable=False),
+    sa.Column('em_lista', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['anexo_hash'], ['anexos.hash'], ),
+    sa.ForeignKeyConstraint(['cadastro_id'], ['cadastros_reurb.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('anexos_cadastro', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_anexos_cadastro_anexo_hash'), ['anexo_hash'], unique=False)
+        batch_op.create_index(batch_op.f('ix_anexos_cadastro_cadastro_id'), ['cadastro_id'], unique=False)
+
+    conexao = op.get_bind()
+    criado_em = datetime.now(timezone.utc).replace(tzinfo=None)
+    ultimo_id = 0
+    while True:
+        linhas = conexao.execute(
+            sa.select(cadastros)
+            .where(cadastros.c.id > ultimo_id, sa.or_(*[cadastros.c[campo].isnot(None) for campo in CAMPOS_ANEXO]))
+            .order_by(cadastros.c.id)
+            .limit(TAMANHO_LOTE)
+        ).all()
+        if not linhas:
+            break
+        novos = {}
+        vinculos = []
+        for linha in linhas:
+            for campo in CAMPOS_ANEXO:
+                valor = linha._mapping[campo]
+                if valor is None or valor == '':
+                    continue
+                partes, em_lista = decompor(valor)
+                for posicao, (conteudo, mimetype, formato) in enumerate(partes):
+                    hash_ = hash_anexo(conteudo)
+                    novos.setdefault(hash_, {'hash': hash_, 'mimetype': mimetype, 'tamanho': len(conteudo),
+                                             'conteudo': conteudo, 'criado_em': criado_em})
+                    vinculos.append({'cadastro_id': linha.id, 'campo': campo, 'posicao': posicao,
+                                     'anexo_hash': hash_, 'formato': formato, 'mimetype': mimetype,
+                                     'em_lista': em_lista})
+        # Conteúdos já gravados por lotes anteriores: consulta só os hashes do lote
+        if novos:
+            existentes = set(conexao.execute(
+                sa.select(anexos.c.hash).where(anexos.c.hash.in_(list(novos)))
+            ).scalars())
+            novos = [anexo for hash_, anexo in novos.items() if hash_ not in existentes]
+        if novos:
+            op.bulk_insert(anexos, novos)
+        if vinculos:
+            op.bulk_insert(anexos_cadastro, vinculos)
+        ultimo_id = linhas[-1].id
+
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        for campo in CAMPOS_ANEXO:
+            batch_op.drop_column(campo)
+
+
+def downgrade():
+    with op.batch_alter_table('cadastros_reurb', schema=None) as batch_op:
+        for campo in CAMPOS_ANEXO:
+            batch_op.add_column(sa.Column(campo, sa.Text(), nullable=True))
+
+    conexao = op.get_bind()
+    ultimo_id = 0
+    while True:
+        ids = list(conexao.execute(
+            sa.select(anexos_cadastro.c.cadastro_id).distinct()
+            .where(anexos_cadastro.c.cadastro_id > ultimo_id)
+            .order_by(anexos_cadastro.c.cadastro_id)
+            .limit(TAMANHO_LOTE)
+        ).scalars())
+        if not ids:
+            break
+        partes = {}
+        for linha in conexao.execute(
+            sa.select(anexos_cadastro.c.cadastro_id, anexos_cadastro.c.campo, anexos_cadastro.c.formato,
+                      anexos_cadastro.c.mimetype, anexos_cadastro.c.em_lista, anexos.c.conteudo)
+            .join(anexos, anexos.c.hash == anexos_cadastro.c.anexo_hash)
+            .where(anexos_cadastro.c.cadastro_id.in_(ids))
+            .order_by(anexos_cadastro.c.cadastro_id, anexos_cadastro.c.campo, anexos_cadastro.c.posicao)
+        ):
+            em_lista, lista = partes.setdefault((linha.cadastro_id, linha.campo), (linha.em_lista, []))
+            lista.append((linha.conteudo, linha.mimetype, linha.formato))
+        valores = {}
+        for (cadastro_id, campo), (em_lista, lista) in partes.items():
+            valores.setdefault(cadastro_id, {})[campo] = recompor(lista, em_lista)
+        for cadastro_id, campos in valores.items():
+            conexao.execute(cadastros.update().where(cadastros.c.id == cadastro_id).values(**campos))
+        ultimo_id = ids[-1]
+
+    with op.batch_alter_table('anexos_cadastro', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_anexos_cadastro_cadastro_id'))
+        batch_op.drop_index(batch_op.f('ix_anexos_cadastro_anexo_hash'))
+
+    op.drop_table('anexos_cadastro')
+    op.drop_table('anexos')
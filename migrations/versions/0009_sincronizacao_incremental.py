@@ -0,0 +1,58 @@
+"""versao_sync e atualizado_em em cadastros e construções, e tabela de exclusões
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 02:17:40.518342
+
+As linhas existentes ficam com versao_sync 0 e entram na primeira
+sincronização (sem token), que sempre devolve a base inteira. versao_sync é
+BigInteger porque no PostgreSQL recebe o id da transação (txid_current()).
+versoes_tabelas ganha horizonte_sync, até onde as exclusões já foram podadas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exclusoes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tabela', sa.String(length=30), nullable=False),
+    sa.Column('registro_id', sa.Integer(), nullable=False),
+    sa.Column('versao_sync', sa.BigInteger(), nullable=False),
+    sa.Column('excluido_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('exclusoes', schema=None) as batch_op:
+        batch_op.create_index('ix_exclusoes_tabela_versao_sync', ['tabela', 'versao_sync'], unique=False)
+
+    for tabela in ('cadastros_reurb', 'construcoes'):
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('versao_sync', sa.BigInteger(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{tabela}_versao_sync'), ['versao_sync'], unique=False)
+
+    with op.batch_alter_table('versoes_tabelas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('horizonte_sync', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('versoes_tabelas', schema=None) as batch_op:
+        batch_op.drop_column('horizonte_sync')
+
+    for tabela in ('construcoes', 'cadastros_reurb'):
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{tabela}_versao_sync'))
+            batch_op.drop_column('atualizado_em')
+            batch_op.drop_column('versao_sync')
+
+    with op.batch_alter_table('exclusoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_exclusoes_tabela_versao_sync')
+
+    op.drop_table('exclusoes')
@@ -0,0 +1,141 @@
+# simulacao.py - SIMULAÇÃO DO IMPACTO DE UMA NOVA PLANTA GENÉRICA
+#
+# Reavalia a base inteira de cadastros com as tabelas atuais e com as tabelas
+# propostas (valores do m² de logradouros e padrões construtivos, alíquotas)
+# e resume a diferença de IPTU: total, por bairro e a distribuição das
+# variações por imóvel. Trabalha só sobre um retrato em memória (DataFrames
+# com uma linha por cadastro e uma por construção); nada é gravado no banco.
+#
+# As regras de cálculo são as de avaliacao.avaliar_lote; o VVC dos cadastros
+# com construções é a soma de área construída × valor do m² do padrão de
+# cada construção, como em vvc_das_construcoes (app.py), só que em memória.
+
+from avaliacao import TabelasPlanta, avaliar_lote, mapear_valores
+
+# Diferenças de IPTU menores que meio centavo contam como inalteradas
+TOLERANCIA_DIFERENCA = 0.005
+
+# Limites (em %) das faixas de variação do IPTU por imóvel
+LIMITES_FAIXAS_VARIACAO = (-50, -25, -10, -5, 0, 5, 10, 25, 50)
+
+QUANTIS = {'p10': 0.10, 'p25': 0.25, 'mediana': 0.50, 'p75': 0.75, 'p90': 0.90, 'p99': 0.99}
+
+
+def tabelas_propostas(tabelas, logradouros=(), padroes=(), aliquotas=()):
+    """Cópia de `tabelas` com os valores propostos: cada par (chave, valor)
+    substitui o valor vigente daquela chave ou acrescenta uma chave nova. Nas
+    alíquotas a ordem é mantida (vale a primeira que casa com o uso) e os
+    tipos novos entram no fim."""
+    valores_logradouros = dict(tabelas.logradouros)
+    valores_logradouros.update(logradouros)
+    valores_padroes = dict(tabelas.padroes)
+    valores_padroes.update(padroes)
+    novas_aliquotas = dict(aliquotas)
+    lista_aliquotas = [(tipo, novas_aliquotas.pop(tipo, aliquota)) for tipo, aliquota in tabelas.aliquotas]
+    lista_aliquotas += list(novas_aliquotas.items())
+    return TabelasPlanta(
+        logradouros=valores_logradouros.items(),
+        padroes=valores_padroes.items(),
+        aliquotas=lista_aliquotas,
+        pgv=tabelas.pgv.items()
+    )
+
+
+def somar_construcoes(construcoes, padroes):
+    """Série cadastro_id -> soma de área construída × valor do m² do padrão.
+    Construções sem padrão conhecido entram com zero."""
+    valor_m2 = mapear_valores(construcoes['padrao'], {padrao: valor for padrao, valor in padroes.items() if padrao != ''})
+    parcela = (construcoes['area_construida'].astype(float) * valor_m2).fillna(0.0)
+    return parcela.groupby(construcoes['cadastro_id']).sum()
+
+
+def avaliar_base(cadastros, construcoes, tabelas):
+    """avaliar_lote sobre o retrato inteiro, com o VVC das construções."""
+    soma = somar_construcoes(construcoes, tabelas.padroes)
+    return avaliar_lote(cadastros.assign(vvc_construcoes=cadastros['id'].map(soma)), tabelas)
+
+
+def _variacao_percentual(atual, simulado):
+    return round((simulado - atual) / atual * 100, 2) if atual else None
+
+
+def _quantis(serie):
+    if serie.empty:
+        return None
+    valores = serie.quantile(list(QUANTIS.values()))
+    return {
+        'min': round(float(serie.min()), 2),
+        **{nome: round(float(valor), 2) for nome, valor in zip(QUANTIS, valores)},
+        'max': round(float(serie.max()), 2),
+        'media': round(float(serie.mean()), 2)
+    }
+
+
+def _faixas_variacao(variacao):
+    import numpy as np
+    import pandas as pd
+
+    limites = [-np.inf, *LIMITES_FAIXAS_VARIACAO, np.inf]
+    rotulos = [f"até {LIMITES_FAIXAS_VARIACAO[0]}%"]
+    rotulos += [f"{a}% a {b}%" for a, b in zip(LIMITES_FAIXAS_VARIACAO, LIMITES_FAIXAS_VARIACAO[1:])]
+    rotulos += [f"acima de {LIMITES_FAIXAS_VARIACAO[-1]}%"]
+    contagem = pd.cut(variacao, limites, labels=rotulos).value_counts(sort=False)
+    return [{'faixa': rotulo, 'cadastros': int(contagem[rotulo])} for rotulo in rotulos]
+
+
+def resumir_simulacao(bairros, atual, simulada):
+    """Compara duas avaliações (DataFrames de avaliar_base com o mesmo
+    índice) e devolve o resumo em tipos nativos do Python."""
+    import pandas as pd
+
+    iptu_atual = atual['iptu']
+    iptu_simulado = simulada['iptu']
+    diferenca = iptu_simulado - iptu_atual
+    alterados = diferenca.abs() >= TOLERANCIA_DIFERENCA
+
+    por_bairro = pd.DataFrame({
+        'bairro': bairros.astype(object).to_numpy(),
+        'iptu_atual': iptu_atual.to_numpy(), 'iptu_simulado': iptu_simulado.to_numpy(),
+        'vvi_atual': atual['vvi'].to_numpy(), 'vvi_simulado': simulada['vvi'].to_numpy(),
+        'alterados': alterados.to_numpy()
+    }).groupby('bairro', dropna=False, sort=False).agg(
+        cadastros=('iptu_atual', 'size'), cadastros_alterados=('alterados', 'sum'),
+        iptu_atual=('iptu_atual', 'sum'), iptu_simulado=('iptu_simulado', 'sum'),
+        vvi_atual=('vvi_atual', 'sum'), vvi_simulado=('vvi_simulado', 'sum')
+    )
+
+    def bloco(cadastros, cadastros_alterados, vvi_atual, vvi_simulado, iptu_atual_total, iptu_simulado_total):
+        return {
+            'cadastros': int(cadastros), 'cadastros_alterados': int(cadastros_alterados),
+            'vvi_atual': round(float(vvi_atual), 2), 'vvi_simulado': round(float(vvi_simulado), 2),
+            'iptu_atual': round(float(iptu_atual_total), 2), 'iptu_simulado': round(float(iptu_simulado_total), 2),
+            'diferenca': round(float(iptu_simulado_total - iptu_atual_total), 2),
+            'variacao_percentual': _variacao_percentual(float(iptu_atual_total), float(iptu_simulado_total))
+        }
+
+    lista_bairros = [
+        {'bairro': None if pd.isna(bairro) else bairro,
+         **bloco(l.cadastros, l.cadastros_alterados, l.vvi_atual, l.vvi_simulado, l.iptu_atual, l.iptu_simulado)}
+        for bairro, l in por_bairro.iterrows()
+    ]
+    lista_bairros.sort(key=lambda b: (-abs(b['diferenca']), b['bairro'] is None, b['bairro'] or ''))
+
+    # Variação percentual só onde já havia IPTU; quem passa a pagar ou deixa
+    # de pagar é contado à parte
+    com_iptu = iptu_atual > 0
+    variacao = (diferenca[com_iptu & alterados] / iptu_atual[com_iptu & alterados] * 100)
+    return {
+        'total': bloco(len(iptu_atual), alterados.sum(), atual['vvi'].sum(), simulada['vvi'].sum(),
+                       iptu_atual.sum(), iptu_simulado.sum()),
+        'por_bairro': lista_bairros,
+        'distribuicao': {
+            'aumentaram': int((diferenca >= TOLERANCIA_DIFERENCA).sum()),
+            'diminuiram': int((diferenca <= -TOLERANCIA_DIFERENCA).sum()),
+            'inalterados': int((~alterados).sum()),
+            'passam_a_pagar': int((~com_iptu & (iptu_simulado > 0)).sum()),
+            'deixam_de_pagar': int((com_iptu & (iptu_simulado <= 0)).sum()),
+            'diferenca_iptu': _quantis(diferenca[alterados]),
+            'variacao_percentual': _quantis(variacao),
+            'faixas_variacao_percentual': _faixas_variacao(variacao)
+        }
+    }
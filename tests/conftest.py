@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# O app lê a configuração do ambiente na importação. Os testes usam um banco
+# SQLite temporário (ou TESTES_DATABASE_URL, para rodar contra outro banco),
+# nunca o DATABASE_URL de quem está rodando.
+_diretorio = tempfile.mkdtemp(prefix='reurb-testes-')
+os.environ['DATABASE_URL'] = os.environ.get('TESTES_DATABASE_URL') or \
+    'sqlite:///' + os.path.join(_diretorio, 'testes.db')
+os.environ['JWT_SECRET_KEY'] = 'chave-dos-testes-com-mais-de-32-bytes'
+os.environ.pop('LOG_REQUISICOES_LENTAS_MS', None)
+os.environ.pop('METRICAS_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as aplicacao  # noqa: E402
+
+aplicacao.preparar_banco()
+
+
+@pytest.fixture(autouse=True)
+def banco_limpo():
+    yield
+    # As linhas de versoes_tabelas ficam (os caches comparam as versões, que
+    # não podem voltar para trás); só o horizonte da sincronização é zerado
+    with aplicacao.app.app_context():
+        db = aplicacao.db
+        for tabela in reversed(db.metadata.sorted_tables):
+            if tabela is not aplicacao.VersaoTabela.__table__:
+                db.session.execute(tabela.delete())
+        db.session.execute(aplicacao.update(aplicacao.VersaoTabela).values(horizonte_sync=None))
+        db.session.commit()
+    aplicacao.proxima_poda_exclusoes.clear()
+
+
+@pytest.fixture
+def cliente():
+    return aplicacao.app.test_client()
+
+
+@pytest.fixture
+def criar_cadastro(cliente):
+    # O POST não devolve o id; o cadastro é achado pelo nome, único por teste
+    def criar(**campos):
+        nome = campos.setdefault('req_nome', f'Requerente {os.urandom(4).hex()}')
+        resposta = cliente.post('/api/novo_cadastro_reurb', json=campos)
+        assert resposta.status_code == 201, resposta.get_json()
+        with aplicacao.app.app_context():
+            return aplicacao.db.session.scalar(
+                aplicacao.select(aplicacao.CadastroReurb.id).where(aplicacao.CadastroReurb.req_nome == nome))
+    return criar
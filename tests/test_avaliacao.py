@@ -0,0 +1,130 @@
+import pytest
+
+import app as aplicacao
+from avaliacao import TabelasPlanta, avaliar_registros, classificar_reurb, padrao_ilike
+
+LOGRADOUROS = [('Rua A', 100.0), ('Rua B', 80.0), ('Rua A', 999.0)]
+PADROES = [('Alto', 1500.0), ('Baixo', 700.0), ('Alto', 1.0)]
+ALIQUOTAS = [('Territorial', 1.5), ('Residencial', 0.8), ('Comercial_Servicos', 1.2),
+             ('Residencial Especial', 0.5), ('Industria 100%', 2.0)]
+
+# Os usos são o padrão do ILIKE ('%<uso>%'): curingas, maiúsculas e
+# caracteres especiais de regex. Sem barra invertida, que o LIKE do SQLite
+# não trata como escape (ver test_padrao_ilike_escapes).
+USOS = ['residencial', 'RESIDENCIAL', 'Especial', 'com%serv', 'Comercial_Servicos', 'Comercial Servicos',
+        'ind%100', 'resid_ncial', '%', '_', 'Rural', 'a.b', 'Resid(', '']
+
+CADASTROS = [
+    {'imovel_logradouro': 'Rua A', 'imovel_area_total': 200, 'imovel_tipo_construcao': 'Alto',
+     'imovel_area_construida': 50, 'reurb_renda_familiar': 1500},
+    {'imovel_logradouro': 'Rua B', 'imovel_area_total': 120.5, 'imovel_tipo_construcao': 'Baixo',
+     'imovel_area_construida': 0, 'reurb_renda_familiar': 4000},
+    {'imovel_logradouro': 'Rua C', 'imovel_area_total': 300, 'imovel_tipo_construcao': 'Alto',
+     'imovel_area_construida': 80, 'reurb_renda_familiar': 4000.01},
+    {'imovel_logradouro': 'Rua A', 'imovel_area_total': None, 'imovel_tipo_construcao': 'Médio',
+     'imovel_area_construida': 40, 'reurb_renda_familiar': 0},
+    {'imovel_logradouro': None, 'imovel_area_total': 90, 'imovel_tipo_construcao': None,
+     'imovel_area_construida': None, 'reurb_renda_familiar': None},
+    {'imovel_logradouro': 'Rua B', 'imovel_area_total': 0, 'imovel_tipo_construcao': 'Baixo',
+     'imovel_area_construida': 60, 'reurb_renda_familiar': 2500},
+]
+
+
+def avaliar_linha_a_linha(cad):
+    # O cálculo de listar_cadastros_reurb antes da avaliação em lote: uma
+    # consulta por tabela para cada cadastro, com o ILIKE feito pelo banco
+    vvt, vvc, iptu = 0.0, 0.0, 0.0
+    if cad.imovel_logradouro and cad.imovel_area_total:
+        valor_m2_terreno = aplicacao.ValorLogradouro.query.filter_by(logradouro=cad.imovel_logradouro) \
+            .order_by(aplicacao.ValorLogradouro.id).first()
+        if valor_m2_terreno: vvt = cad.imovel_area_total * valor_m2_terreno.valor_m2
+    if cad.imovel_tipo_construcao and cad.imovel_area_construida:
+        padrao_construtivo = aplicacao.PadraoConstrutivo.query.filter_by(descricao=cad.imovel_tipo_construcao) \
+            .order_by(aplicacao.PadraoConstrutivo.id).first()
+        if padrao_construtivo: vvc = cad.imovel_area_construida * padrao_construtivo.valor_m2
+    vvi = vvt + vvc
+    if cad.imovel_uso and vvi > 0:
+        aliquota_iptu = aplicacao.AliquotaIPTU.query.filter(aplicacao.AliquotaIPTU.tipo.ilike(f"%{cad.imovel_uso}%")) \
+            .order_by(aplicacao.AliquotaIPTU.id).first()
+        if aliquota_iptu: iptu = vvi * (aliquota_iptu.aliquota / 100.0)
+    tipo_reurb = "REURB-S" if cad.reurb_renda_familiar and cad.reurb_renda_familiar <= 4000 else "REURB-E"
+    return {'vvt': vvt, 'vvc': vvc, 'vvi': vvi, 'iptu': iptu, 'tipo_reurb': tipo_reurb}
+
+
+def gravar_planta(cliente):
+    for tipo, campo, linhas in (('logradouros', 'logradouro', LOGRADOUROS), ('padroes', 'descricao', PADROES),
+                                ('aliquotas', 'tipo', ALIQUOTAS)):
+        valor = 'aliquota' if tipo == 'aliquotas' else 'valor_m2'
+        for chave, numero in linhas:
+            resposta = cliente.post(f'/api/planta_generica/{tipo}', json={campo: chave, valor: numero})
+            assert resposta.status_code == 201, resposta.get_json()
+
+
+def criar_combinacoes(criar_cadastro):
+    return [criar_cadastro(imovel_uso=uso, **cadastro) for cadastro in CADASTROS for uso in USOS]
+
+
+def conferir_paridade():
+    with aplicacao.app.app_context():
+        cadastros = aplicacao.CadastroReurb.query.order_by(aplicacao.CadastroReurb.id).all()
+        assert cadastros
+        calculados = avaliar_registros(cadastros, aplicacao.cache_planta.tabelas())
+        for cad, calculado in zip(cadastros, calculados):
+            esperado = avaliar_linha_a_linha(cad)
+            contexto = (cad.imovel_uso, cad.imovel_logradouro, cad.imovel_area_total)
+            assert calculado == pytest.approx(esperado), contexto
+            # Os valores gravados no cadastro são os mesmos
+            assert {campo: getattr(cad, campo) for campo in aplicacao.CAMPOS_VALOR_VENAL} == \
+                pytest.approx({campo: esperado[campo] for campo in aplicacao.CAMPOS_VALOR_VENAL}), contexto
+            assert classificar_reurb(cad.reurb_renda_familiar) == esperado['tipo_reurb']
+
+
+def test_paridade_com_a_avaliacao_linha_a_linha(cliente, criar_cadastro):
+    gravar_planta(cliente)
+    criar_combinacoes(criar_cadastro)
+    conferir_paridade()
+
+
+def test_paridade_depois_de_alterar_a_planta(cliente, criar_cadastro):
+    # Cadastros gravados antes da planta são recalculados quando ela muda
+    criar_combinacoes(criar_cadastro)
+    gravar_planta(cliente)
+    conferir_paridade()
+
+
+@pytest.mark.parametrize('termo, texto, casa', [
+    ('res', 'Residencial', True),
+    ('RESID', 'residencial', True),
+    ('cial', 'Residencial', True),
+    ('res%cial', 'Residencial', True),
+    ('resid_ncial', 'Residencial', True),
+    ('resid_ncial', 'Residncial', False),
+    ('a%b', 'a\nb', True),
+    ('a.b', 'axb', False),
+    ('(', 'Uso (misto)', True),
+    ('[a-z]', 'a', False),
+    ('', 'qualquer', True),
+    ('Rural', 'Residencial', False),
+])
+def test_padrao_ilike(termo, texto, casa):
+    assert bool(padrao_ilike(termo).fullmatch(texto)) is casa
+
+
+@pytest.mark.parametrize('termo, texto, casa', [
+    # No PostgreSQL a barra invertida escapa o caractere seguinte
+    ('100\\%', 'Taxa 100%', True),
+    ('100\\%', 'Taxa 1000', False),
+    ('a\\_b', 'a_b', True),
+    ('a\\_b', 'axb', False),
+    ('a\\\\b', 'a\\b', True),
+])
+def test_padrao_ilike_escapes(termo, texto, casa):
+    assert bool(padrao_ilike(termo).fullmatch(texto)) is casa
+
+
+def test_aliquota_repetida_vale_a_primeira():
+    tabelas = TabelasPlanta(logradouros=[('Rua A', 10.0)], padroes=[],
+                            aliquotas=[('Residencial', 0.8), ('Residencial Especial', 0.5)])
+    registro = {'imovel_logradouro': 'Rua A', 'imovel_area_total': 100, 'imovel_tipo_construcao': None,
+                'imovel_area_construida': None, 'imovel_uso': 'residencial', 'reurb_renda_familiar': None}
+    assert avaliar_registros([registro], tabelas)[0]['iptu'] == pytest.approx(1000 * 0.008)
@@ -0,0 +1,80 @@
+URL_LISTAR = '/api/novo_cadastro_reurb/listar'
+
+BAIRROS = ['Centro', None, 'Bela Vista', 'Centro', None, 'Aeroporto', 'Centro', 'Bela Vista']
+
+
+def percorrer(cliente, limite, **parametros):
+    """Segue X-Proximo-Cursor até o fim; devolve os ids e o número de páginas."""
+    ids, paginas = [], 0
+    cursor = None
+    for _ in range(100):
+        consulta = {**parametros, 'limit': limite, **({'cursor': cursor} if cursor else {})}
+        resposta = cliente.get(URL_LISTAR, query_string=consulta)
+        assert resposta.status_code == 200, resposta.get_json()
+        paginas += 1
+        pagina = resposta.get_json()
+        assert len(pagina) <= limite
+        ids += [linha['id'] for linha in pagina]
+        cursor = resposta.headers.get('X-Proximo-Cursor')
+        if not cursor:
+            return ids, paginas
+    raise AssertionError("A paginação não terminou em 100 páginas")
+
+
+def ordem_esperada(cadastros, descendente=False):
+    # Empates desempatados pelo id (no mesmo sentido) e nulos sempre no fim
+    preenchidos = sorted(((bairro, id_) for id_, bairro in cadastros if bairro is not None), reverse=descendente)
+    nulos = sorted((id_ for id_, bairro in cadastros if bairro is None), reverse=descendente)
+    return [id_ for _, id_ in preenchidos] + nulos
+
+
+def criar_cadastros(criar_cadastro):
+    return [(criar_cadastro(imovel_bairro=bairro), bairro) for bairro in BAIRROS]
+
+
+def test_sem_limite_nem_cursor_devolve_a_lista_inteira(cliente, criar_cadastro):
+    cadastros = criar_cadastros(criar_cadastro)
+    resposta = cliente.get(URL_LISTAR, query_string={'ordenar': 'bairro'})
+    assert resposta.status_code == 200
+    assert 'X-Proximo-Cursor' not in resposta.headers
+    assert [linha['id'] for linha in resposta.get_json()] == ordem_esperada(cadastros)
+
+
+def test_paginas_por_id(cliente, criar_cadastro):
+    cadastros = criar_cadastros(criar_cadastro)
+    ids, paginas = percorrer(cliente, 3)
+    assert ids == sorted(id_ for id_, _ in cadastros)
+    assert paginas == 3
+
+    ids, _ = percorrer(cliente, 3, direcao='desc')
+    assert ids == sorted((id_ for id_, _ in cadastros), reverse=True)
+
+
+def test_paginas_por_coluna_com_empates_e_nulos(cliente, criar_cadastro):
+    cadastros = criar_cadastros(criar_cadastro)
+    for limite in (1, 2, 3, len(BAIRROS)):
+        ids, _ = percorrer(cliente, limite, ordenar='bairro')
+        assert ids == ordem_esperada(cadastros), limite
+
+
+def test_paginas_descendentes_mantem_nulos_no_fim(cliente, criar_cadastro):
+    cadastros = criar_cadastros(criar_cadastro)
+    for limite in (1, 2, 3):
+        ids, _ = percorrer(cliente, limite, ordenar='bairro', direcao='desc')
+        assert ids == ordem_esperada(cadastros, descendente=True), limite
+
+
+def test_pagina_exata_nao_devolve_cursor(cliente, criar_cadastro):
+    criar_cadastros(criar_cadastro)
+    resposta = cliente.get(URL_LISTAR, query_string={'limit': len(BAIRROS)})
+    assert len(resposta.get_json()) == len(BAIRROS)
+    assert 'X-Proximo-Cursor' not in resposta.headers
+
+
+def test_parametros_invalidos(cliente, criar_cadastro):
+    criar_cadastro()
+    for consulta in ({'cursor': 'nao-e-um-cursor'}, {'limit': 0}, {'limit': 'dez'},
+                     {'ordenar': 'senha'}, {'direcao': 'acima'}):
+        resposta = cliente.get(URL_LISTAR, query_string=consulta)
+        assert resposta.status_code == 400, consulta
+        assert resposta.get_json()['sucesso'] is False
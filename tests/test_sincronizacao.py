@@ -0,0 +1,212 @@
+import base64
+import json
+from datetime import timedelta
+
+import app as aplicacao
+
+URL_SYNC = '/api/novo_cadastro_reurb/sync'
+
+
+def sincronizar(cliente, token=None, limite=None):
+    parametros = {}
+    if token:
+        parametros['since'] = token
+    if limite:
+        parametros['limit'] = limite
+    return cliente.get(URL_SYNC, query_string=parametros)
+
+
+def sincronizar_tudo(cliente, estado, token=None, limite=None):
+    """Pede páginas até "mais" ser falso, aplicando cada uma em `estado` como
+    um cliente faria (exclusões antes das linhas). Devolve (token, páginas)."""
+    paginas = []
+    for _ in range(100):
+        resposta = sincronizar(cliente, token, limite)
+        assert resposta.status_code == 200, resposta.get_json()
+        pagina = resposta.get_json()
+        paginas.append(pagina)
+        for nome in aplicacao.TABELAS_SYNC:
+            for id_ in pagina['excluidos'][nome]:
+                estado[nome].pop(id_, None)
+            for linha in pagina[nome]:
+                estado[nome][linha['id']] = linha
+        token = pagina['token']
+        if not pagina['mais']:
+            return token, paginas
+    raise AssertionError("A sincronização não terminou em 100 páginas")
+
+
+def estado_vazio():
+    return {nome: {} for nome in aplicacao.TABELAS_SYNC}
+
+
+def ids_no_banco():
+    with aplicacao.app.app_context():
+        return {
+            'cadastros': set(aplicacao.db.session.scalars(aplicacao.select(aplicacao.CadastroReurb.id))),
+            'construcoes': set(aplicacao.db.session.scalars(aplicacao.select(aplicacao.Construcao.id))),
+        }
+
+
+def ids_construcoes(cadastro_id):
+    with aplicacao.app.app_context():
+        return sorted(aplicacao.db.session.scalars(
+            aplicacao.select(aplicacao.Construcao.id).where(aplicacao.Construcao.cadastro_id == cadastro_id)))
+
+
+def adicionar_construcoes(cliente, cadastro_id, quantidade, modo='inserir'):
+    resposta = cliente.post(f'/api/construcoes/{cadastro_id}/lote', json={
+        'modo': modo,
+        'itens': [{'area_construida': 10.0 + i, 'uso': 'Residencial'} for i in range(quantidade)]
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    return [r['id'] for r in resposta.get_json()['resultados']]
+
+
+def codificar(dados):
+    return base64.urlsafe_b64encode(json.dumps(dados).encode('utf-8')).decode('ascii')
+
+
+def test_sincronizacao_inicial_paginada(cliente, criar_cadastro):
+    cadastros = [criar_cadastro() for _ in range(5)]
+    # No PostgreSQL as linhas gravadas na mesma transação têm a mesma
+    # versao_sync (o txid); a paginação desempata pelo id dentro da versão
+    construcoes = adicionar_construcoes(cliente, cadastros[0], 5)
+    with aplicacao.app.app_context():
+        versao = aplicacao.db.session.scalar(aplicacao.select(aplicacao.func.max(aplicacao.Construcao.versao_sync)))
+        aplicacao.db.session.execute(aplicacao.update(aplicacao.Construcao).values(versao_sync=versao))
+        aplicacao.db.session.commit()
+
+    estado = estado_vazio()
+    _, paginas = sincronizar_tudo(cliente, estado, limite=2)
+
+    assert len(paginas) == 3
+    assert all(pagina['mais'] for pagina in paginas[:-1])
+    entregues = [linha['id'] for pagina in paginas for linha in pagina['construcoes']]
+    assert sorted(entregues) == sorted(construcoes)
+    assert set(estado['cadastros']) == set(cadastros)
+    assert set(estado['construcoes']) == set(construcoes)
+    assert all(pagina['excluidos'] == {'cadastros': [], 'construcoes': []} for pagina in paginas)
+    assert 'vvi' in estado['cadastros'][cadastros[0]]
+
+
+def test_exclusao_durante_a_sincronizacao_inicial(cliente, criar_cadastro):
+    cadastros = [criar_cadastro() for _ in range(4)]
+    estado = estado_vazio()
+    resposta = sincronizar(cliente, limite=2)
+    pagina = resposta.get_json()
+    for linha in pagina['cadastros']:
+        estado['cadastros'][linha['id']] = linha
+    assert pagina['mais']
+
+    # Um cadastro já entregue e um ainda não entregue
+    entregue, pendente = pagina['cadastros'][0]['id'], cadastros[-1]
+    assert cliente.delete(f'/api/novo_cadastro_reurb/{entregue}').status_code == 200
+    assert cliente.delete(f'/api/novo_cadastro_reurb/{pendente}').status_code == 200
+
+    sincronizar_tudo(cliente, estado, token=pagina['token'], limite=2)
+    assert set(estado['cadastros']) == ids_no_banco()['cadastros']
+
+
+def test_alteracao_depois_do_token(cliente, criar_cadastro):
+    cadastros = [criar_cadastro() for _ in range(3)]
+    estado = estado_vazio()
+    token, _ = sincronizar_tudo(cliente, estado)
+
+    resposta = cliente.put(f'/api/novo_cadastro_reurb/{cadastros[1]}', json={'req_nome': 'Nome alterado'})
+    assert resposta.status_code == 200
+    novo = criar_cadastro()
+
+    pagina = sincronizar(cliente, token).get_json()
+    assert sorted(linha['id'] for linha in pagina['cadastros']) == sorted([cadastros[1], novo])
+    assert {linha['id']: linha['req_nome'] for linha in pagina['cadastros']}[cadastros[1]] == 'Nome alterado'
+    assert pagina['construcoes'] == []
+    assert pagina['excluidos'] == {'cadastros': [], 'construcoes': []}
+    assert not pagina['mais']
+
+    # Nada mudou desde o último token
+    seguinte = sincronizar(cliente, pagina['token']).get_json()
+    assert seguinte['cadastros'] == [] and seguinte['construcoes'] == []
+
+
+def test_exclusao_gera_lapide(cliente, criar_cadastro):
+    cadastros = [criar_cadastro() for _ in range(3)]
+    construcoes = adicionar_construcoes(cliente, cadastros[0], 2)
+    avulsa = adicionar_construcoes(cliente, cadastros[1], 1)[0]
+    estado = estado_vazio()
+    token, _ = sincronizar_tudo(cliente, estado)
+
+    assert cliente.delete(f'/api/novo_cadastro_reurb/{cadastros[0]}').status_code == 200
+    assert cliente.delete(f'/api/construcoes/{avulsa}').status_code == 200
+
+    token, paginas = sincronizar_tudo(cliente, estado, token)
+    assert paginas[0]['excluidos']['cadastros'] == [cadastros[0]]
+    assert sorted(paginas[0]['excluidos']['construcoes']) == sorted(construcoes + [avulsa])
+    assert set(estado['cadastros']) == ids_no_banco()['cadastros']
+    assert estado['construcoes'] == {}
+
+    # A lápide só é entregue uma vez
+    seguinte = sincronizar(cliente, token).get_json()
+    assert seguinte['excluidos'] == {'cadastros': [], 'construcoes': []}
+
+
+def test_lote_substituir_gera_lapides(cliente, criar_cadastro):
+    cadastro = criar_cadastro()
+    antigas = adicionar_construcoes(cliente, cadastro, 2)
+    estado = estado_vazio()
+    token, _ = sincronizar_tudo(cliente, estado)
+
+    novas = adicionar_construcoes(cliente, cadastro, 1, modo='substituir')
+
+    _, paginas = sincronizar_tudo(cliente, estado, token)
+    assert sorted(paginas[0]['excluidos']['construcoes']) == sorted(antigas)
+    assert [linha['id'] for linha in paginas[0]['construcoes']] == novas
+    assert sorted(estado['construcoes']) == ids_construcoes(cadastro) == novas
+
+
+def test_token_de_formato_antigo_recebe_410(cliente, criar_cadastro):
+    criar_cadastro()
+    resposta = sincronizar(cliente, codificar({'cadastros': 3, 'construcoes': 1}))
+    assert resposta.status_code == 410
+    assert resposta.get_json()['sucesso'] is False
+
+
+def test_token_invalido_recebe_400(cliente):
+    assert sincronizar(cliente, 'nao-e-um-token').status_code == 400
+
+
+def test_token_mais_novo_que_a_base_recebe_410(cliente, criar_cadastro):
+    criar_cadastro()
+    token, _ = sincronizar_tudo(cliente, estado_vazio())
+    dados = json.loads(base64.urlsafe_b64decode(token))
+    dados['cadastros'] = [dados['cadastros'][0] + 100, None]
+    assert sincronizar(cliente, codificar(dados)).status_code == 410
+    assert sincronizar(cliente, token).status_code == 200
+
+
+def test_token_anterior_ao_horizonte_recebe_410(cliente, criar_cadastro):
+    cadastros = [criar_cadastro() for _ in range(3)]
+    estado = estado_vazio()
+    token, _ = sincronizar_tudo(cliente, estado)
+    assert cliente.delete(f'/api/novo_cadastro_reurb/{cadastros[0]}').status_code == 200
+
+    # Envelhece a exclusão e deixa a próxima escrita em cadastros fazer a poda
+    with aplicacao.app.app_context():
+        aplicacao.db.session.execute(aplicacao.update(aplicacao.Exclusao).values(
+            excluido_em=aplicacao.agora() - aplicacao.SYNC_RETENCAO_EXCLUSOES - timedelta(days=1)))
+        aplicacao.db.session.commit()
+    aplicacao.proxima_poda_exclusoes.clear()
+    criar_cadastro()
+    with aplicacao.app.app_context():
+        assert aplicacao.db.session.scalar(aplicacao.select(aplicacao.func.count()).select_from(aplicacao.Exclusao)) == 0
+        assert aplicacao.db.session.get(aplicacao.VersaoTabela, 'cadastros').horizonte_sync is not None
+
+    resposta = sincronizar(cliente, token)
+    assert resposta.status_code == 410
+
+    # Do zero (e paginado), a sincronização volta a funcionar, e o token novo também
+    novo_estado = estado_vazio()
+    novo_token, paginas = sincronizar_tudo(cliente, novo_estado, limite=1)
+    assert len(paginas) > 1
+    assert set(novo_estado['cadastros']) == ids_no_banco()['cadastros']
+    assert sincronizar(cliente, novo_token).status_code == 200